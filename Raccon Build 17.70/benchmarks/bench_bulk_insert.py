@@ -0,0 +1,63 @@
+# benchmarks/bench_bulk_insert.py
+"""
+Скорость вставки заметок: по одной (commit на каждую строку) против
+NotesService.create_notes (одна транзакция на весь пакет).
+
+Запуск из корня проекта:
+  python benchmarks/bench_bulk_insert.py            # 10k и 100k
+  python benchmarks/bench_bulk_insert.py 5000 20000 # свои размеры
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db import Database
+from services.notes_service import NotesService
+
+
+def _fresh_service(tmp_dir: str, name: str):
+    path = os.path.join(tmp_dir, name)
+    if os.path.exists(path):
+        os.remove(path)
+    db = Database(path)
+    return db, NotesService(db)
+
+
+def _rows(n: int):
+    return ((f"Заметка {i}", f"Текст заметки номер {i}", "bench,test") for i in range(n))
+
+
+def bench_single(tmp_dir: str, n: int) -> float:
+    db, svc = _fresh_service(tmp_dir, f"single_{n}.db")
+    t0 = time.perf_counter()
+    for title, content, tags in _rows(n):
+        svc.create_note(title, content, tags)
+    dt = time.perf_counter() - t0
+    db.close()
+    return dt
+
+
+def bench_bulk(tmp_dir: str, n: int) -> float:
+    db, svc = _fresh_service(tmp_dir, f"bulk_{n}.db")
+    t0 = time.perf_counter()
+    svc.create_notes(_rows(n))
+    dt = time.perf_counter() - t0
+    db.close()
+    return dt
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'rows':>8} {'single, s':>11} {'rows/s':>10} {'bulk, s':>9} {'rows/s':>10} {'x':>7}")
+        for n in sizes:
+            single = bench_single(tmp_dir, n)
+            bulk = bench_bulk(tmp_dir, n)
+            print(f"{n:>8} {single:>11.3f} {n / single:>10.0f} {bulk:>9.3f} {n / bulk:>10.0f} {single / bulk:>7.1f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    main(sizes)
@@ -0,0 +1,81 @@
+# benchmarks/bench_format_meta_codec.py
+"""
+format_meta сильно отформатированной заметки: прежний JSON против BLOB services.format_meta.
+
+Размер, запись (json.dumps / FormatMeta.to_bytes) и чтение: прежний путь редактора
+(json.loads + копия через json.loads(json.dumps(...))) против FormatMeta.load —
+сразу после загрузки (ленивый разбор заголовков), с раскодированием одного стиля
+и всех стилей. Отдельно — сохранение без правок (BLOB пишется как есть).
+
+Запуск из корня проекта:
+  python benchmarks/bench_format_meta_codec.py              # 10, 1000 и 20000 диапазонов на стиль
+  python benchmarks/bench_format_meta_codec.py 500 50000    # свои размеры
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.format_meta import KNOWN_STYLES, FormatMeta
+
+REPEAT = 20
+
+
+def _make_meta(per_style: int, rnd: random.Random) -> dict:
+    # диапазоны по несколько слов с промежутками — как при ручном выделении в длинной заметке
+    meta = {}
+    for style in KNOWN_STYLES:
+        pos, ranges = 0, []
+        for _ in range(per_style):
+            pos += rnd.randint(5, 400)
+            length = rnd.randint(3, 60)
+            ranges.append([pos, pos + length])
+            pos += length
+        meta[style] = ranges
+    return meta
+
+
+def _encode(meta: FormatMeta) -> bytes:
+    # редактор держит FormatMeta и после правок кодирует его заново
+    meta._changed()
+    return meta.to_bytes()
+
+
+def _timeit(fn) -> float:
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - t0) / REPEAT * 1e3
+
+
+def main(sizes):
+    rnd = random.Random(1)
+    print(f"{'ranges':>7} {'json, B':>9} {'blob, B':>9} {'ratio':>6} {'dumps':>7} {'to_bytes':>9} "
+          f"{'json load':>10} {'lazy':>7} {'1 style':>8} {'all':>7} {'resave':>7}   (ms)")
+    for per_style in sizes:
+        data = _make_meta(per_style, rnd)
+        text = json.dumps(data, ensure_ascii=False)
+        meta = FormatMeta.from_dict(data)
+        blob = meta.to_bytes()
+
+        dumps = _timeit(lambda: json.dumps(data, ensure_ascii=False))
+        to_bytes = _timeit(lambda: _encode(meta))
+        # прежний NotesUI.edit_note: разбор и глубокая копия через JSON
+        json_load = _timeit(lambda: json.loads(json.dumps(json.loads(text))))
+        lazy = _timeit(lambda: FormatMeta.load(blob))
+        one = _timeit(lambda: FormatMeta.load(blob).ranges("bold"))
+        full = _timeit(lambda: list(FormatMeta.load(blob).items()))
+        resave = _timeit(lambda: FormatMeta.load(blob).to_bytes())
+        assert FormatMeta.load(blob).to_dict() == FormatMeta.from_dict(data).to_dict()
+
+        print(f"{per_style:>7} {len(text.encode()):>9} {len(blob):>9} {len(text.encode()) / len(blob):>6.1f} "
+              f"{dumps:>7.3f} {to_bytes:>9.3f} {json_load:>10.3f} {lazy:>7.3f} {one:>8.3f} {full:>7.3f} "
+              f"{resave:>7.3f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 1_000, 20_000]
+    main(sizes)
@@ -0,0 +1,83 @@
+# benchmarks/bench_format_offsets.py
+"""
+Перевод смещений format_meta в индексы tk.Text при открытии заметки:
+старый обход строк (FormattingPanel._offset_to_index до LineIndex) против LineIndex.
+
+Tk в замере не участвует: старый вариант читает строки из списка, а не через
+text.get, так что его время — нижняя граница (в редакторе добавляется вызов Tcl на строку).
+
+Запуск из корня проекта:
+  python benchmarks/bench_format_offsets.py                # 10000 строк, 2000 диапазонов
+  python benchmarks/bench_format_offsets.py 50000 10000    # своё число строк и диапазонов
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui.text_index import LineIndex
+
+
+def _make_text(lines: int, rnd: random.Random) -> str:
+    return "\n".join("".join(rnd.choices(string.ascii_lowercase + " ", k=rnd.randint(0, 80))) for _ in range(lines))
+
+
+def _old_offset_to_index(lines, offset: int) -> str:
+    line = 1
+    while True:
+        line_len = len(lines[line - 1]) + 1
+        if offset < line_len:
+            return f"{line}.{offset}"
+        offset -= line_len
+        line += 1
+
+
+def _old_index_to_offset(lines, idx: str) -> int:
+    line, col = map(int, idx.split("."))
+    return sum(len(lines[l - 1]) + 1 for l in range(1, line)) + col
+
+
+def main(n_lines: int, n_ranges: int):
+    rnd = random.Random(1)
+    text = _make_text(n_lines, rnd)
+    lines = text.split("\n")
+    offsets = sorted(rnd.randrange(len(text)) for _ in range(n_ranges * 2))
+    print(f"{n_lines} строк, {len(text)} символов, {n_ranges} диапазонов")
+    print(f"{'variant':<34} {'ms':>10}")
+
+    t0 = time.perf_counter()
+    old = [_old_offset_to_index(lines, o) for o in offsets]
+    old_s = time.perf_counter() - t0
+    print(f"{'обход строк: смещение -> индекс':<34} {old_s * 1e3:>10.1f}")
+
+    t0 = time.perf_counter()
+    index = LineIndex(text)
+    new = [index.to_index(o) for o in offsets]
+    new_s = time.perf_counter() - t0
+    print(f"{'LineIndex: построение + перевод':<34} {new_s * 1e3:>10.1f}")
+    assert old == new
+
+    sample = old[:: max(1, len(old) // 200)]
+    t0 = time.perf_counter()
+    back_old = [_old_index_to_offset(lines, i) for i in sample]
+    print(f"{'обход строк: индекс -> смещение':<34} {(time.perf_counter() - t0) / len(sample) * 1e6:>10.1f} us/шт")
+    t0 = time.perf_counter()
+    back_new = [index.to_offset(*map(int, i.split("."))) for i in sample]
+    print(f"{'LineIndex: индекс -> смещение':<34} {(time.perf_counter() - t0) / len(sample) * 1e6:>10.1f} us/шт")
+    assert back_old == back_new
+
+    # набор текста: правка в середине и сразу перевод позиции (как при apply_style)
+    t0 = time.perf_counter()
+    for k in range(1000):
+        pos = len(index) // 2
+        index.insert(pos, "x\n" if k % 10 == 0 else "x")
+        index.to_index(pos)
+    print(f"{'LineIndex: правка + перевод':<34} {(time.perf_counter() - t0) / 1000 * 1e6:>10.1f} us/шт")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 10_000, args[1] if len(args) > 1 else 2_000)
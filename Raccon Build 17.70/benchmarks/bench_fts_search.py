@@ -0,0 +1,93 @@
+# benchmarks/bench_fts_search.py
+"""
+Задержка поиска заметок: старый LIKE '%q%' (заголовок, теги и текст)
+против FTS5 (NotesService.search_notes_ranked, bm25 + snippet, первые 100).
+
+Запуск из корня проекта:
+  python benchmarks/bench_fts_search.py [число_заметок]   # по умолчанию 100000
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db import Database
+from services.notes_service import NotesService
+
+WORDS = ("план встреча отчёт проект бюджет покупки молоко хлеб задача идея книга фильм "
+         "работа дом учёба спорт здоровье отпуск подарок ремонт звонок письмо").split()
+
+
+def _vocab(rnd: random.Random, size: int = 20000):
+    # словарь с распределением, похожим на естественный язык: частые слова + длинный хвост редких
+    letters = "абвгдежзиклмнопрстуфхцчшэюя"
+    tail = ["".join(rnd.choices(letters, k=rnd.randint(5, 10))) for _ in range(size)]
+    vocab = WORDS + tail
+    cum, acc = [], 0.0
+    for i in range(len(vocab)):
+        acc += 1.0 / (i + 1)
+        cum.append(acc)
+    return vocab, cum
+
+
+def _fill(svc: NotesService, n: int):
+    rnd = random.Random(42)
+    vocab, cum = _vocab(rnd)
+
+    def rows():
+        for _ in range(n):
+            title = " ".join(rnd.choices(vocab, cum_weights=cum, k=4))
+            content = " ".join(rnd.choices(vocab, cum_weights=cum, k=80))
+            tags = ",".join(rnd.sample(WORDS, 2))
+            yield (title, content, tags)
+
+    svc.create_notes(rows())
+    return vocab
+
+
+def _measure(fn, q: str, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000.0
+
+
+def main(n: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "fts.db"), track_stats=False)
+        svc = NotesService(db)
+        t0 = time.perf_counter()
+        vocab = _fill(svc, n)
+        print(f"{n} заметок вставлено за {time.perf_counter() - t0:.1f} с (с FTS-триггерами)")
+
+        # частое слово, слова из середины и хвоста словаря, префикс и отсутствующее слово
+        queries = ["бюджет", vocab[300], vocab[3000], vocab[15000], vocab[8000][:4], "zzz_missing"]
+
+        def like(q):
+            p = f"%{q}%"
+            return db.fetchall(
+                "SELECT id, title, tags, created_at FROM notes "
+                "WHERE title LIKE ? OR tags LIKE ? OR content LIKE ? ORDER BY id DESC",
+                (p, p, p)
+            )
+
+        def fts(q):
+            return svc.search_notes_ranked(q, limit=100)
+
+        print(f"{'query':<14} {'hits':>7} {'LIKE, ms':>10} {'FTS5, ms':>10} {'x':>8}")
+        for q in queries:
+            hits = len(like(q))
+            a = _measure(like, q)
+            b = _measure(fts, q)
+            print(f"{q:<14} {hits:>7} {a:>10.2f} {b:>10.2f} {a / max(b, 1e-6):>8.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
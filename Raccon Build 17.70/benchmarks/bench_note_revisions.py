@@ -0,0 +1,79 @@
+# benchmarks/bench_note_revisions.py
+"""
+История правок заметки: сколько занимает note_revisions (дельты + снимки, zlib)
+против полной копии текста на каждое сохранение, сколько стоит update_note
+с записью ревизии и сколько — восстановление самой дальней от снимка версии.
+
+Запуск из корня проекта:
+  python benchmarks/bench_note_revisions.py              # заметка 5000 строк, 200 сохранений
+  python benchmarks/bench_note_revisions.py 20000 500    # свои размеры
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db import Database
+from services.notes_service import NotesService
+
+
+def main(n_lines: int, saves: int):
+    rnd = random.Random(1)
+    words = "план встреча отчёт проект бюджет задача идея работа дом звонок письмо".split()
+    lines = [" ".join(rnd.choices(words, k=rnd.randint(3, 12))) + "\n" for _ in range(n_lines)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "rev.db"))
+        ns = NotesService(db)
+        note_id = ns.create_note("Заметка", "".join(lines), "bench")
+        # отдельно замеряем запись ревизии: остальное в update_note — UPDATE и переиндексация FTS
+        record, record_s = ns.revisions.record, [0.0]
+
+        def timed_record(*args):
+            t = time.perf_counter()
+            record(*args)
+            record_s[0] += time.perf_counter() - t
+
+        ns.revisions.record = timed_record
+        full_bytes = 0
+        t0 = time.perf_counter()
+        for k in range(saves):
+            # несколько правок в разных местах между сохранениями
+            for _ in range(rnd.randint(1, 5)):
+                i = rnd.randrange(len(lines))
+                if rnd.random() < 0.6:
+                    lines[i] = " ".join(rnd.choices(words, k=rnd.randint(3, 12))) + "\n"
+                else:
+                    lines.insert(i, f"новая строка {k}\n")
+            content = "".join(lines)
+            full_bytes += len(content.encode("utf-8"))
+            ns.update_note(note_id, "Заметка", content, "bench")
+        save_ms = (time.perf_counter() - t0) / saves * 1e3
+
+        stored, count, snapshots = db.fetchone(
+            "SELECT SUM(length(content)), COUNT(*), SUM(depth = 0) FROM note_revisions WHERE note_id = ?",
+            (note_id,)
+        )
+        # самая дорогая версия — последняя перед очередным снимком (больше всего дельт)
+        worst = db.fetchone(
+            "SELECT id FROM note_revisions WHERE note_id = ? ORDER BY depth DESC, id DESC LIMIT 1", (note_id,)
+        )[0]
+        t0 = time.perf_counter()
+        ns.get_revision(note_id, worst)
+        rebuild_ms = (time.perf_counter() - t0) * 1e3
+        db.close()
+
+    print(f"{n_lines} строк, {saves} сохранений, в истории {count} ревизий ({snapshots} снимков)")
+    print(f"{'полные копии последних ревизий, KB':<36} {full_bytes * count / saves / 1024:>10.0f}")
+    print(f"{'note_revisions, KB':<36} {stored / 1024:>10.0f}")
+    print(f"{'update_note с ревизией, ms':<36} {save_ms:>10.2f}")
+    print(f"{'  из них запись ревизии, ms':<36} {record_s[0] / saves * 1e3:>10.2f}")
+    print(f"{'восстановление худшей версии, ms':<36} {rebuild_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 5_000, args[1] if len(args) > 1 else 200)
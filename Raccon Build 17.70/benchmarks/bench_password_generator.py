@@ -0,0 +1,55 @@
+# benchmarks/bench_password_generator.py
+"""
+Скорость генерации паролей: старая схема (список символов заново и random.choice
+на каждый символ) против PasswordGenerator.generate_many (алфавит один раз, secrets).
+
+Запуск из корня проекта:
+  python benchmarks/bench_password_generator.py            # 100k паролей длины 16
+  python benchmarks/bench_password_generator.py 50000 24   # своё количество и длина
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.paws.generator import SYMBOLS, PasswordGenerator
+
+
+def _old_generate(length: int) -> str:
+    chars = list(string.ascii_lowercase) + list(string.digits) + list(string.ascii_uppercase) + list(SYMBOLS)
+    return "".join(random.choice(chars) for _ in range(length))
+
+
+def bench_old(n: int, length: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        _old_generate(length)
+    return time.perf_counter() - t0
+
+
+def bench_generator(n: int, length: int, **opts) -> float:
+    gen = PasswordGenerator(length, **opts)
+    t0 = time.perf_counter()
+    gen.generate_many(n)
+    return time.perf_counter() - t0
+
+
+def main(n: int, length: int):
+    print(f"{n} паролей длины {length}")
+    print(f"{'variant':<34} {'s':>8} {'pw/s':>10} {'bits':>7}")
+    old = bench_old(n, length)
+    print(f"{'random.choice (old)':<34} {old:>8.3f} {n / old:>10.0f} {'-':>7}")
+    for name, opts in (("secrets", {"require_each": False}),
+                       ("secrets + все классы", {}),
+                       ("secrets + все классы, без похожих", {"exclude_ambiguous": True})):
+        dt = bench_generator(n, length, **opts)
+        bits = PasswordGenerator(length, **opts).entropy_bits
+        print(f"{name:<34} {dt:>8.3f} {n / dt:>10.0f} {bits:>7.1f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 100_000, args[1] if len(args) > 1 else 16)
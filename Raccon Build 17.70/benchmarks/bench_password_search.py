@@ -0,0 +1,80 @@
+# benchmarks/bench_password_search.py
+"""
+Поиск паролей по подстроке: проверка в SQL по service/username против TrigramIndex в памяти.
+
+Пароли в базе не расшифровываются, поэтому записи вставляются напрямую с фиктивным
+password_enc. Замеряются сам индекс (только id) и первая страница list_entries_page
+через индекс и через проверку подстроки в самом запросе (путь без индекса).
+
+Запуск из корня проекта:
+  python benchmarks/bench_password_search.py            # 10k и 100k записей
+  python benchmarks/bench_password_search.py 50000      # свои размеры
+"""
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.paws.passwords_service import PasswordsService
+from services.paws.search_index import search_text
+
+QUERIES = ("go", "mail", "bank", "acc", "user1", "xyz")
+REPEAT = 50
+
+
+def _fill(svc: PasswordsService, n: int):
+    rnd = random.Random(1)
+    words = ["google", "mail", "bank", "github", "steam", "account", "shop", "cloud", "forum", "work"]
+
+    def rows():
+        for i in range(n):
+            service = f"{rnd.choice(words)}-{''.join(rnd.choices(string.ascii_lowercase, k=6))}.com"
+            yield service, f"user{i}", "x", "", search_text(service, f"user{i}")
+
+    with svc.transaction():
+        svc.db.executemany(
+            "INSERT INTO passwords(service, username, password_enc, notes, search_text) VALUES (?, ?, ?, ?, ?)",
+            rows()
+        )
+
+
+def _page_via_index(svc: PasswordsService, q: str):
+    # сбрасываем кэш последнего запроса, чтобы каждый раз мерить поиск по индексу целиком
+    svc._search_memo = (None, -1, "[]")
+    return svc.list_entries_page(query=q, sort_by="service")
+
+
+def _timeit(fn) -> float:
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - t0) / REPEAT * 1e6
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in sizes:
+            svc = PasswordsService(None, db_path=os.path.join(tmp_dir, f"search_{n}.db"))
+            _fill(svc, n)
+            t0 = time.perf_counter()
+            svc._build_search_index()
+            print(f"\n{n} записей, индекс построен за {time.perf_counter() - t0:.3f} s")
+            print(f"{'query':>8} {'hits':>7} {'index, us':>10} {'page idx, us':>13} {'page scan, us':>14}")
+            for q in QUERIES:
+                hits = len(svc.search_index.search(q))
+                idx = _timeit(lambda: svc.search_index.search(q))
+                page_idx = _timeit(lambda: _page_via_index(svc, q))
+                svc._index_ready = False
+                page_scan = _timeit(lambda: svc.list_entries_page(query=q, sort_by="service"))
+                svc._index_ready = True
+                print(f"{q:>8} {hits:>7} {idx:>10.1f} {page_idx:>13.1f} {page_scan:>14.1f}")
+            svc.close()
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    main(sizes)
@@ -0,0 +1,52 @@
+# benchmarks/bench_vault_decrypt.py
+"""
+Расшифровка N записей: старый путь (crypto_utils.decrypt_password — вывод ключа
+и новый Fernet на каждый вызов) против VaultSession (ключ выводится один раз при unlock).
+
+Запуск из корня проекта:
+  python benchmarks/bench_vault_decrypt.py            # 10k
+  python benchmarks/bench_vault_decrypt.py 1000 50000 # свои размеры
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.paws.crypto_utils import decrypt_password
+from services.paws.vault import VaultSession
+
+MASTER = "bench-master-password"
+
+
+def _tokens(session: VaultSession, n: int):
+    return [session.encrypt(f"password-{i}") for i in range(n)]
+
+
+def bench_old(tokens) -> float:
+    t0 = time.perf_counter()
+    for token in tokens:
+        decrypt_password(MASTER, token)
+    return time.perf_counter() - t0
+
+
+def bench_session(tokens) -> float:
+    t0 = time.perf_counter()
+    session = VaultSession(MASTER)  # unlock входит в замер
+    for token in tokens:
+        session.decrypt(token)
+    return time.perf_counter() - t0
+
+
+def main(sizes):
+    print(f"{'entries':>8} {'old, s':>9} {'rows/s':>10} {'session, s':>11} {'rows/s':>10} {'x':>7}")
+    for n in sizes:
+        tokens = _tokens(VaultSession(MASTER), n)
+        old = bench_old(tokens)
+        new = bench_session(tokens)
+        print(f"{n:>8} {old:>9.3f} {n / old:>10.0f} {new:>11.3f} {n / new:>10.0f} {old / new:>7.1f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000]
+    main(sizes)
@@ -0,0 +1,93 @@
+# benchmarks/bench_wal_concurrency.py
+"""
+Нагрузочная проверка Database: несколько потоков читают, один поток пишет.
+
+Для каждого режима (обычный / WAL) считает число выполненных чтений и записей
+за фиксированное время и проверяет, что ни один поток не получил исключение,
+а каждое чтение видит согласованное состояние (счётчик строк не убывает).
+
+Запуск из корня проекта:
+  python benchmarks/bench_wal_concurrency.py [секунды] [читателей]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.db import Database
+
+
+def run(path: str, wal: bool, seconds: float, n_readers: int) -> dict:
+    db = Database(path, wal=wal, readers=n_readers)
+    db.executemany(
+        "INSERT INTO notes(title, content, tags) VALUES (?, ?, ?)",
+        ((f"seed {i}", "x" * 200, "seed") for i in range(5000))
+    )
+
+    stop = threading.Event()
+    errors = []
+    reads = [0] * n_readers
+    writes = [0]
+
+    def writer():
+        i = 0
+        try:
+            while not stop.is_set():
+                with db.transaction():
+                    for _ in range(20):
+                        db.execute("INSERT INTO notes(title, content, tags) VALUES (?, ?, ?)",
+                                   (f"w {i}", "y" * 200, "w"))
+                        i += 1
+                writes[0] += 20
+        except Exception as e:
+            errors.append(("writer", repr(e)))
+
+    def reader(k: int):
+        last = 0
+        try:
+            while not stop.is_set():
+                cnt = db.fetchone("SELECT COUNT(*) FROM notes")[0]
+                if cnt < last:
+                    errors.append((f"reader{k}", f"count went back {last} -> {cnt}"))
+                last = cnt
+                db.fetchall("SELECT id, title FROM notes WHERE tags = 'seed' ORDER BY id DESC LIMIT 200")
+                reads[k] += 1
+        except Exception as e:
+            errors.append((f"reader{k}", repr(e)))
+
+    threads = [threading.Thread(target=writer)]
+    threads += [threading.Thread(target=reader, args=(k,)) for k in range(n_readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    total = db.fetchone("SELECT COUNT(*) FROM notes")[0]
+    db.close()
+    return {"reads": sum(reads), "writes": writes[0], "rows": total, "errors": errors}
+
+
+def main(seconds: float, n_readers: int) -> int:
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for wal in (False, True):
+            path = os.path.join(tmp_dir, f"stress_{'wal' if wal else 'plain'}.db")
+            res = run(path, wal, seconds, n_readers)
+            mode = "WAL " if wal else "plain"
+            print(f"[{mode}] reads={res['reads']:>7} writes={res['writes']:>7} "
+                  f"rows={res['rows']:>7} errors={len(res['errors'])}")
+            for who, err in res["errors"][:10]:
+                print(f"    {who}: {err}")
+            failed = failed or bool(res["errors"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    secs = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    sys.exit(main(secs, readers))
@@ -1,49 +1,278 @@
+import queue
 import sqlite3
-from typing import Tuple, Iterable, Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Iterable, Iterator, Optional
+
+from services.migrations import NOTES_MIGRATIONS, Migration, apply_migrations
+from services.query_stats import QueryStats
 
 
 class Database:
-    def __init__(self, path: str):
+    """Обёртка над sqlite.
+
+    По умолчанию — одно соединение, все обращения сериализуются блокировкой.
+    При wal=True включается журнал WAL: записи идут через одно соединение-писатель,
+    а fetchall/fetchone берут соединение из небольшого пула читателей и не ждут записей.
+
+    iterate() отдаёт строки потоком пачками по arraysize, не собирая весь результат в память.
+
+    Время каждого запроса пишется в self.stats (QueryStats); track_stats=False
+    или db.stats.enabled = False отключает сбор.
+
+    Это единственная точка доступа к файлам приложения: заметки и пароли работают
+    через один экземпляр, поэтому не спорят за блокировки из двух соединений.
+    attach={"vault": "paws.db"} присоединяет отдельный файл (ATTACH) к каждому
+    соединению; у всех соединений и схем одинаковые PRAGMA из PRAGMAS (+ pragmas).
+    migrations=None — не создавать схему заметок (база только для паролей).
+    """
+
+    # применяются к каждой схеме (main и присоединённым); busy_timeout — к соединению
+    PRAGMAS = {
+        "busy_timeout": 5000,          # мс ожидания чужой блокировки вместо мгновенного "database is locked"
+        "cache_size": -16384,          # 16 МБ страничного кэша
+        "mmap_size": 64 * 1024 * 1024,
+    }
+
+    def __init__(self, path: str, wal: bool = False, readers: int = 4, track_stats: bool = True,
+                 arraysize: int = 256, attach: Optional[Dict[str, str]] = None,
+                 pragmas: Optional[Dict[str, int]] = None,
+                 migrations: Optional[Tuple[str, List[Migration]]] = ("notes", NOTES_MIGRATIONS)):
         self.path = path
-        self.conn = sqlite3.connect(self.path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self._init_schema()
-
-    def _init_schema(self):
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL DEFAULT '',
-                tags TEXT NOT NULL DEFAULT '',
-                created_at TEXT NOT NULL DEFAULT (datetime('now'))
-            )
-            """
-        )
-        self.conn.commit()
-        cur.close()
-
-    def execute(self, sql: str, params: Tuple = ()) -> None:
-        cur = self.conn.cursor()
-        cur.execute(sql, params)
-        self.conn.commit()
-        cur.close()
+        self.arraysize = arraysize
+        self.stats = QueryStats(enabled=track_stats)
+        self.pragmas = {**self.PRAGMAS, **(pragmas or {})}
+        self.attached: Dict[str, str] = {}
+        for alias, attach_path in (attach or {}).items():
+            if not alias.isidentifier() or alias.lower() in ("main", "temp"):
+                raise ValueError(f"Недопустимое имя схемы: {alias}")
+            self.attached[alias] = attach_path
+        # WAL и отдельные читатели бессмысленны для :memory: (у каждого соединения своя база)
+        self.wal = bool(wal) and path != ":memory:" and not path.startswith("file::memory:")
+        self.conn = self._connect()
+        if self.wal:
+            for schema in self.schemas():
+                self.conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+                self.conn.execute(f"PRAGMA {schema}.synchronous=NORMAL")
+
+        # писатель: одна блокировка на соединение conn; RLock — чтобы transaction() мог вызывать execute
+        self._write_lock = threading.RLock()
+        # глубина вложенности transaction(); пока > 0 — execute не коммитит
+        self._tx_depth = 0
+        self._tx_thread: Optional[int] = None
+
+        # пул читателей (только в режиме WAL), соединения создаются лениво
+        self._max_readers = max(1, int(readers))
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._readers_created = 0
+        self._readers_lock = threading.Lock()
+        self._all_readers = []
+
+        if migrations is not None:
+            self.migrate(*migrations)
+
+    def schemas(self) -> List[str]:
+        return ["main", *self.attached]
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={int(self.pragmas['busy_timeout'])}")
+        for alias, attach_path in self.attached.items():
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (attach_path,))
+        for schema in self.schemas():
+            for name, value in self.pragmas.items():
+                if name != "busy_timeout":
+                    conn.execute(f"PRAGMA {schema}.{name}={int(value)}")
+        if read_only:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def migrate(self, component: str, migrations: List[Migration], schema: str = "main") -> int:
+        """Догнать схему компонента до последней версии. Возвращает версию.
+
+        Для присоединённой схемы миграции выполняются отдельным соединением к её
+        файлу: так таблицы и schema_version создаются именно там, а SQL миграций
+        остаётся без имени схемы. Запросы без имени схемы SQLite ищет сначала в main,
+        затем в присоединённых, поэтому запросы к присоединённой схеме пишут её имя явно
+        ("vault.passwords"): в main может оказаться одноимённая старая таблица.
+        """
+        if schema == "main":
+            with self._write_lock:
+                return apply_migrations(self.conn, component, migrations)
+        conn = sqlite3.connect(self.attached[schema])
+        try:
+            conn.execute(f"PRAGMA busy_timeout={int(self.pragmas['busy_timeout'])}")
+            return apply_migrations(conn, component, migrations)
+        finally:
+            conn.close()
 
+    # ---------------- читатели ----------------
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if self._readers_created < self._max_readers:
+                self._readers_created += 1
+                conn = self._connect(read_only=True)
+                self._all_readers.append(conn)
+                return conn
+        return self._readers.get()
+
+    def _release_reader(self, conn: sqlite3.Connection):
+        self._readers.put(conn)
+
+    @contextmanager
+    def _read_conn(self):
+        # внутри своей транзакции поток должен видеть собственные незакоммиченные записи
+        if not self.wal or self._tx_thread == threading.get_ident():
+            with self._write_lock:
+                yield self.conn
+            return
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn)
+
+    # ---------------- запись ----------------
+    @contextmanager
+    def transaction(self):
+        """Группирует все записи внутри блока в одну транзакцию (один commit).
+
+        Вложенные вызовы присоединяются к внешней транзакции.
+        При исключении всё откатывается.
+        """
+        with self._write_lock:
+            if self._tx_depth:
+                self._tx_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._tx_depth -= 1
+                return
+
+            self._tx_depth = 1
+            self._tx_thread = threading.get_ident()
+            try:
+                self.conn.execute("BEGIN")
+                yield self
+            except BaseException:
+                self.conn.rollback()
+                raise
+            else:
+                self.conn.commit()
+            finally:
+                self._tx_depth = 0
+                self._tx_thread = None
+
+    def _t0(self) -> Optional[float]:
+        return time.perf_counter() if self.stats.enabled else None
+
+    def _record(self, sql: str, t0: Optional[float], rows: int):
+        if t0 is not None:
+            self.stats.record(sql, time.perf_counter() - t0, rows)
+
+    def _commit(self):
+        if not self._tx_depth:
+            self.conn.commit()
+
+    def execute(self, sql: str, params: Tuple = ()) -> Optional[int]:
+        """Выполняет запрос на запись. Возвращает lastrowid (id вставленной строки для INSERT)."""
+        t0 = self._t0()
+        with self._write_lock:
+            cur = self.conn.cursor()
+            cur.execute(sql, params)
+            self._commit()
+            rows = max(cur.rowcount, 0)
+            last_id = cur.lastrowid
+            cur.close()
+        self._record(sql, t0, rows)
+        return last_id
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Tuple]) -> int:
+        """Выполняет один запрос для множества наборов параметров одним commit.
+        Возвращает количество затронутых строк."""
+        t0 = self._t0()
+        with self._write_lock:
+            cur = self.conn.cursor()
+            try:
+                cur.executemany(sql, seq_of_params)
+                count = cur.rowcount
+                self._commit()
+            except Exception:
+                if not self._tx_depth:
+                    self.conn.rollback()
+                raise
+            finally:
+                cur.close()
+        self._record(sql, t0, max(count, 0))
+        return count
+
+    # ---------------- чтение ----------------
     def fetchall(self, sql: str, params: Tuple = ()) -> Iterable[sqlite3.Row]:
-        cur = self.conn.cursor()
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-        cur.close()
+        t0 = self._t0()
+        with self._read_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            cur.close()
+        self._record(sql, t0, len(rows))
         return rows
 
     def fetchone(self, sql: str, params: Tuple = ()) -> Optional[sqlite3.Row]:
-        cur = self.conn.cursor()
-        cur.execute(sql, params)
-        row = cur.fetchone()
-        cur.close()
+        t0 = self._t0()
+        with self._read_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            cur.close()
+        self._record(sql, t0, 1 if row is not None else 0)
         return row
 
+    def iterate(self, sql: str, params: Tuple = (), arraysize: Optional[int] = None) -> Iterator[sqlite3.Row]:
+        """Генератор строк: курсор читается через fetchmany(arraysize), в памяти одна пачка.
+
+        Соединение занято, пока генератор не исчерпан или не закрыт,
+        поэтому результат нужно дочитывать (или вызывать .close()).
+        """
+        size = arraysize or self.arraysize
+        track = self.stats.enabled
+        spent = 0.0
+        count = 0
+        with self._read_conn() as conn:
+            cur = conn.cursor()
+            cur.arraysize = size
+            try:
+                t0 = time.perf_counter() if track else 0.0
+                cur.execute(sql, params)
+                while True:
+                    chunk = cur.fetchmany(size)
+                    if track:
+                        spent += time.perf_counter() - t0
+                    if not chunk:
+                        break
+                    count += len(chunk)
+                    yield from chunk
+                    if track:
+                        t0 = time.perf_counter()
+            finally:
+                cur.close()
+                if track:
+                    self.stats.record(sql, spent, count)
+
     def close(self):
-        self.conn.close()
+        with self._readers_lock:
+            for conn in self._all_readers:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._all_readers.clear()
+            self._readers = queue.Queue()
+            self._readers_created = 0
+        with self._write_lock:
+            self.conn.close()
@@ -0,0 +1,382 @@
+# services/format_meta.py
+"""
+Форматирование заметки (notes.format_meta): для каждого стиля — набор диапазонов
+смещений [start, end) в тексте.
+
+RangeSet хранит непересекающиеся диапазоны одним отсортированным списком границ
+[s0, e0, s1, e1, ...]: чётная позиция — начало, нечётная — конец. Поэтому
+попадание в диапазон, добавление со слиянием и снятие стиля с разрезанием
+диапазона — это bisect и одна замена среза. Пересекающиеся и соседние диапазоны
+сливаются, так что повторное выделение того же фрагмента ничего не добавляет.
+
+apply_edit() сдвигает границы вслед за правкой текста по тем же правилам, что
+теги tk.Text: текст, вставленный внутрь диапазона, получает стиль, на границе — нет;
+удалённые фрагменты вырезаются из диапазонов.
+
+В базе format_meta хранится BLOB компактного формата (to_bytes / from_bytes):
+
+    blob  = MAGIC (b"\x00FM") | version u8 | блок стиля ...
+    блок  = style varint [| len varint | имя UTF-8] | ranges varint | size varint | границы
+    границы — разности соседних границ [s0, e0, s1, ...] в varint (первая — от нуля)
+
+style < len(KNOWN_STYLES) — номер стандартного стиля, style == len(KNOWN_STYLES) —
+дальше идёт имя. size позволяет пропустить блок не раскодируя: from_bytes читает
+только заголовки блоков, а границы стиля раскодируются при первом обращении к нему.
+Если все разности меньше 128, блок — просто байты разностей, и он раскодируется
+через itertools.accumulate без цикла на Python. Нулевой байт в начале не может
+быть началом JSON, поэтому старые строки с JSON-текстом читаются прозрачно (load).
+"""
+import bisect
+import json
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+MAGIC = b"\x00FM"
+FORMAT_VERSION = 1
+# стили панели форматирования кодируются номером, прочие — именем
+KNOWN_STYLES = ("bold", "italic", "underline", "strike")
+_STYLE_CODES = {name: i for i, name in enumerate(KNOWN_STYLES)}
+_NAMED = len(KNOWN_STYLES)
+
+
+class FormatMetaError(ValueError):
+    """BLOB format_meta повреждён или записан более новой версией."""
+
+
+def _put_varint(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(data, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise FormatMetaError("Обрезанное число") from None
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _decode_bounds(payload, count: int) -> List[int]:
+    n = count * 2
+    if len(payload) == n:
+        # все разности однобайтовые — байты и есть разности
+        deltas = bytes(payload)
+    else:
+        deltas = []
+        pos = 0
+        for _ in range(n):
+            d, pos = _get_varint(payload, pos)
+            deltas.append(d)
+        if pos != len(payload):
+            raise FormatMetaError("Лишние байты в блоке стиля")
+    if len(deltas) != n or 0 in deltas[1:]:
+        raise FormatMetaError("Повреждённые границы диапазонов")
+    return list(accumulate(deltas))
+
+
+class RangeSet:
+    """Непересекающиеся диапазоны [start, end) по возрастанию."""
+
+    __slots__ = ("_b",)
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = ()):
+        self._b: List[int] = []
+        for start, end in sorted(ranges):
+            self.add(start, end)
+
+    def __len__(self) -> int:
+        return len(self._b) // 2
+
+    def __bool__(self) -> bool:
+        return bool(self._b)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        b = self._b
+        return zip(b[0::2], b[1::2])
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RangeSet) and self._b == other._b
+
+    def __repr__(self) -> str:
+        return f"RangeSet({list(self)})"
+
+    @classmethod
+    def _from_bounds(cls, bounds: List[int]) -> "RangeSet":
+        # границы уже строго возрастают (проверено при раскодировании)
+        rs = cls()
+        rs._b = bounds
+        return rs
+
+    def copy(self) -> "RangeSet":
+        return RangeSet._from_bounds(list(self._b))
+
+    def contains(self, pos: int) -> bool:
+        return bisect.bisect_right(self._b, pos) % 2 == 1
+
+    def covers(self, start: int, end: int) -> bool:
+        """Весь [start, end) внутри одного диапазона."""
+        b = self._b
+        i = bisect.bisect_right(b, start)
+        return i % 2 == 1 and end <= b[i]
+
+    def clip(self, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Части диапазонов, попадающие в окно [start, end), по возрастанию."""
+        b = self._b
+        i = bisect.bisect_right(b, start)
+        if i % 2:
+            i -= 1  # start внутри диапазона — начинаем с него
+        while i < len(b) and b[i] < end:
+            yield max(b[i], start), min(b[i + 1], end)
+            i += 2
+
+    def add(self, start: int, end: int):
+        if start >= end:
+            return
+        b = self._b
+        i = bisect.bisect_left(b, start)
+        j = bisect.bisect_right(b, end)
+        # граница, попавшая внутрь существующего диапазона (или на его край), поглощается
+        b[i:j] = ([start] if i % 2 == 0 else []) + ([end] if j % 2 == 0 else [])
+
+    def remove(self, start: int, end: int):
+        if start >= end:
+            return
+        b = self._b
+        i = bisect.bisect_left(b, start)
+        j = bisect.bisect_right(b, end)
+        # внутри диапазона появляются новые конец/начало — он разрезается
+        b[i:j] = ([start] if i % 2 == 1 else []) + ([end] if j % 2 == 1 else [])
+
+    def apply_edit(self, offset: int, removed: int = 0, inserted: int = 0):
+        """Сдвинуть границы после правки: удалено removed символов с offset, затем вставлено inserted."""
+        b = self._b
+        if removed > 0:
+            end = offset + removed
+            i = bisect.bisect_right(b, offset)
+            b[i:] = [x - removed if x >= end else offset for x in b[i:]]
+            # границы, сжатые в offset, — пустые диапазоны и стыки: чётное число убираем целиком
+            p = bisect.bisect_left(b, offset)
+            q = bisect.bisect_right(b, offset)
+            del b[p + (q - p) % 2:q]
+        if inserted > 0:
+            i = bisect.bisect_left(b, offset)
+            if i < len(b) and i % 2 == 1 and b[i] == offset:
+                i += 1  # конец диапазона ровно в точке вставки остаётся на месте
+            b[i:] = [x + inserted for x in b[i:]]
+
+    def to_list(self) -> List[List[int]]:
+        b = self._b
+        return [[b[k], b[k + 1]] for k in range(0, len(b), 2)]
+
+
+class FormatMeta:
+    """Стиль -> RangeSet. Читает и пишет BLOB (to_bytes) и прежний JSON вида {"bold": [[s, e], ...], ...}."""
+
+    def __init__(self, styles: Dict[str, RangeSet] = None):
+        self._styles: Dict[str, RangeSet] = styles or {}
+        # из BLOB: стиль -> (число диапазонов, нераскодированные границы)
+        self._pending: Dict[str, Tuple[int, memoryview]] = {}
+        # исходный BLOB, пока ничего не менялось: to_bytes отдаёт его без перекодирования
+        self._raw: Optional[bytes] = None
+
+    @classmethod
+    def load(cls, value) -> "FormatMeta":
+        """Значение колонки notes.format_meta: BLOB (bytes) или прежний JSON-текст.
+        Повреждённое значение читается как пустое форматирование."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            try:
+                return cls.from_bytes(value)
+            except FormatMetaError:
+                return cls()
+        return cls.from_json(value)
+
+    @classmethod
+    def from_bytes(cls, data) -> "FormatMeta":
+        """Разобрать заголовки блоков; границы каждого стиля раскодируются при обращении к нему."""
+        data = bytes(data)
+        if data[:len(MAGIC)] != MAGIC or len(data) < len(MAGIC) + 1:
+            raise FormatMetaError("Это не BLOB format_meta")
+        version = data[len(MAGIC)]
+        if version != FORMAT_VERSION:
+            raise FormatMetaError(f"Неподдерживаемая версия format_meta: {version}")
+        view = memoryview(data)
+        pending = {}
+        pos = len(MAGIC) + 1
+        while pos < len(data):
+            code, pos = _get_varint(data, pos)
+            if code < _NAMED:
+                style = KNOWN_STYLES[code]
+            elif code == _NAMED:
+                length, pos = _get_varint(data, pos)
+                try:
+                    style = bytes(view[pos:pos + length]).decode("utf-8")
+                except UnicodeDecodeError:
+                    raise FormatMetaError("Повреждённое имя стиля") from None
+                pos += length
+            else:
+                raise FormatMetaError(f"Неизвестный код стиля: {code}")
+            count, pos = _get_varint(data, pos)
+            size, pos = _get_varint(data, pos)
+            if pos + size > len(data):
+                raise FormatMetaError("Обрезанный блок стиля")
+            if count:
+                pending[style] = (count, view[pos:pos + size])
+            pos += size
+        meta = cls()
+        meta._pending = pending
+        meta._raw = data
+        return meta
+
+    def _style(self, style: str) -> Optional[RangeSet]:
+        rs = self._styles.get(style)
+        if rs is None and style in self._pending:
+            count, payload = self._pending.pop(style)
+            try:
+                rs = RangeSet._from_bounds(_decode_bounds(payload, count))
+            except FormatMetaError:
+                # как и в load(): испорченный блок читается как отсутствие стиля
+                rs = RangeSet()
+                self._changed()
+            self._styles[style] = rs
+        return rs
+
+    def _load_all(self):
+        for style in list(self._pending):
+            self._style(style)
+
+    def _changed(self):
+        self._raw = None
+
+    @classmethod
+    def from_dict(cls, data) -> "FormatMeta":
+        """Из словаря format_meta; повторы и пересечения сливаются, испорченные записи пропускаются."""
+        styles = {}
+        if isinstance(data, dict):
+            for style, ranges in data.items():
+                parsed = []
+                for r in ranges if isinstance(ranges, list) else ():
+                    try:
+                        parsed.append((max(0, int(r[0])), int(r[1])))
+                    except (TypeError, ValueError, IndexError):
+                        continue
+                rs = RangeSet(parsed)
+                if rs:
+                    styles[str(style)] = rs
+        return cls(styles)
+
+    @classmethod
+    def from_json(cls, text) -> "FormatMeta":
+        try:
+            return cls.from_dict(json.loads(text or "{}"))
+        except (TypeError, ValueError):
+            return cls()
+
+    def __bool__(self) -> bool:
+        return bool(self._pending) or any(self._styles.values())
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FormatMeta) and self.to_dict() == other.to_dict()
+
+    def copy(self) -> "FormatMeta":
+        self._load_all()
+        return FormatMeta({s: rs.copy() for s, rs in self._styles.items() if rs})
+
+    def styles(self) -> List[str]:
+        return [s for s, rs in self._styles.items() if rs] + list(self._pending)
+
+    def ranges(self, style: str) -> RangeSet:
+        return self._style(style) or RangeSet()
+
+    def items(self) -> Iterator[Tuple[str, RangeSet]]:
+        self._load_all()
+        return ((s, rs) for s, rs in self._styles.items() if rs)
+
+    # ---------------- изменение ----------------
+    def add(self, style: str, start: int, end: int):
+        rs = self._style(style)
+        if rs is None:
+            rs = self._styles[style] = RangeSet()
+        rs.add(start, end)
+        self._changed()
+
+    def remove(self, style: str, start: int, end: int):
+        rs = self._style(style)
+        if rs is not None:
+            rs.remove(start, end)
+            self._changed()
+
+    def remove_all(self, start: int, end: int):
+        self._load_all()
+        for rs in self._styles.values():
+            rs.remove(start, end)
+        self._changed()
+
+    def toggle(self, style: str, start: int, end: int) -> bool:
+        """Снять стиль, если он уже покрывает весь фрагмент, иначе применить. True — стиль применён."""
+        if self.ranges(style).covers(start, end):
+            self.remove(style, start, end)
+            return False
+        self.add(style, start, end)
+        return True
+
+    def clear(self):
+        self._styles.clear()
+        self._pending.clear()
+        self._changed()
+
+    def apply_edit(self, offset: int, removed: int = 0, inserted: Union[int, str] = 0):
+        """Сдвиг всех стилей после правки текста; inserted — число символов или сам текст."""
+        n = inserted if isinstance(inserted, int) else len(inserted)
+        self._load_all()
+        for rs in self._styles.values():
+            rs.apply_edit(offset, removed, n)
+        self._changed()
+
+    # ---------------- сериализация ----------------
+    def to_dict(self) -> Dict[str, List[List[int]]]:
+        self._load_all()
+        return {s: rs.to_list() for s, rs in self._styles.items() if rs}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+    def to_bytes(self) -> bytes:
+        if self._raw is not None:
+            return self._raw
+        out = bytearray(MAGIC)
+        out.append(FORMAT_VERSION)
+        blocks = [(s, n, bytes(p)) for s, (n, p) in self._pending.items()]
+        for style, rs in self._styles.items():
+            if not rs:
+                continue
+            b = rs._b
+            deltas = [b[0], *(y - x for x, y in zip(b, b[1:]))]
+            if max(deltas) < 0x80:
+                payload = bytes(deltas)
+            else:
+                payload = bytearray()
+                for d in deltas:
+                    _put_varint(payload, d)
+            blocks.append((style, len(rs), payload))
+        for style, count, payload in blocks:
+            code = _STYLE_CODES.get(style)
+            if code is None:
+                name = style.encode("utf-8")
+                _put_varint(out, _NAMED)
+                _put_varint(out, len(name))
+                out += name
+            else:
+                _put_varint(out, code)
+            _put_varint(out, count)
+            _put_varint(out, len(payload))
+            out += payload
+        self._raw = bytes(out)
+        return self._raw
@@ -0,0 +1,251 @@
+# services/migrations.py
+"""
+Версионные миграции схемы.
+
+Текущая версия каждой части схемы хранится в таблице schema_version
+(component -> version), поэтому несколько компонентов могут жить в одном файле
+(например, заметки и пароли в raccon.db). Миграции выполняются один раз при
+открытии базы, каждая — в своей транзакции вместе с записью новой версии.
+
+Миграция — кортеж (version, description, step), где step — SQL-строка,
+список SQL-строк или функция step(conn).
+"""
+import sqlite3
+from typing import Callable, List, Sequence, Tuple, Union
+
+from services.paws.search_index import search_text
+from services.tags import parse_tags
+
+Step = Union[str, Sequence[str], Callable[[sqlite3.Connection], None]]
+Migration = Tuple[int, str, Step]
+
+
+def has_column(conn: sqlite3.Connection, table: str, col: str) -> bool:
+    cur = conn.execute(f"PRAGMA table_info({table})")
+    cols = {r[1] for r in cur.fetchall()}
+    cur.close()
+    return col in cols
+
+
+def get_version(conn: sqlite3.Connection, component: str) -> int:
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " component TEXT PRIMARY KEY,"
+        " version INTEGER NOT NULL,"
+        " updated_at TEXT NOT NULL DEFAULT (datetime('now')))"
+    )
+    conn.commit()
+    row = conn.execute("SELECT version FROM schema_version WHERE component = ?", (component,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def apply_migrations(conn: sqlite3.Connection, component: str, migrations: List[Migration]) -> int:
+    """Применяет все миграции новее сохранённой версии. Возвращает итоговую версию."""
+    current = get_version(conn, component)
+    for version, _description, step in sorted(migrations, key=lambda m: m[0]):
+        if version <= current:
+            continue
+        try:
+            conn.execute("BEGIN")
+            if callable(step):
+                step(conn)
+            elif isinstance(step, str):
+                conn.execute(step)
+            else:
+                for sql in step:
+                    conn.execute(sql)
+            conn.execute(
+                "INSERT INTO schema_version(component, version, updated_at) VALUES (?, ?, datetime('now')) "
+                "ON CONFLICT(component) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at",
+                (component, version)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
+
+
+def _add_column(table: str, col: str, decl: str, fill_sql: str = None):
+    """Шаг миграции: добавить колонку, если её ещё нет (старые базы без schema_version).
+
+    SQLite не даёт добавить колонку с DEFAULT-выражением в непустую таблицу —
+    тогда колонка добавляется без умолчания и заполняется fill_sql.
+    """
+    def step(conn: sqlite3.Connection):
+        if has_column(conn, table, col):
+            return
+        try:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {decl}")
+        except sqlite3.OperationalError:
+            if fill_sql is None:
+                raise
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} TEXT")
+            conn.execute(f"UPDATE {table} SET {col} = {fill_sql}")
+    return step
+
+
+def _note_tags_step(conn: sqlite3.Connection):
+    """Нормализованные теги: note_tags (тег -> заметка) и счётчики tag_counts.
+
+    Счётчики ведут триггеры на note_tags, поэтому облако тегов не требует GROUP BY.
+    Таблицы заполняются из существующих строк notes.tags.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS note_tags (
+            tag TEXT NOT NULL,
+            note_id INTEGER NOT NULL,
+            PRIMARY KEY (tag, note_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_note_tags_note ON note_tags(note_id, tag)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tag_counts (
+            tag TEXT PRIMARY KEY,
+            cnt INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS note_tags_ai AFTER INSERT ON note_tags BEGIN
+            INSERT INTO tag_counts(tag, cnt) VALUES (new.tag, 1)
+            ON CONFLICT(tag) DO UPDATE SET cnt = cnt + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS note_tags_ad AFTER DELETE ON note_tags BEGIN
+            UPDATE tag_counts SET cnt = cnt - 1 WHERE tag = old.tag;
+            DELETE FROM tag_counts WHERE tag = old.tag AND cnt <= 0;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_tags_ad AFTER DELETE ON notes BEGIN
+            DELETE FROM note_tags WHERE note_id = old.id;
+        END
+    """)
+    cur = conn.execute("SELECT id, tags FROM notes WHERE tags <> ''")
+    conn.executemany(
+        "INSERT OR IGNORE INTO note_tags(tag, note_id) VALUES (?, ?)",
+        ((t, r[0]) for r in cur for t in parse_tags(r[1]))
+    )
+
+
+def _passwords_fp_step(conn: sqlite3.Connection):
+    _add_column("passwords", "password_fp", "TEXT")(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_passwords_fp ON passwords(password_fp)")
+
+
+def _passwords_search_step(conn: sqlite3.Connection):
+    # lower() у SQLite знает только ASCII, поэтому текст для поиска считается в Python
+    _add_column("passwords", "search_text", "TEXT")(conn)
+    rows = conn.execute("SELECT id, service, username FROM passwords WHERE search_text IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE passwords SET search_text = ? WHERE id = ?", ((search_text(r[1], r[2]), r[0]) for r in rows)
+    )
+
+
+# ---------------- заметки (raccon.db) ----------------
+NOTES_MIGRATIONS: List[Migration] = [
+    (1, "notes table", """
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL DEFAULT '',
+            tags TEXT NOT NULL DEFAULT '',
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """),
+    (2, "notes.format_meta", _add_column("notes", "format_meta", "TEXT NOT NULL DEFAULT '{}'")),
+    (3, "notes_fts full-text index", [
+        # external content: текст хранится только в notes, индекс синхронизируют триггеры
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            title, tags, content,
+            content='notes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, title, tags, content) VALUES (new.id, new.title, new.tags, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, tags, content)
+            VALUES ('delete', old.id, old.title, old.tags, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, tags, content ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, tags, content)
+            VALUES ('delete', old.id, old.title, old.tags, old.content);
+            INSERT INTO notes_fts(rowid, title, tags, content) VALUES (new.id, new.title, new.tags, new.content);
+        END
+        """,
+        "INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')",
+    ]),
+    (4, "note_tags + tag_counts", _note_tags_step),
+    (5, "note_revisions history", [
+        # content — zlib: полный текст (depth = 0) или дельта к предыдущей ревизии (см. services/revisions.py)
+        """
+        CREATE TABLE IF NOT EXISTS note_revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            note_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            depth INTEGER NOT NULL,
+            title TEXT,
+            tags TEXT,
+            format_meta BLOB,
+            content BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            state_crc INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_note_revisions_note ON note_revisions(note_id, id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_revisions_ad AFTER DELETE ON notes BEGIN
+            DELETE FROM note_revisions WHERE note_id = old.id;
+        END
+        """,
+    ]),
+]
+
+
+# ---------------- пароли (paws.db) ----------------
+PAWS_MIGRATIONS: List[Migration] = [
+    (1, "passwords table", """
+        CREATE TABLE IF NOT EXISTS passwords (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service TEXT NOT NULL,
+            username TEXT,
+            password_enc TEXT NOT NULL,
+            notes TEXT
+        )
+    """),
+    (2, "passwords.created_at",
+     _add_column("passwords", "created_at", "TEXT DEFAULT (datetime('now'))", "datetime('now')")),
+    (3, "passwords.updated_at",
+     _add_column("passwords", "updated_at", "TEXT DEFAULT (datetime('now'))", "datetime('now')")),
+    (4, "sort indexes for keyset pagination", [
+        # выражения должны совпадать с PasswordsService.SORT_EXPR, иначе планировщик не возьмёт индекс
+        "CREATE INDEX IF NOT EXISTS idx_passwords_service ON passwords(service, id)",
+        "CREATE INDEX IF NOT EXISTS idx_passwords_username ON passwords(IFNULL(username, ''), id)",
+        "CREATE INDEX IF NOT EXISTS idx_passwords_notes ON passwords(IFNULL(notes, ''), id)",
+        "CREATE INDEX IF NOT EXISTS idx_passwords_created ON passwords(IFNULL(created_at, ''), id)",
+        "CREATE INDEX IF NOT EXISTS idx_passwords_updated ON passwords(IFNULL(updated_at, ''), id)",
+    ]),
+    # параметры KDF (JSON с солью и стоимостью) и проверочный токен; пусто — старое хранилище без соли
+    (5, "vault_meta", """
+        CREATE TABLE IF NOT EXISTS vault_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """),
+    # HMAC(ключ хранилища, пароль) для поиска повторов без расшифровки;
+    # у старых строк NULL — заполняется при следующем unlock
+    (6, "passwords.password_fp", _passwords_fp_step),
+    # service и username в нижнем регистре (как в TrigramIndex) для поиска подстроки без индекса в памяти
+    (7, "passwords.search_text", _passwords_search_step),
+]
@@ -1,73 +1,251 @@
 # services/notes_service.py
-import json
+import difflib
 import html
 import os
-from typing import List, Tuple, Optional
+import re
+import sqlite3
+from typing import Iterable, Iterator, List, Tuple, Optional
 from datetime import datetime
 from services.db import Database
+from services.format_meta import FormatMeta
+from services.revisions import RevisionStore
+from services.tags import parse_tags
+
+_EMPTY_FORMAT_META = FormatMeta().to_bytes()
 
 
 class NotesService:
     def __init__(self, db: Database):
+        # схема (в т.ч. колонка format_meta) создаётся миграциями при открытии Database
         self.db = db
-        self._ensure_format_meta()
-
-    def _ensure_format_meta(self):
-        try:
-            self.db.execute("ALTER TABLE notes ADD COLUMN format_meta TEXT NOT NULL DEFAULT '{}'")
-        except Exception:
-            pass
+        # история правок: каждое сохранение через update_note пишет ревизию
+        self.revisions = RevisionStore(db)
 
-    def create_note(self, title: str, content: str = "", tags: str = "", format_meta: str = "{}") -> None:
+    def create_note(self, title: str, content: str = "", tags: str = "",
+                    format_meta: FormatMeta | bytes | str | dict = "{}") -> int:
         fm = self._normalize_format_meta(format_meta)
-        self.db.execute(
-            "INSERT INTO notes(title, content, tags, format_meta, created_at) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
-            (title, content, tags, fm)
+        with self.db.transaction():
+            note_id = self.db.execute(
+                "INSERT INTO notes(title, content, tags, format_meta, created_at) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                (title, content, tags, fm)
+            )
+            self._set_tags(note_id, tags, new=True)
+        return note_id
+
+    def create_notes(self, notes: Iterable[Tuple]) -> int:
+        """Массовое создание заметок одной транзакцией.
+        Элементы: (title, content, tags) или (title, content, tags, format_meta)."""
+        count = 0
+        with self.db.transaction():
+            for n in notes:
+                title, content, tags = n[0], n[1] or "", n[2] or ""
+                fm = self._normalize_format_meta(n[3] if len(n) > 3 else "{}")
+                note_id = self.db.execute(
+                    "INSERT INTO notes(title, content, tags, format_meta, created_at) "
+                    "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                    (title, content, tags, fm)
+                )
+                self._set_tags(note_id, tags, new=True)
+                count += 1
+        return count
+
+    # ---------------- теги ----------------
+    def _set_tags(self, note_id: int, tags: str, new: bool = False) -> None:
+        """Синхронизирует note_tags с notes.tags: пишет только добавленные и удалённые теги
+        (счётчики tag_counts при этом обновляют триггеры)."""
+        wanted = parse_tags(tags)
+        if new:
+            current = set()
+        else:
+            current = {r[0] for r in self.db.fetchall("SELECT tag FROM note_tags WHERE note_id = ?", (note_id,))}
+        removed = current.difference(wanted)
+        added = [t for t in wanted if t not in current]
+        if removed:
+            self.db.executemany("DELETE FROM note_tags WHERE tag = ? AND note_id = ?",
+                                ((t, note_id) for t in removed))
+        if added:
+            self.db.executemany("INSERT OR IGNORE INTO note_tags(tag, note_id) VALUES (?, ?)",
+                                ((t, note_id) for t in added))
+
+    def iter_notes_by_tags(self, tags: Iterable[str], mode: str = "all",
+                           arraysize: Optional[int] = None, last_id: Optional[int] = None,
+                           limit: Optional[int] = None) -> Iterator[sqlite3.Row]:
+        """Заметки (id, title, tags, created_at) по точному совпадению тегов, id по убыванию.
+        mode="all" — пересечение (есть все теги), mode="any" — объединение (есть хотя бы один).
+        last_id/limit — keyset-страница, как в get_notes_page."""
+        wanted = parse_tags(",".join(tags))
+        if not wanted:
+            return iter(())
+        marks = ", ".join("?" * len(wanted))
+        if mode == "any":
+            sub = f"SELECT note_id FROM note_tags WHERE tag IN ({marks})"
+            params = [*wanted]
+        elif mode == "all":
+            sub = f"SELECT note_id FROM note_tags WHERE tag IN ({marks}) GROUP BY note_id HAVING COUNT(*) = ?"
+            params = [*wanted, len(wanted)]
+        else:
+            raise ValueError(f"Неизвестный режим: {mode}")
+        sql = f"SELECT id, title, tags, created_at FROM notes WHERE id IN ({sub})"
+        if last_id is not None:
+            sql += " AND id < ?"
+            params.append(last_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        return self.db.iterate(sql, tuple(params), arraysize)
+
+    def notes_by_tag(self, tag: str) -> List[Tuple]:
+        return [tuple(r) for r in self.iter_notes_by_tags([tag])]
+
+    def notes_by_tags(self, tags: Iterable[str], mode: str = "all") -> List[Tuple]:
+        return [tuple(r) for r in self.iter_notes_by_tags(tags, mode)]
+
+    def tag_counts(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Облако тегов: (тег, число заметок), самые частые сверху. Счётчики готовы заранее."""
+        rows = self.db.fetchall(
+            "SELECT tag, cnt FROM tag_counts ORDER BY cnt DESC, tag LIMIT ?",
+            (-1 if limit is None else limit,)
         )
+        return [(r[0], r[1]) for r in rows]
+
+    def iter_all_notes(self, arraysize: Optional[int] = None) -> Iterator[sqlite3.Row]:
+        """Потоковый вариант get_all_notes: строки (id, title, tags, created_at) по мере чтения."""
+        return self.db.iterate("SELECT id, title, tags, created_at FROM notes ORDER BY id DESC", (), arraysize)
 
     def get_all_notes(self) -> List[Tuple]:
-        rows = self.db.fetchall("SELECT id, title, tags, created_at FROM notes ORDER BY id DESC")
-        return [tuple(r) for r in rows] if rows else []
+        return [tuple(r) for r in self.iter_all_notes()]
 
-    def get_note_by_id(self, note_id: int) -> Optional[Tuple]:
-        # Попробовать получить формат_meta вместе с остальными полями
-        try:
-            row = self.db.fetchone(
-                "SELECT id, title, content, tags, created_at, COALESCE(format_meta, '{}') as format_meta FROM notes WHERE id = ?",
-                (note_id,)
+    def get_notes_page(self, last_id: Optional[int] = None, limit: int = 200) -> List[Tuple]:
+        """Keyset-страница в порядке get_all_notes (id по убыванию): заметки с id < last_id.
+        Первая страница — last_id=None; для следующей передаётся id последней строки."""
+        if last_id is None:
+            rows = self.db.fetchall(
+                "SELECT id, title, tags, created_at FROM notes ORDER BY id DESC LIMIT ?", (limit,)
             )
-            if row:
-                return tuple(row)
-            return None
-        except Exception:
-            # Если схема старая и column missing — вернуть 6-элементный кортеж с дефолтом
-            row = self.db.fetchone(
-                "SELECT id, title, content, tags, created_at FROM notes WHERE id = ?",
-                (note_id,)
+        else:
+            rows = self.db.fetchall(
+                "SELECT id, title, tags, created_at FROM notes WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (last_id, limit)
             )
-            if row:
-                vals = tuple(row)
-                return (*vals, "{}")
-            return None
+        return [tuple(r) for r in rows]
 
-    def search_notes(self, query: str) -> List[Tuple]:
-        q = f"%{query}%"
-        rows = self.db.fetchall(
-            "SELECT id, title, tags, created_at FROM notes WHERE title LIKE ? OR tags LIKE ? ORDER BY id DESC",
-            (q, q)
+    def get_note_by_id(self, note_id: int) -> Optional[Tuple]:
+        """(id, title, content, tags, created_at, format_meta); format_meta — значение колонки
+        как есть (BLOB или JSON старых записей), читать через FormatMeta.load."""
+        row = self.db.fetchone(
+            "SELECT id, title, content, tags, created_at, format_meta FROM notes WHERE id = ?",
+            (note_id,)
+        )
+        return tuple(row) if row else None
+
+    # вес колонок для bm25: совпадение в заголовке важнее, чем в тегах и тексте
+    _BM25 = "bm25(notes_fts, 10.0, 5.0, 1.0)"
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Пользовательский ввод -> выражение FTS5: каждое слово как префикс, все слова обязательны."""
+        words = re.findall(r"\w+", query or "")
+        return " ".join(f'"{w}"*' for w in words)
+
+    def iter_search_ranked(self, query: str, limit: Optional[int] = None, offset: int = 0,
+                           arraysize: Optional[int] = None, mark: Tuple[str, str] = ("[", "]")
+                           ) -> Iterator[sqlite3.Row]:
+        """Полнотекстовый поиск по заголовку, тегам и тексту в порядке bm25.
+        Строки: (id, title, tags, created_at, snippet), найденные слова в snippet обрамлены mark."""
+        match = self._fts_query(query)
+        if not match:
+            return iter(())
+        return self.db.iterate(
+            "SELECT n.id, n.title, n.tags, n.created_at, "
+            "snippet(notes_fts, -1, ?, ?, '…', 12) AS snippet "
+            "FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid "
+            f"WHERE notes_fts MATCH ? ORDER BY {self._BM25} LIMIT ? OFFSET ?",
+            (mark[0], mark[1], match, -1 if limit is None else limit, offset), arraysize
+        )
+
+    def search_notes_ranked(self, query: str, limit: Optional[int] = 100, offset: int = 0) -> List[Tuple]:
+        return [tuple(r) for r in self.iter_search_ranked(query, limit, offset)]
+
+    def iter_search_notes(self, query: str, arraysize: Optional[int] = None) -> Iterator[sqlite3.Row]:
+        match = self._fts_query(query)
+        if not match:
+            return iter(())
+        return self.db.iterate(
+            "SELECT n.id, n.title, n.tags, n.created_at "
+            "FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid "
+            f"WHERE notes_fts MATCH ? ORDER BY {self._BM25}",
+            (match,), arraysize
         )
-        return [tuple(r) for r in rows] if rows else []
 
-    def update_note(self, note_id: int, title: str, content: str, tags: str, format_meta: str = "{}") -> None:
+    def search_notes(self, query: str) -> List[Tuple]:
+        return [tuple(r) for r in self.iter_search_notes(query)]
+
+    def update_note(self, note_id: int, title: str, content: str, tags: str,
+                    format_meta: FormatMeta | bytes | str | dict = "{}") -> None:
         fm = self._normalize_format_meta(format_meta)
-        self.db.execute(
-            "UPDATE notes SET title = ?, content = ?, tags = ?, format_meta = ? WHERE id = ?",
-            (title, content, tags, fm, note_id)
+        with self.db.transaction():
+            old = self.db.fetchone("SELECT title, content, tags, format_meta FROM notes WHERE id = ?", (note_id,))
+            if old is not None:
+                self.revisions.record(
+                    note_id,
+                    (old["title"], old["content"], old["tags"], self._normalize_format_meta(old["format_meta"])),
+                    (title, content, tags, fm)
+                )
+            self.db.execute(
+                "UPDATE notes SET title = ?, content = ?, tags = ?, format_meta = ? WHERE id = ?",
+                (title, content, tags, fm, note_id)
+            )
+            self._set_tags(note_id, tags)
+
+    # ---------------- история правок ----------------
+    def list_revisions(self, note_id: int) -> List[Tuple]:
+        """Ревизии заметки от новых к старым: (id, created_at, длина текста, снимок ли)."""
+        return self.revisions.history(note_id)
+
+    def get_revision(self, note_id: int, rev_id: int) -> Tuple[str, str, str, bytes]:
+        """(title, content, tags, format_meta) версии rev_id; format_meta читать через FormatMeta.load."""
+        return self.revisions.get(note_id, rev_id)
+
+    def diff_revisions(self, note_id: int, old_rev: int, new_rev: Optional[int] = None) -> str:
+        """Unified diff текста между ревизиями; new_rev=None — с текущей версией заметки."""
+        old_title, old_content, _, _ = self.revisions.get(note_id, old_rev)
+        if new_rev is None:
+            note = self.get_note_by_id(note_id)
+            if not note:
+                raise ValueError("Заметка не найдена")
+            new_title, new_content, new_label = note[1], note[2], "текущая"
+        else:
+            new_title, new_content, _, _ = self.revisions.get(note_id, new_rev)
+            new_label = f"ревизия {new_rev}"
+        lines = []
+        if old_title != new_title:
+            lines.append(f"Заголовок: {old_title} -> {new_title}\n")
+        lines += difflib.unified_diff(
+            old_content.splitlines(keepends=True), new_content.splitlines(keepends=True),
+            fromfile=f"ревизия {old_rev}", tofile=new_label
         )
+        return "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+
+    def restore_revision(self, note_id: int, rev_id: int) -> None:
+        """Вернуть заметку к версии rev_id. Восстановление само становится новой ревизией."""
+        title, content, tags, fm = self.revisions.get(note_id, rev_id)
+        self.update_note(note_id, title, content, tags, fm)
+
+    def compact_revisions(self, note_id: Optional[int] = None, keep: Optional[int] = None,
+                          older_than_days: Optional[int] = None) -> int:
+        """Проредить историю одной заметки или всех: последние keep ревизий, не старше
+        older_than_days (последняя остаётся всегда). Возвращает число удалённых ревизий."""
+        if note_id is not None:
+            return self.revisions.compact(note_id, keep, older_than_days)
+        note_ids = [r[0] for r in self.db.fetchall("SELECT DISTINCT note_id FROM note_revisions")]
+        return sum(self.revisions.compact(i, keep, older_than_days) for i in note_ids)
 
     def delete_note(self, note_id: int) -> None:
         self.db.execute("DELETE FROM notes WHERE id = ?", (note_id,))
 
+    def delete_notes(self, note_ids: Iterable[int]) -> int:
+        with self.db.transaction():
+            return self.db.executemany("DELETE FROM notes WHERE id = ?", ((i,) for i in note_ids))
+
     def export_note_md(self, note_id: int, path: str) -> None:
         note = self.get_note_by_id(note_id)
         if not note:
@@ -126,18 +304,19 @@ hr {{ margin: 1rem 0; }}
         with open(path, "w", encoding="utf-8") as f:
             f.write(html_doc)
 
-    def _normalize_format_meta(self, fm) -> str:
-        if fm is None:
-            return "{}"
+    def _normalize_format_meta(self, fm) -> bytes:
+        """format_meta для записи в базу — BLOB services.format_meta (FormatMeta.to_bytes).
+
+        Принимает FormatMeta, BLOB, словарь или прежний JSON; повторы и пересечения
+        диапазонов сливаются, испорченные записи отбрасываются. Неизменённый BLOB
+        (FormatMeta.load без правок) пишется как есть, без перекодирования.
+        """
+        if fm is None or fm == "{}" or fm == "":
+            return _EMPTY_FORMAT_META
+        if isinstance(fm, FormatMeta):
+            return fm.to_bytes()
         if isinstance(fm, dict):
-            try:
-                return json.dumps(fm, ensure_ascii=False)
-            except Exception:
-                return "{}"
-        if isinstance(fm, str):
-            try:
-                json.loads(fm)
-                return fm
-            except Exception:
-                return "{}"
-        return "{}"
+            return FormatMeta.from_dict(fm).to_bytes()
+        if isinstance(fm, (str, bytes, bytearray, memoryview)):
+            return FormatMeta.load(fm).to_bytes()
+        return _EMPTY_FORMAT_META
@@ -0,0 +1,261 @@
+# services/paws/audit.py
+"""
+Аудит стойкости паролей хранилища.
+
+score_password() оценивает один пароль: длина, классы символов, энтропия
+(по размеру алфавита за вычетом найденных шаблонов), словарные и клавиатурные
+шаблоны, возраст по updated_at. PasswordAuditor проходит всё хранилище:
+расшифровка и оценка идут в пуле потоков, результаты отдаются по мере готовности,
+а для записей, у которых не изменился updated_at, берутся из кэша.
+"""
+import math
+import os
+import re
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# самые частые пароли и слова из утечек; проверяются после «расшифровки» leet-замен
+COMMON_WORDS = frozenset("""
+password passw0rd qwerty letmein welcome admin administrator login master secret dragon monkey
+football baseball soccer hockey shadow sunshine princess iloveyou trustno1 superman batman
+starwars whatever freedom michael jessica charlie ashley hunter killer pepper ginger summer
+winter spring autumn hello test guest root user default changeme abc love money family
+пароль привет любовь админ секрет
+""".split())
+MIN_WORD = 4
+
+SEQUENCES = (
+    "abcdefghijklmnopqrstuvwxyz",
+    "0123456789",
+    "qwertyuiop", "asdfghjkl", "zxcvbnm",
+    "1qaz2wsx3edc", "qazwsxedc",
+    "йцукенгшщзхъ", "фывапролджэ", "ячсмитьбю",
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+)
+MIN_SEQUENCE = 4
+
+_LEET = str.maketrans({"0": "o", "1": "l", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s", "!": "i"})
+_REPEAT_RE = re.compile(r"(.)\1{2,}")
+_REPEAT_CHUNK_RE = re.compile(r"(.{2,}?)\1+")
+_YEAR_RE = re.compile(r"(19|20)\d\d")
+_DATE_RE = re.compile(r"\d{1,2}[./-]?\d{1,2}[./-]?(19|20)?\d\d")
+
+SYMBOLS = set(string.punctuation + " ")
+
+# пороги оценки по эффективной энтропии, бит: 0 — очень слабый … 4 — сильный
+SCORE_BITS = (28, 36, 60, 80)
+MAX_AGE_DAYS = 365
+
+
+def _charset_size(pwd: str) -> int:
+    size = 0
+    if any(c in string.ascii_lowercase for c in pwd):
+        size += 26
+    if any(c in string.ascii_uppercase for c in pwd):
+        size += 26
+    if any(c in string.digits for c in pwd):
+        size += 10
+    if any(c in SYMBOLS for c in pwd):
+        size += len(SYMBOLS)
+    if any(not c.isascii() for c in pwd):
+        size += 66  # кириллица и прочее — грубо, как строчные+заглавные русского алфавита
+    return max(size, 1)
+
+
+def _classes(pwd: str) -> List[str]:
+    out = []
+    if any(c.islower() for c in pwd):
+        out.append("lower")
+    if any(c.isupper() for c in pwd):
+        out.append("upper")
+    if any(c.isdigit() for c in pwd):
+        out.append("digits")
+    if any(c in SYMBOLS for c in pwd):
+        out.append("symbols")
+    return out
+
+
+def _find_patterns(pwd: str) -> List[tuple]:
+    """Шаблоны в пароле: (вид, найденный фрагмент). Каждый фрагмент почти не добавляет энтропии."""
+    low = pwd.lower()
+    norm = low.translate(_LEET)
+    found = []
+
+    if norm in COMMON_WORDS or low in COMMON_WORDS:
+        return [("common", pwd)]
+    for word in COMMON_WORDS:
+        if len(word) >= MIN_WORD and word in norm:
+            found.append(("dictionary", word))
+
+    for seq in SEQUENCES:
+        for source in (seq, seq[::-1]):
+            best = ""
+            for i in range(len(low) - MIN_SEQUENCE + 1):
+                j = i + MIN_SEQUENCE
+                if low[i:j] not in source:
+                    continue
+                while j < len(low) and low[i:j + 1] in source:
+                    j += 1
+                if j - i > len(best):
+                    best = low[i:j]
+            if best:
+                found.append(("sequence", best))
+
+    for m in _REPEAT_RE.finditer(pwd):
+        found.append(("repeat", m.group(0)))
+    m = _REPEAT_CHUNK_RE.fullmatch(pwd)
+    if m:
+        found.append(("repeat", pwd))
+    for rx, kind in ((_DATE_RE, "date"), (_YEAR_RE, "year")):
+        for m in rx.finditer(pwd):
+            if len(m.group(0)) >= 4:
+                found.append((kind, m.group(0)))
+                break
+    return found
+
+
+def _age_days(updated_at: Optional[str], now: datetime) -> Optional[int]:
+    if not updated_at:
+        return None
+    try:
+        # sqlite datetime('now') — UTC в формате 'YYYY-MM-DD HH:MM:SS'
+        ts = datetime.strptime(updated_at[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return max(0, (now - ts).days)
+
+
+def score_password(pwd: str, updated_at: Optional[str] = None, now: Optional[datetime] = None,
+                   max_age_days: int = MAX_AGE_DAYS) -> dict:
+    """Оценка одного пароля: score 0..4, энтропия в битах, найденные шаблоны и список замечаний."""
+    now = now or datetime.now(timezone.utc)
+    length = len(pwd)
+    classes = _classes(pwd)
+    per_char = math.log2(_charset_size(pwd)) if pwd else 0.0
+    patterns = _find_patterns(pwd)
+
+    # символы внутри шаблона считаем почти предсказуемыми: ~1 бит на символ вместо log2(алфавита)
+    covered = set()
+    for _kind, frag in patterns:
+        start = pwd.lower().translate(_LEET).find(frag)
+        if start < 0:
+            start = pwd.lower().find(frag)
+        if start >= 0:
+            covered.update(range(start, start + len(frag)))
+    if any(kind == "common" for kind, _ in patterns):
+        covered = set(range(length))
+    entropy = per_char * (length - len(covered)) + 1.0 * len(covered)
+
+    score = sum(entropy >= t for t in SCORE_BITS)
+    age = _age_days(updated_at, now)
+
+    issues = []
+    if length < 12:
+        issues.append(f"короткий ({length})")
+    if len(classes) < 3:
+        issues.append("мало классов символов")
+    for kind, frag in patterns:
+        issues.append({"common": "частый пароль", "dictionary": f"слово «{frag}»",
+                       "sequence": f"последовательность «{frag}»", "repeat": f"повтор «{frag}»",
+                       "date": "дата", "year": "год"}[kind])
+    if age is not None and age > max_age_days:
+        issues.append(f"не менялся {age} дн.")
+
+    return {
+        "score": score,
+        "length": length,
+        "classes": classes,
+        "entropy_bits": round(entropy, 1),
+        "patterns": [kind for kind, _ in patterns],
+        "age_days": age,
+        "issues": issues,
+    }
+
+
+class PasswordAuditor:
+    """Аудит всех записей PasswordsService с кэшем по (id, updated_at).
+
+    Записи читаются из базы кусками в вызывающем потоке; расшифровка и оценка
+    идут в пуле. iter_results() отдаёт результаты по мере готовности: сначала
+    неизменившиеся записи из кэша, затем пересчитанные — в порядке завершения.
+    audit_batch() делает то же для одного куска (keyset по id): UI вызывает его
+    повторно, не занимая однопоточный исполнитель на весь аудит.
+    Открытый текст в результат и в кэш не попадает.
+    """
+
+    def __init__(self, service, workers: Optional[int] = None, chunk_size: int = 256):
+        self.service = service
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self._cache: Dict[int, tuple] = {}  # id -> (updated_at, result)
+        self._lock = threading.Lock()
+
+    def invalidate(self, entry_id: Optional[int] = None):
+        with self._lock:
+            if entry_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(entry_id, None)
+
+    def _score(self, row) -> tuple:
+        plain = self.service.session.decrypt(row["password_enc"])
+        result = score_password(plain, row["updated_at"])
+        result.update(id=row["id"], service=row["service"], username=row["username"] or "",
+                      updated_at=row["updated_at"] or "")
+        return row["updated_at"], result
+
+    def _iter_rows(self, rows, pool: ThreadPoolExecutor, cancel: Optional[threading.Event]) -> Iterator[dict]:
+        futures = []
+        for row in rows:
+            with self._lock:
+                cached = self._cache.get(row["id"])
+            if cached is not None and cached[0] == row["updated_at"]:
+                yield dict(cached[1])
+            else:
+                futures.append(pool.submit(self._score, row))
+        for fut in as_completed(futures):
+            updated_at, result = fut.result()
+            with self._lock:
+                self._cache[result["id"]] = (updated_at, result)
+            yield dict(result)
+            if cancel is not None and cancel.is_set():
+                for f in futures:
+                    f.cancel()
+                return
+
+    def _prune(self, after_id: int, last_id: Optional[int], seen: set):
+        # записи из (after_id, last_id], которых не оказалось в куске, удалены — убираем из кэша
+        with self._lock:
+            for entry_id in [i for i in self._cache
+                             if i > after_id and (last_id is None or i <= last_id) and i not in seen]:
+                del self._cache[entry_id]
+
+    def iter_results(self, cancel: Optional[threading.Event] = None) -> Iterator[dict]:
+        seen = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="raccon-audit") as pool:
+            for rows in self.service.iter_secret_rows(self.chunk_size):
+                if cancel is not None and cancel.is_set():
+                    return
+                seen.update(row["id"] for row in rows)
+                for result in self._iter_rows(rows, pool, cancel):
+                    yield result
+                    if cancel is not None and cancel.is_set():
+                        return
+        self._prune(0, None, seen)
+
+    def audit_batch(self, after_id: int = 0,
+                    cancel: Optional[threading.Event] = None) -> Tuple[List[dict], Optional[int]]:
+        """Оценки записей с id > after_id, не больше chunk_size. Возвращает (оценки, id последней
+        записи куска); None — дальше записей нет. Следующий кусок — audit_batch(этот id)."""
+        rows = self.service.secret_rows_after(after_id, self.chunk_size)
+        last_id = rows[-1]["id"] if rows else None
+        if cancel is not None and cancel.is_set():
+            return [], last_id
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="raccon-audit") as pool:
+            results = list(self._iter_rows(rows, pool, cancel))
+        if cancel is None or not cancel.is_set():
+            self._prune(after_id, last_id, {row["id"] for row in rows})
+        return results, last_id
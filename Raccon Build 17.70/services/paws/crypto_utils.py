@@ -1,11 +1,109 @@
 from cryptography.fernet import Fernet
-import base64, hashlib
+import base64, hashlib, math, os, time
 
-def derive_key(master_password: str) -> bytes:
-    """Из мастер-пароля делаем ключ для Fernet (через SHA256)."""
-    digest = hashlib.sha256(master_password.encode()).digest()
+# Параметры KDF хранятся в vault_meta как словарь:
+#   {"kdf": "scrypt", "salt": hex, "n": 2**16, "r": 8, "p": 1}
+#   {"kdf": "pbkdf2_sha256", "salt": hex, "iterations": 600000}   — если в OpenSSL нет scrypt
+#   {"kdf": "sha256"}                                              — старые хранилища без соли
+LEGACY_KDF = {"kdf": "sha256"}
+# мастер-пароль, который старые сборки подставляли сами; пользователи его не выбирали
+LEGACY_MASTER_PASSWORD = "secret123"
+
+SALT_BYTES = 16
+SCRYPT_R, SCRYPT_P = 8, 1
+# n = 2**17 при r = 8 — 128 МБ памяти на вывод ключа; больше не берём, иначе хранилище
+# не откроется на машине со скромной памятью. Дальше время добирается через p:
+# hashlib считает p блоков последовательно, память от p почти не растёт
+SCRYPT_MIN_LOG2N, SCRYPT_MAX_LOG2N = 14, 17
+SCRYPT_MAX_P = 8
+PBKDF2_MIN_ITERATIONS, PBKDF2_MAX_ITERATIONS = 200_000, 5_000_000
+
+
+def _scrypt_maxmem(n: int, r: int, p: int) -> int:
+    # OpenSSL требует ровно 128*r*(n+p+2) байт и по умолчанию разрешает только 32 МБ
+    return 128 * r * (n + p + 2) + (1 << 16)
+
+
+def derive_key(master_password: str, params: dict | None = None) -> bytes:
+    """Из мастер-пароля делаем ключ для Fernet по параметрам хранилища.
+    Без параметров — старая схема (один SHA256 без соли)."""
+    params = params or LEGACY_KDF
+    kdf = params.get("kdf", "sha256")
+    pw = master_password.encode()
+    if kdf == "scrypt":
+        n, r, p = int(params["n"]), int(params["r"]), int(params["p"])
+        digest = hashlib.scrypt(pw, salt=bytes.fromhex(params["salt"]), n=n, r=r, p=p,
+                                maxmem=_scrypt_maxmem(n, r, p), dklen=32)
+    elif kdf == "pbkdf2_sha256":
+        digest = hashlib.pbkdf2_hmac("sha256", pw, bytes.fromhex(params["salt"]), int(params["iterations"]))
+    elif kdf == "sha256":
+        digest = hashlib.sha256(pw).digest()
+    else:
+        raise ValueError(f"Неизвестный KDF: {kdf}")
     return base64.urlsafe_b64encode(digest)
 
+
+def calibrate_kdf(target_seconds: float = 0.25) -> dict:
+    """Подбирает стоимость KDF так, чтобы вывод ключа на этой машине занимал ~target_seconds.
+    Возвращает параметры с новой случайной солью."""
+    salt = os.urandom(SALT_BYTES).hex()
+    if hasattr(hashlib, "scrypt"):
+        # время scrypt линейно по n: замеряем минимальную стоимость и масштабируем до степени двойки
+        n0 = 1 << SCRYPT_MIN_LOG2N
+        t0 = time.perf_counter()
+        derive_key("calibration", {"kdf": "scrypt", "salt": salt, "n": n0, "r": SCRYPT_R, "p": SCRYPT_P})
+        spent = max(time.perf_counter() - t0, 1e-6)
+        log2n = SCRYPT_MIN_LOG2N + round(math.log2(max(target_seconds / spent, 1.0)))
+        # сверх потолка по памяти время растёт через p (линейно, как и по n)
+        p = max(SCRYPT_P, min(SCRYPT_MAX_P, 1 << max(0, log2n - SCRYPT_MAX_LOG2N)))
+        log2n = max(SCRYPT_MIN_LOG2N, min(SCRYPT_MAX_LOG2N, log2n))
+        return {"kdf": "scrypt", "salt": salt, "n": 1 << log2n, "r": SCRYPT_R, "p": p}
+
+    probe = 50_000
+    t0 = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"calibration", bytes.fromhex(salt), probe)
+    spent = max(time.perf_counter() - t0, 1e-6)
+    iterations = max(PBKDF2_MIN_ITERATIONS, min(PBKDF2_MAX_ITERATIONS, int(probe * target_seconds / spent)))
+    return {"kdf": "pbkdf2_sha256", "salt": salt, "iterations": iterations}
+
+
+def _int_in(params: dict, key: str, low: int, high: int) -> int:
+    value = params.get(key)
+    # bool — тоже int, но в параметрах KDF это всегда ошибка
+    if type(value) is not int or not low <= value <= high:
+        raise ValueError(f"Недопустимый параметр KDF {key}: {value!r}")
+    return value
+
+
+def check_kdf(params) -> dict:
+    """Проверить параметры KDF из недоверенного источника (заголовок файла экспорта).
+
+    Допускается только то, что может выдать calibrate_kdf: иначе подобранный
+    файл заставит derive_key занять гигабайты памяти или считать часами.
+    Возвращает params; при ошибке — ValueError.
+    """
+    if not isinstance(params, dict):
+        raise ValueError("Параметры KDF должны быть словарём")
+    salt = params.get("salt")
+    try:
+        if not isinstance(salt, str) or len(bytes.fromhex(salt)) != SALT_BYTES:
+            raise ValueError
+    except ValueError:
+        raise ValueError("Недопустимая соль KDF") from None
+    kdf = params.get("kdf")
+    if kdf == "scrypt":
+        n = _int_in(params, "n", 1 << SCRYPT_MIN_LOG2N, 1 << SCRYPT_MAX_LOG2N)
+        if n & (n - 1):
+            raise ValueError(f"Недопустимый параметр KDF n: {n}")
+        _int_in(params, "r", SCRYPT_R, SCRYPT_R)
+        _int_in(params, "p", SCRYPT_P, SCRYPT_MAX_P)
+    elif kdf == "pbkdf2_sha256":
+        _int_in(params, "iterations", PBKDF2_MIN_ITERATIONS, PBKDF2_MAX_ITERATIONS)
+    else:
+        raise ValueError(f"Недопустимый KDF: {kdf!r}")
+    return params
+
+
 def encrypt_password(master_password: str, plain: str) -> str:
     key = derive_key(master_password)
     f = Fernet(key)
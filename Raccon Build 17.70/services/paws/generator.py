@@ -1,11 +1,99 @@
-import random, string
+import math
+import secrets
+import string
+from typing import Iterator, List, Optional
+
+SYMBOLS = "!@#$%^&*()-_=+[]{};:,.<>?"
+# символы, которые легко перепутать при чтении или ручном вводе
+AMBIGUOUS = "Il1O0o|`'\""
+
+
+class PasswordGenerator:
+    """Генератор паролей на криптографическом источнике (os.urandom / secrets).
+
+    Алфавит собирается один раз в конструкторе. Случайные байты берутся пачкой
+    на весь пароль и переводятся в символы отбором (байты, дающие смещение по
+    модулю, отбрасываются), поэтому все символы равновероятны.
+
+    require_each — в пароле обязательно есть хотя бы один символ каждого
+    включённого класса; пароль без какого-то класса генерируется заново, так что
+    распределение остаётся равномерным среди допустимых паролей.
+    """
+
+    def __init__(self, length: int = 16, digits: bool = True, upper: bool = True, symbols: bool = True,
+                 exclude_ambiguous: bool = False, require_each: bool = True, exclude: str = ""):
+        excluded = set(exclude) | (set(AMBIGUOUS) if exclude_ambiguous else set())
+        classes = [string.ascii_lowercase]
+        if digits:
+            classes.append(string.digits)
+        if upper:
+            classes.append(string.ascii_uppercase)
+        if symbols:
+            classes.append(SYMBOLS)
+        self.classes: List[str] = [c for c in ("".join(ch for ch in cls if ch not in excluded) for cls in classes) if c]
+        self.alphabet = "".join(self.classes)
+        if not self.alphabet:
+            raise ValueError("Пустой алфавит: исключены все символы")
+        self.length = int(length)
+        self.require_each = require_each
+        if require_each and self.length < len(self.classes):
+            raise ValueError(f"Длина {self.length} меньше числа обязательных классов ({len(self.classes)})")
+        self._class_sets = [frozenset(c) for c in self.classes]
+        # байты >= _limit отбрасываются, иначе первые символы алфавита выпадали бы чаще
+        self._limit = 256 - 256 % len(self.alphabet)
+
+    # ---------------- энтропия ----------------
+    @property
+    def entropy_bits(self) -> float:
+        """Энтропия одного пароля в битах: log2 числа допустимых паролей."""
+        n, k = len(self.alphabet), self.length
+        if not self.require_each or len(self.classes) == 1:
+            return k * math.log2(n)
+        # включения-исключения: пароли длины k, в которых есть символ каждого класса
+        sizes = [len(c) for c in self.classes]
+        total = 0
+        m = len(sizes)
+        for mask in range(1 << m):
+            missing = sum(sizes[i] for i in range(m) if mask >> i & 1)
+            sign = -1 if bin(mask).count("1") % 2 else 1
+            total += sign * (n - missing) ** k
+        return math.log2(total)
+
+    # ---------------- генерация ----------------
+    def _raw(self) -> str:
+        alphabet, limit, n, k = self.alphabet, self._limit, len(self.alphabet), self.length
+        out: List[str] = []
+        while len(out) < k:
+            # с запасом на отброшенные байты, чтобы обычно хватало одного вызова urandom
+            for b in secrets.token_bytes(k - len(out) + 8):
+                if b < limit:
+                    out.append(alphabet[b % n])
+                    if len(out) == k:
+                        break
+        return "".join(out)
+
+    def _ok(self, pwd: str) -> bool:
+        chars = set(pwd)
+        return all(not chars.isdisjoint(cls) for cls in self._class_sets)
+
+    def generate(self) -> str:
+        while True:
+            pwd = self._raw()
+            if not self.require_each or self._ok(pwd):
+                return pwd
+
+    def generate_many(self, count: int) -> List[str]:
+        return [self.generate() for _ in range(count)]
+
+    def stream(self, count: Optional[int] = None) -> Iterator[str]:
+        """Пароли по одному; count=None — бесконечно."""
+        if count is None:
+            while True:
+                yield self.generate()
+        for _ in range(count):
+            yield self.generate()
+
 
 def generate_password(length=16, digits=True, upper=True, symbols=True):
-    chars = list(string.ascii_lowercase)
-    if digits:
-        chars += list(string.digits)
-    if upper:
-        chars += list(string.ascii_uppercase)
-    if symbols:
-        chars += list("!@#$%^&*()-_=+[]{};:,.<>?")
-    return "".join(random.choice(chars) for _ in range(length))
+    # прежнее поведение: любая длина (в том числе меньше числа классов), классы не обязательны
+    return PasswordGenerator(length, digits=digits, upper=upper, symbols=symbols, require_each=False).generate()
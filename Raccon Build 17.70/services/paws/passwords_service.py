@@ -1,151 +1,601 @@
 # services/paws/passwords_service.py
+import json
+import os
 import sqlite3
-from .crypto_utils import encrypt_password, decrypt_password
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from services.db import Database
+from services.migrations import PAWS_MIGRATIONS
+from .audit import PasswordAuditor
+from .crypto_utils import LEGACY_KDF, calibrate_kdf
+from .entry_cache import TTLCache
+from .search_index import TrigramIndex, search_text
+from .vault import InvalidMasterPasswordError, RotationPendingError, VaultSession
+from .vault_export import read_export, write_export
 
 
 class PasswordsService:
-    def __init__(self, master_password: str, db_path: str):
-        self.master_password = master_password
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self._init_db()
-
-    def _has_column(self, table: str, col: str) -> bool:
-        cur = self.conn.cursor()
-        cur.execute(f"PRAGMA table_info({table})")
-        cols = {r[1] for r in cur.fetchall()}
-        cur.close()
-        return col in cols
-
-    def _init_db(self):
-        cur = self.conn.cursor()
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS passwords (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            service TEXT NOT NULL,
-            username TEXT,
-            password_enc TEXT NOT NULL,
-            notes TEXT
+    # допустимые колонки сортировки -> выражение ORDER BY (с теми же выражениями построены индексы)
+    SORT_EXPR = {
+        "id": "id",
+        "service": "service",
+        "username": "IFNULL(username, '')",
+        "notes": "IFNULL(notes, '')",
+        "created_at": "IFNULL(created_at, '')",
+        "updated_at": "IFNULL(updated_at, '')",
+    }
+
+    # сколько должен занимать вывод ключа при unlock (подбирается calibrate_kdf на этой машине)
+    KDF_TARGET_SECONDS = 0.25
+    # записей на одну транзакцию при смене мастер-пароля
+    ROTATION_CHUNK = 500
+    # расшифрованные записи (карточка, показ и копирование пароля) держим недолго и немного
+    ENTRY_CACHE_SIZE = 32
+    ENTRY_CACHE_TTL = 60.0
+    # строк на один executemany при импорте (вся загрузка — одна транзакция)
+    IMPORT_BATCH = 1000
+    # если поиск совпал больше чем с 1/N записей, проверка подстроки при проходе по индексу
+    # сортировки быстрее набирает страницу, чем список id (совпадения частые, скан останавливается рано)
+    SEARCH_SELECTIVE_RATIO = 50
+
+    def __init__(self, master_password: Optional[str], db_path: Optional[str] = None,
+                 session: Optional[VaultSession] = None, db: Optional[Database] = None, schema: str = "main"):
+        """db — общий с заметками Database (одно соединение и одни PRAGMA на файл);
+        schema — имя присоединённого файла хранилища в нём (Database(attach=...)).
+        Без db сервис открывает собственный Database по db_path и сам его закрывает."""
+        # ключ выводится один раз; сам мастер-пароль сервис не хранит
+        self.session = session if session is not None else VaultSession()
+        self._entry_cache = TTLCache(self.ENTRY_CACHE_SIZE, self.ENTRY_CACHE_TTL)
+        self.auditor = PasswordAuditor(self)
+        # поиск по service/username в памяти; строится при unlock
+        self.search_index = TrigramIndex()
+        self._index_ready = False
+        self._search_memo = (None, -1, "[]")  # (запрос, версия индекса, id в JSON)
+        self._owns_db = db is None
+        self.db = db if db is not None else Database(db_path, migrations=None)
+        if schema not in self.db.schemas():
+            raise ValueError(f"Схема {schema} не присоединена к базе")
+        # имена таблиц всегда со схемой: без неё SQLite сначала ищет в main,
+        # а там может лежать старая таблица passwords из общего с заметками файла
+        self.schema = schema
+        self._passwords = f"{schema}.passwords"
+        self._meta = f"{schema}.vault_meta"
+        # схема версионируется в schema_version; здесь только догоняем до текущей версии
+        self.db.migrate("paws", PAWS_MIGRATIONS, schema)
+        if master_password is not None:
+            self.unlock(master_password)
+
+    def close(self):
+        """Заблокировать хранилище и закрыть соединение, если оно своё (общий Database закрывает владелец)."""
+        self.lock()
+        if self._owns_db:
+            self.db.close()
+
+    # --- сессия ---
+    def unlock(self, master_password: str):
+        """Открыть хранилище. Неверный пароль — InvalidMasterPasswordError.
+
+        Хранилище без параметров KDF (ключ = SHA256 пароля) при этом переводится
+        на откалиброванный KDF с солью: все записи перешифровываются одной транзакцией.
+        """
+        self._entry_cache.clear()
+        meta = self._read_meta()
+        if "rotation_kdf" in meta:
+            raise RotationPendingError("Смена мастер-пароля не завершена: повторите её со старым и новым паролем")
+        if "kdf" not in meta:
+            self._upgrade_legacy_vault(master_password)
+        else:
+            self.session.unlock(master_password, json.loads(meta["kdf"]), verifier=meta.get("verifier"))
+        self._after_unlock()
+
+    def _after_unlock(self):
+        """Всё, что нужно открытому хранилищу помимо ключа: отпечатки и search_text для старых
+        строк и индекс поиска. После unlock() и после завершения смены мастер-пароля."""
+        self._backfill_fingerprints()
+        self._backfill_search_text()
+        self._build_search_index()
+
+    def vault_state(self) -> str:
+        """Состояние хранилища до unlock: "new" — ни ключа, ни записей (пароль задаётся впервые),
+        "legacy" — записи под старым ключом без соли, "rotation" — смена мастер-пароля не завершена,
+        "ready" — обычное хранилище."""
+        meta = self._read_meta()
+        if "rotation_kdf" in meta:
+            return "rotation"
+        if "kdf" in meta:
+            return "ready"
+        return "legacy" if self._max_id() else "new"
+
+    def _check_writable(self):
+        # пока смена мастер-пароля не завершена, часть записей уже под новым ключом:
+        # шифротекст старым ключом в этом диапазоне повторная смена не перешифрует
+        if self.db.fetchone(f"SELECT 1 FROM {self._meta} WHERE key = 'rotation_kdf'") is not None:
+            raise RotationPendingError("Смена мастер-пароля не завершена: повторите её со старым и новым паролем")
+
+    def _build_search_index(self):
+        rows = self.db.iterate(f"SELECT id, service, username FROM {self._passwords}")
+        self.search_index.build(tuple(r) for r in rows)
+        self._index_ready = True
+
+    def _index_new_rows(self, after_id: int):
+        """Добавить в индекс строки, вставленные пачкой (id > after_id)."""
+        if not self._index_ready:
+            return
+        for r in self.db.fetchall(f"SELECT id, service, username FROM {self._passwords} WHERE id > ?", (after_id,)):
+            self.search_index.add(r["id"], r["service"], r["username"])
+
+    def _max_id(self) -> int:
+        return self.db.fetchone(f"SELECT IFNULL(MAX(id), 0) FROM {self._passwords}")[0]
+
+    def _backfill_fingerprints(self):
+        """Отпечатки для записей, созданных до появления password_fp (один раз после обновления)."""
+        rows = self.db.fetchall(f"SELECT id, password_enc FROM {self._passwords} WHERE password_fp IS NULL")
+        if not rows:
+            return
+        decrypt, fingerprint = self.session.decrypt, self.session.fingerprint
+        self.db.executemany(
+            f"UPDATE {self._passwords} SET password_fp = ? WHERE id = ?",
+            ((fingerprint(decrypt(r["password_enc"])), r["id"]) for r in rows)
         )
-        """)
-        # добавить даты, если их нет
-        if not self._has_column("passwords", "created_at"):
-            cur.execute("ALTER TABLE passwords ADD COLUMN created_at TEXT DEFAULT (datetime('now'))")
-        if not self._has_column("passwords", "updated_at"):
-            cur.execute("ALTER TABLE passwords ADD COLUMN updated_at TEXT DEFAULT (datetime('now'))")
-        self.conn.commit()
-        cur.close()
 
-    # --- CRUD ---
-    def add_entry(self, service: str, username: str, password_plain: str, notes: str = "") -> int:
-        enc = encrypt_password(self.master_password, password_plain)
-        cur = self.conn.cursor()
-        has_dates = self._has_column("passwords", "created_at") and self._has_column("passwords", "updated_at")
-
-        if has_dates:
-            cur.execute(
-                "INSERT INTO passwords(service, username, password_enc, notes, created_at, updated_at) "
-                "VALUES (?, ?, ?, ?, datetime('now'), datetime('now'))",
-                (service, username, enc, notes)
+    def _backfill_search_text(self):
+        """search_text для строк, записанных в обход сервиса (миграция заполняет остальные)."""
+        rows = self.db.fetchall(f"SELECT id, service, username FROM {self._passwords} WHERE search_text IS NULL")
+        if rows:
+            self.db.executemany(
+                f"UPDATE {self._passwords} SET search_text = ? WHERE id = ?",
+                ((search_text(r["service"], r["username"]), r["id"]) for r in rows)
             )
+
+    def _read_meta(self) -> dict:
+        return {r["key"]: r["value"] for r in self.db.fetchall(f"SELECT key, value FROM {self._meta}")}
+
+    def _write_meta(self, values: dict):
+        self.db.executemany(
+            f"INSERT INTO {self._meta}(key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            values.items()
+        )
+
+    def _upgrade_legacy_vault(self, master_password: str):
+        legacy = VaultSession(master_password, LEGACY_KDF)
+        # у старых хранилищ нет проверочного токена: пароль проверяем по первой записи
+        first = self.db.fetchone(f"SELECT password_enc FROM {self._passwords} ORDER BY id LIMIT 1")
+        if first is not None:
+            try:
+                legacy.decrypt(first["password_enc"])
+            except Exception:
+                raise InvalidMasterPasswordError("Неверный мастер-пароль") from None
+
+        kdf = calibrate_kdf(self.KDF_TARGET_SECONDS)
+        self.session.unlock(master_password, kdf)
+        encrypt, fingerprint = self.session.encrypt, self.session.fingerprint
+
+        def _updates(rows):
+            for r in rows:
+                plain = legacy.decrypt(r["password_enc"])
+                yield encrypt(plain), fingerprint(plain), r["id"]
+
+        try:
+            with self.transaction():
+                rows = self.db.fetchall(f"SELECT id, password_enc FROM {self._passwords}")
+                self.db.executemany(
+                    f"UPDATE {self._passwords} SET password_enc = ?, password_fp = ? WHERE id = ?", _updates(rows)
+                )
+                self._write_meta({"kdf": json.dumps(kdf), "verifier": self.session.make_verifier()})
+        except BaseException:
+            self.session.lock()
+            raise
+        finally:
+            legacy.lock()
+
+    def lock(self):
+        self._entry_cache.clear()
+        self.search_index.clear()
+        self._index_ready = False
+        self.session.lock()
+
+    @property
+    def is_unlocked(self) -> bool:
+        return self.session.is_unlocked
+
+    # --- смена мастер-пароля ---
+    def rotate_master_password(self, old_password: str, new_password: str,
+                               chunk_size: Optional[int] = None, workers: Optional[int] = None,
+                               on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """Перешифровать все записи под новый мастер-пароль. Возвращает число записей.
+
+        Записи читаются по id кусками по chunk_size; расшифровка и шифрование куска
+        идут в пуле потоков, запись куска — одной транзакцией вместе с отметкой
+        vault_meta.rotation_last_id. Если процесс прервался, хранилище не откроется
+        (RotationPendingError), а повторный вызов с теми же паролями продолжит
+        с первой необработанной записи. on_progress(done, total) — после каждого куска,
+        в том потоке, где идёт смена.
+        """
+        meta = self._read_meta()
+        if "kdf" not in meta:
+            self._upgrade_legacy_vault(old_password)
+            meta = self._read_meta()
+        old = VaultSession()
+        old.unlock(old_password, json.loads(meta["kdf"]), verifier=meta.get("verifier"))
+
+        new = VaultSession()
+        if "rotation_kdf" in meta:
+            # продолжение прерванной смены: новый ключ уже выбран, проверяем пароль по его токену
+            try:
+                new.unlock(new_password, json.loads(meta["rotation_kdf"]), verifier=meta["rotation_verifier"])
+            except BaseException:
+                old.lock()
+                raise
+            last_id = int(meta.get("rotation_last_id", 0))
         else:
-            cur.execute(
-                "INSERT INTO passwords(service, username, password_enc, notes) VALUES (?, ?, ?, ?)",
-                (service, username, enc, notes)
-            )
-        self.conn.commit()
-        new_id = cur.lastrowid
-        cur.close()
+            new_kdf = calibrate_kdf(self.KDF_TARGET_SECONDS)
+            new.unlock(new_password, new_kdf)
+            last_id = 0
+            # с этого момента часть записей может оказаться под новым ключом:
+            # сессию со старым ключом держать открытой нельзя, пока смена не закончится
+            self.lock()
+            with self.transaction():
+                self._write_meta({
+                    "rotation_kdf": json.dumps(new_kdf),
+                    "rotation_verifier": new.make_verifier(),
+                    "rotation_last_id": "0",
+                })
+
+        chunk_size = chunk_size or self.ROTATION_CHUNK
+        workers = workers or min(8, os.cpu_count() or 1)
+        total = self.db.fetchone(f"SELECT COUNT(*) FROM {self._passwords}")[0]
+        done = self.db.fetchone(f"SELECT COUNT(*) FROM {self._passwords} WHERE id <= ?", (last_id,))[0]
+        if on_progress:
+            on_progress(done, total)
+
+        def reencrypt(batch: List[sqlite3.Row]) -> List[Tuple[str, str, int]]:
+            out = []
+            for r in batch:
+                plain = old.decrypt(r["password_enc"])
+                # отпечаток зависит от ключа — пересчитываем вместе с шифротекстом
+                out.append((new.encrypt(plain), new.fingerprint(plain), r["id"]))
+            return out
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="raccon-rotate") as pool:
+                while True:
+                    rows = self.db.fetchall(
+                        f"SELECT id, password_enc FROM {self._passwords} WHERE id > ? ORDER BY id LIMIT ?",
+                        (last_id, chunk_size)
+                    )
+                    if not rows:
+                        break
+                    step = -(-len(rows) // workers)
+                    batches = [rows[i:i + step] for i in range(0, len(rows), step)]
+                    updates = [u for part in pool.map(reencrypt, batches) for u in part]
+                    last_id = rows[-1]["id"]
+                    with self.transaction():
+                        self.db.executemany(
+                            f"UPDATE {self._passwords} SET password_enc = ?, password_fp = ? WHERE id = ?", updates
+                        )
+                        self._write_meta({"rotation_last_id": str(last_id)})
+                    done += len(rows)
+                    if on_progress:
+                        on_progress(done, total)
+
+            with self.transaction():
+                current = self._read_meta()
+                self._write_meta({"kdf": current["rotation_kdf"], "verifier": current["rotation_verifier"]})
+                self.db.execute(f"DELETE FROM {self._meta} WHERE key LIKE 'rotation_%'")
+        except BaseException:
+            # прервано: хранилище остаётся закрытым до повторной смены (RotationPendingError при unlock)
+            self.lock()
+            new.lock()
+            raise
+        finally:
+            old.lock()
+
+        self.session.adopt(new)
+        self._after_unlock()
+        return done
+
+    @contextmanager
+    def transaction(self):
+        """Все записи внутри блока уходят одним commit; при ошибке — rollback."""
+        with self.db.transaction():
+            yield self
+
+    # --- CRUD ---
+    def add_entry(self, service: str, username: str, password_plain: str, notes: str = "") -> int:
+        self._check_writable()
+        enc = self.session.encrypt(password_plain)
+        fp = self.session.fingerprint(password_plain)
+        new_id = self.db.execute(
+            f"INSERT INTO {self._passwords}"
+            "(service, username, password_enc, password_fp, notes, search_text, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))",
+            (service, username, enc, fp, notes, search_text(service, username))
+        )
+        if self._index_ready:
+            self.search_index.add(new_id, service, username)
         return new_id
 
-    def update_entry(self, entry_id: int, service: str, username: str, password_plain: str | None, notes: str = ""):
-        cur = self.conn.cursor()
-        has_updated = self._has_column("passwords", "updated_at")
+    def add_entries(self, entries: Iterable[Tuple]) -> int:
+        """Массовое добавление: элементы (service, username, password_plain[, notes]).
+        Всё пишется одной транзакцией."""
+        self._check_writable()
+        encrypt, fingerprint = self.session.encrypt, self.session.fingerprint
+
+        def _rows():
+            for e in entries:
+                notes = e[3] if len(e) > 3 else ""
+                yield (e[0], e[1], encrypt(e[2]), fingerprint(e[2]), notes, search_text(e[0], e[1]))
 
+        after_id = self._max_id()
+        count = self.db.executemany(
+            f"INSERT INTO {self._passwords}"
+            "(service, username, password_enc, password_fp, notes, search_text, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))",
+            _rows()
+        )
+        self._index_new_rows(after_id)
+        return count
+
+    def update_entry(self, entry_id: int, service: str, username: str, password_plain: str | None, notes: str = ""):
+        self._check_writable()
         if password_plain is None:
-            if has_updated:
-                cur.execute(
-                    "UPDATE passwords SET service = ?, username = ?, notes = ?, updated_at = datetime('now') WHERE id = ?",
-                    (service, username, notes, entry_id)
-                )
-            else:
-                cur.execute(
-                    "UPDATE passwords SET service = ?, username = ?, notes = ? WHERE id = ?",
-                    (service, username, notes, entry_id)
-                )
+            self.db.execute(
+                f"UPDATE {self._passwords} SET service = ?, username = ?, notes = ?, search_text = ?, "
+                "updated_at = datetime('now') WHERE id = ?",
+                (service, username, notes, search_text(service, username), entry_id)
+            )
         else:
-            enc = encrypt_password(self.master_password, password_plain)
-            if has_updated:
-                cur.execute(
-                    "UPDATE passwords SET service = ?, username = ?, password_enc = ?, notes = ?, "
-                    "updated_at = datetime('now') WHERE id = ?",
-                    (service, username, enc, notes, entry_id)
-                )
-            else:
-                cur.execute(
-                    "UPDATE passwords SET service = ?, username = ?, password_enc = ?, notes = ? WHERE id = ?",
-                    (service, username, enc, notes, entry_id)
-                )
-
-        self.conn.commit()
-        cur.close()
+            enc = self.session.encrypt(password_plain)
+            fp = self.session.fingerprint(password_plain)
+            self.db.execute(
+                f"UPDATE {self._passwords} SET service = ?, username = ?, password_enc = ?, password_fp = ?, "
+                "notes = ?, search_text = ?, updated_at = datetime('now') WHERE id = ?",
+                (service, username, enc, fp, notes, search_text(service, username), entry_id)
+            )
+        self._entry_cache.invalidate(entry_id)
+        if self._index_ready:
+            self.search_index.add(entry_id, service, username)
+        # updated_at меняется с точностью до секунды — явный сброс на случай двух правок подряд
+        self.auditor.invalidate(entry_id)
 
     def get_entry_by_id(self, entry_id: int):
-        has_created = self._has_column("passwords", "created_at")
-        has_updated = self._has_column("passwords", "updated_at")
-        cols = ["id", "service", "username", "password_enc", "notes"]
-        if has_created:
-            cols.append("created_at")
-        if has_updated:
-            cols.append("updated_at")
-
-        cur = self.conn.cursor()
-        cur.execute(f"SELECT {', '.join(cols)} FROM passwords WHERE id = ?", (entry_id,))
-        row = cur.fetchone()
-        cur.close()
+        """Запись с расшифрованным паролем. Повторные запросы той же записи в течение
+        ENTRY_CACHE_TTL отдаются из кэша без расшифровки; кэш сбрасывается при lock()."""
+        if not self.session.is_unlocked:
+            # сессию могли заблокировать напрямую — открытый текст в памяти не оставляем
+            self._entry_cache.clear()
+        else:
+            cached = self._entry_cache.get(entry_id)
+            if cached is not None:
+                return dict(cached)
+
+        row = self.db.fetchone(
+            f"SELECT id, service, username, password_enc, notes, created_at, updated_at FROM {self._passwords} "
+            "WHERE id = ?",
+            (entry_id,)
+        )
         if not row:
             return None
 
-        d = dict(row)
-        plain = decrypt_password(self.master_password, d["password_enc"])
-        return {
-            "id": d["id"],
-            "service": d["service"],
-            "username": d.get("username", ""),
+        plain = self.session.decrypt(row["password_enc"])
+        entry = {
+            "id": row["id"],
+            "service": row["service"],
+            "username": row["username"] or "",
             "password": plain,
-            "notes": d.get("notes", ""),
-            "created_at": d.get("created_at", ""),
-            "updated_at": d.get("updated_at", "")
+            "notes": row["notes"] or "",
+            "created_at": row["created_at"] or "",
+            "updated_at": row["updated_at"] or ""
         }
+        self._entry_cache.put(entry_id, entry)
+        return dict(entry)
+
+    def search_ids(self, query: str) -> Optional[set]:
+        """id записей, где query входит в service или username (по индексу в памяти).
+        None — индекс ещё не построен (хранилище не открыто)."""
+        if not self._index_ready:
+            return None
+        return self.search_index.search(query)
+
+    def _query_condition(self, query: str) -> Tuple[str, list]:
+        # индекс отвечает за микросекунды; SQLite получает готовый список id.
+        # Без индекса и для частых совпадений — instr по search_text: это тот же текст,
+        # что в индексе, поэтому оба пути находят одно и то же (у LIKE % и _ — шаблоны,
+        # а регистр он не различает только у ASCII)
+        if not self._index_ready:
+            return "instr(search_text, ?) > 0", [query.lower()]
+        memo_query, memo_version, ids_json = self._search_memo
+        version = self.search_index.version
+        if memo_query != query or memo_version != version:
+            ids = self.search_index.search(query)
+            if len(ids) * self.SEARCH_SELECTIVE_RATIO > len(self.search_index):
+                ids_json = None
+            else:
+                ids_json = json.dumps(sorted(ids))
+            self._search_memo = (query, version, ids_json)
+        if ids_json is None:
+            return "instr(search_text, ?) > 0", [query.lower()]
+        return "id IN (SELECT value FROM json_each(?))", [ids_json]
 
     def list_entries(self, query: str | None = None, sort_by: str = "id", ascending: bool = True):
-        allowed = {"id", "service", "username", "notes", "updated_at", "created_at"}
-        sort_by = sort_by if sort_by in allowed else "id"
+        expr = self.SORT_EXPR.get(sort_by, "id")
         order = "ASC" if ascending else "DESC"
+        order_by = f"{expr} {order}" if expr == "id" else f"{expr} {order}, id {order}"
 
-        show_updated = self._has_column("passwords", "updated_at")
-        sel_cols = ["id", "service", "username", "notes"]
-        if show_updated:
-            sel_cols.append("updated_at")
-
-        cur = self.conn.cursor()
         if query:
-            like = f"%{query}%"
-            cur.execute(
-                f"SELECT {', '.join(sel_cols)} FROM passwords "
-                f"WHERE service LIKE ? OR username LIKE ? ORDER BY {sort_by} {order}",
-                (like, like)
+            cond, params = self._query_condition(query)
+            return self.db.fetchall(
+                f"SELECT id, service, username, notes, updated_at FROM {self._passwords} "
+                f"WHERE {cond} ORDER BY {order_by}",
+                params
             )
-        else:
-            cur.execute(
-                f"SELECT {', '.join(sel_cols)} FROM passwords ORDER BY {sort_by} {order}"
-            )
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+        return self.db.fetchall(
+            f"SELECT id, service, username, notes, updated_at FROM {self._passwords} ORDER BY {order_by}"
+        )
+
+    def list_entries_page(self, query: str | None = None, sort_by: str = "id", ascending: bool = True,
+                          last_sort_value=None, last_id: int | None = None, limit: int = 200):
+        """Keyset-пагинация list_entries: следующая страница после строки (last_sort_value, last_id).
+
+        Первая страница — last_id=None. Для следующей передаются row[sort_by] и row["id"]
+        последней полученной строки. Страница читается по индексу, без OFFSET,
+        поэтому время не зависит от того, насколько далеко пролистан список.
+        """
+        expr = self.SORT_EXPR.get(sort_by, "id")
+        order = "ASC" if ascending else "DESC"
+        cmp = ">" if ascending else "<"
+
+        where, params = [], []
+        if query:
+            cond, cond_params = self._query_condition(query)
+            where.append(cond)
+            params += cond_params
+        if last_id is not None:
+            if expr == "id":
+                where.append(f"id {cmp} ?")
+                params.append(last_id)
+            else:
+                # (expr, id) > (v, id0), расписанное так, чтобы SQLite искал по индексу, а не сканировал
+                value = "" if last_sort_value is None else last_sort_value
+                where.append(f"{expr} {cmp}= ? AND ({expr} {cmp} ? OR id {cmp} ?)")
+                params += [value, value, last_id]
+
+        order_by = f"id {order}" if expr == "id" else f"{expr} {order}, id {order}"
+        # created_at идёт последней колонкой: по ней тоже можно сортировать, а Treeview показывает первые пять
+        sql = f"SELECT id, service, username, notes, updated_at, created_at FROM {self._passwords}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order_by} LIMIT ?"
+        params.append(limit)
+
+        return self.db.fetchall(sql, params)
+
+    def secret_rows_after(self, after_id: int, limit: int = 256) -> List[sqlite3.Row]:
+        """До limit записей с зашифрованным паролем и id > after_id, по возрастанию id."""
+        return self.db.fetchall(
+            f"SELECT id, service, username, password_enc, notes, created_at, updated_at FROM {self._passwords} "
+            "WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit)
+        )
+
+    def iter_secret_rows(self, chunk_size: int = 256) -> Iterator[List[sqlite3.Row]]:
+        """Все записи с зашифрованным паролем кусками по chunk_size (keyset по id)."""
+        last_id = 0
+        while True:
+            rows = self.secret_rows_after(last_id, chunk_size)
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def audit(self, cancel=None) -> Iterator[dict]:
+        """Оценки стойкости всех паролей по мере готовности (см. audit.PasswordAuditor).
+        cancel — threading.Event для досрочной остановки."""
+        return self.auditor.iter_results(cancel)
+
+    def audit_batch(self, after_id: int = 0, cancel=None) -> Tuple[List[dict], Optional[int]]:
+        """Один кусок аудита: записи с id > after_id. Возвращает (оценки, id последней записи куска);
+        None вместо id — записи кончились. Для UI: между кусками исполнитель успевает
+        выполнить другие запросы (см. audit.PasswordAuditor.audit_batch)."""
+        return self.auditor.audit_batch(after_id, cancel)
+
+    # --- экспорт / импорт ---
+    def export_vault(self, path: str, password: str, on_progress: Optional[Callable[[int], None]] = None) -> int:
+        """Выгрузить все записи в зашифрованный файл (см. vault_export). Возвращает число записей.
+
+        Записи читаются кусками и пишутся блоками — память не зависит от размера хранилища.
+        Файл сначала пишется рядом во временный и подменяет цель только после успешной записи.
+        """
+        decrypt = self.session.decrypt
+
+        def _records():
+            for rows in self.iter_secret_rows(self.IMPORT_BATCH):
+                for r in rows:
+                    yield {
+                        "service": r["service"], "username": r["username"] or "",
+                        "password": decrypt(r["password_enc"]), "notes": r["notes"] or "",
+                        "created_at": r["created_at"], "updated_at": r["updated_at"],
+                    }
+
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                count = write_export(f, password, _records(), calibrate_kdf(self.KDF_TARGET_SECONDS), on_progress)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return count
+
+    def import_vault(self, path: str, password: str, on_progress: Optional[Callable[[int], None]] = None) -> int:
+        """Добавить записи из файла экспорта. Возвращает число добавленных.
+
+        Всё идёт одной транзакцией пачками по IMPORT_BATCH: если файл окажется
+        повреждён (проверка подлинности — в конце файла), ничего не добавится.
+        """
+        self._check_writable()
+        encrypt, fingerprint = self.session.encrypt, self.session.fingerprint
+        sql = (f"INSERT INTO {self._passwords}"
+               "(service, username, password_enc, password_fp, notes, search_text, created_at, updated_at) "
+               "VALUES (?, ?, ?, ?, ?, ?, IFNULL(?, datetime('now')), IFNULL(?, datetime('now')))")
+        count = 0
+        batch = []
+        after_id = self._max_id()
+        with open(path, "rb") as f, self.transaction():
+            for rec in read_export(f, password):
+                pwd = rec["password"] or ""
+                service, username = rec["service"] or "", rec["username"] or ""
+                batch.append((service, username, encrypt(pwd), fingerprint(pwd), rec["notes"] or "",
+                              search_text(service, username), rec["created_at"], rec["updated_at"]))
+                if len(batch) >= self.IMPORT_BATCH:
+                    self.db.executemany(sql, batch)
+                    count += len(batch)
+                    batch.clear()
+                    if on_progress:
+                        on_progress(count)
+            if batch:
+                self.db.executemany(sql, batch)
+                count += len(batch)
+        self._index_new_rows(after_id)
+        if on_progress:
+            on_progress(count)
+        return count
+
+    def find_reused(self) -> List[List[sqlite3.Row]]:
+        """Группы записей с одинаковым паролем (по password_fp), без расшифровки.
+
+        Один запрос по индексу idx_passwords_fp; строки (id, service, username, updated_at),
+        группы — от самых больших.
+        """
+        rows = self.db.iterate(
+            "SELECT p.password_fp AS fp, p.id, p.service, p.username, p.updated_at, d.cnt "
+            f"FROM (SELECT password_fp, COUNT(*) AS cnt FROM {self._passwords} "
+            "      WHERE password_fp IS NOT NULL GROUP BY password_fp HAVING COUNT(*) > 1) AS d "
+            f"JOIN {self._passwords} p ON p.password_fp = d.password_fp "
+            "ORDER BY d.cnt DESC, p.password_fp, p.id"
+        )
+        groups: List[List[sqlite3.Row]] = []
+        last_fp = None
+        for row in rows:
+            if row["fp"] != last_fp:
+                groups.append([])
+                last_fp = row["fp"]
+            groups[-1].append(row)
+        return groups
 
     def delete_entry(self, entry_id: int):
-        cur = self.conn.cursor()
-        cur.execute("DELETE FROM passwords WHERE id = ?", (entry_id,))
-        self.conn.commit()
-        cur.close()
+        self.db.execute(f"DELETE FROM {self._passwords} WHERE id = ?", (entry_id,))
+        self._entry_cache.invalidate(entry_id)
+        self.search_index.remove(entry_id)
+
+    def delete_entries(self, entry_ids: Iterable[int]) -> int:
+        ids = list(entry_ids)
+        try:
+            return self.db.executemany(f"DELETE FROM {self._passwords} WHERE id = ?", ((i,) for i in ids))
+        finally:
+            for i in ids:
+                self._entry_cache.invalidate(i)
+                self.search_index.remove(i)
@@ -0,0 +1,144 @@
+# services/paws/search_index.py
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# разделитель полей в общей строке документа; в запросах не встречается,
+# поэтому n-граммы через границу полей ничего лишнего не находят
+_SEP = "\x00"
+
+
+def search_text(*fields: Optional[str]) -> str:
+    """Текст записи для поиска подстроки: поля в нижнем регистре через _SEP.
+    Его же хранит колонка passwords.search_text, чтобы поиск в SQL совпадал с индексом."""
+    return _SEP.join((f or "").lower() for f in fields)
+
+
+def _grams(text: str, n: int) -> Set[str]:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _doc_grams(text: str) -> Set[str]:
+    grams = {text[i:i + 3] for i in range(len(text) - 2)}
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class TrigramIndex:
+    """Индекс в памяти для поиска записей по подстроке в service / username.
+
+    Для каждого поля хранятся n-граммы длины 2 и 3 (gram -> множество id).
+    Запрос длиной от 3 символов — пересечение списков его триграмм, начиная с
+    самого короткого, и проверка подстроки у немногих кандидатов; запрос из двух
+    символов — готовый список биграммы. Для поиска по началу строки есть
+    отсортированный список (текст, id) и bisect.
+
+    Регистр не учитывается. Все методы потокобезопасны; version растёт при каждом
+    изменении — по нему можно кэшировать результаты поиска.
+    """
+
+    def __init__(self):
+        self._docs: Dict[int, str] = {}                 # id -> поля в нижнем регистре через _SEP
+        self._postings: Dict[str, Set[int]] = {}       # n-грамма -> id
+        self._sorted: List[Tuple[str, int]] = []       # (поле, id) для prefix-поиска
+        self._lock = threading.RLock()
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---------------- изменение ----------------
+    def build(self, rows: Iterable[Tuple[int, Optional[str], Optional[str]]]):
+        """Перестроить индекс с нуля по строкам (id, service, username)."""
+        docs, postings, ordered = {}, {}, []
+        get = postings.get
+        for entry_id, *fields in rows:
+            texts = [(f or "").lower() for f in fields]
+            doc = _SEP.join(texts)
+            docs[entry_id] = doc
+            ordered.extend((t, entry_id) for t in texts)
+            for gram in _doc_grams(doc):
+                ids = get(gram)
+                if ids is None:
+                    postings[gram] = {entry_id}
+                else:
+                    ids.add(entry_id)
+        ordered.sort()
+        with self._lock:
+            self._docs, self._postings, self._sorted = docs, postings, ordered
+            self.version += 1
+
+    def add(self, entry_id: int, *fields: Optional[str]):
+        with self._lock:
+            if entry_id in self._docs:
+                self.remove(entry_id)
+            self.version += 1
+            texts = [(f or "").lower() for f in fields]
+            doc = _SEP.join(texts)
+            self._docs[entry_id] = doc
+            for text in texts:
+                bisect.insort(self._sorted, (text, entry_id))
+            for gram in _doc_grams(doc):
+                self._postings.setdefault(gram, set()).add(entry_id)
+
+    def remove(self, entry_id: int):
+        with self._lock:
+            doc = self._docs.pop(entry_id, None)
+            if doc is None:
+                return
+            self.version += 1
+            for text in doc.split(_SEP):
+                i = bisect.bisect_left(self._sorted, (text, entry_id))
+                if i < len(self._sorted) and self._sorted[i] == (text, entry_id):
+                    del self._sorted[i]
+            for gram in _doc_grams(doc):
+                ids = self._postings.get(gram)
+                if ids is not None:
+                    ids.discard(entry_id)
+                    if not ids:
+                        del self._postings[gram]
+
+    def clear(self):
+        with self._lock:
+            self._docs, self._postings, self._sorted = {}, {}, []
+            self.version += 1
+
+    # ---------------- поиск ----------------
+    def search(self, query: str) -> Set[int]:
+        """id записей, у которых query входит в service или username."""
+        q = query.lower()
+        with self._lock:
+            if not q:
+                return set(self._docs)
+            if len(q) <= 3:
+                if len(q) > 1:
+                    # n-грамма целиком — готовый ответ без проверки
+                    return set(self._postings.get(q, ()))
+                return {i for i, doc in self._docs.items() if q in doc}
+            lists = []
+            for gram in _grams(q, 3):
+                ids = self._postings.get(gram)
+                if not ids:
+                    return set()
+                lists.append(ids)
+            lists.sort(key=len)
+            candidates = set(lists[0])
+            for ids in lists[1:]:
+                candidates &= ids
+                if not candidates:
+                    return candidates
+            docs = self._docs
+            return {i for i in candidates if q in docs[i]}
+
+    def search_prefix(self, prefix: str) -> Set[int]:
+        """id записей, у которых service или username начинается с prefix."""
+        p = prefix.lower()
+        with self._lock:
+            ordered = self._sorted
+            i = bisect.bisect_left(ordered, (p, -1))
+            out = set()
+            while i < len(ordered) and ordered[i][0].startswith(p):
+                out.add(ordered[i][1])
+                i += 1
+            return out
@@ -0,0 +1,108 @@
+# services/paws/vault.py
+import base64
+import hashlib
+import hmac
+import threading
+from typing import Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from .crypto_utils import derive_key
+
+
+class VaultLockedError(RuntimeError):
+    """Операция требует открытого хранилища, а сессия заблокирована."""
+
+
+class InvalidMasterPasswordError(ValueError):
+    """Мастер-пароль не подходит к хранилищу."""
+
+
+class RotationPendingError(RuntimeError):
+    """Смена мастер-пароля была прервана: часть записей уже под новым ключом.
+    Открыть такое хранилище можно только повторным rotate_master_password."""
+
+
+# что шифруется в проверочный токен vault_meta.verifier
+VERIFIER_PLAIN = "raccon-vault"
+# контекст для ключа отпечатков: отдельный от ключа шифрования, но выводится из него
+FINGERPRINT_CONTEXT = b"raccon-password-fingerprint"
+
+
+class VaultSession:
+    """Открытое хранилище паролей: ключ выводится один раз при unlock(),
+    дальше все encrypt/decrypt идут через один готовый Fernet.
+
+    Сам мастер-пароль после unlock() не хранится. lock() забывает шифр;
+    до следующего unlock() любые encrypt/decrypt бросают VaultLockedError.
+
+    kdf — параметры вывода ключа (см. crypto_utils.derive_key); verifier — токен
+    из make_verifier(): если он не расшифровывается, пароль неверный и сессия
+    остаётся заблокированной.
+
+    fingerprint(plain) — HMAC-SHA256 пароля на ключе хранилища: одинаковые пароли
+    дают одинаковый отпечаток, но без ключа по нему нельзя подобрать пароль.
+    """
+
+    def __init__(self, master_password: Optional[str] = None, kdf: Optional[dict] = None):
+        self._lock = threading.Lock()
+        self._fernet: Optional[Fernet] = None
+        self._fp_key: Optional[bytes] = None
+        self.kdf: Optional[dict] = None
+        if master_password is not None:
+            self.unlock(master_password, kdf)
+
+    # ---------------- жизненный цикл ----------------
+    def unlock(self, master_password: str, kdf: Optional[dict] = None, verifier: Optional[str] = None) -> None:
+        key = derive_key(master_password, kdf)
+        fernet = Fernet(key)
+        if verifier is not None:
+            try:
+                fernet.decrypt(verifier.encode())
+            except InvalidToken:
+                raise InvalidMasterPasswordError("Неверный мастер-пароль") from None
+        fp_key = hmac.new(base64.urlsafe_b64decode(key), FINGERPRINT_CONTEXT, hashlib.sha256).digest()
+        with self._lock:
+            self._fernet = fernet
+            self._fp_key = fp_key
+            self.kdf = kdf
+
+    def lock(self) -> None:
+        with self._lock:
+            self._fernet = None
+            self._fp_key = None
+
+    def adopt(self, other: "VaultSession") -> None:
+        """Перенять ключ другой (уже открытой) сессии без повторного вывода; other блокируется."""
+        fernet, fp_key = other._cipher(), other._fp_key
+        with self._lock:
+            self._fernet = fernet
+            self._fp_key = fp_key
+            self.kdf = other.kdf
+        other.lock()
+
+    @property
+    def is_unlocked(self) -> bool:
+        return self._fernet is not None
+
+    def _cipher(self) -> Fernet:
+        fernet = self._fernet
+        if fernet is None:
+            raise VaultLockedError("Хранилище заблокировано")
+        return fernet
+
+    # ---------------- шифрование ----------------
+    def encrypt(self, plain: str) -> str:
+        return self._cipher().encrypt(plain.encode()).decode()
+
+    def decrypt(self, token: str) -> str:
+        return self._cipher().decrypt(token.encode()).decode()
+
+    def fingerprint(self, plain: str) -> str:
+        fp_key = self._fp_key
+        if fp_key is None:
+            raise VaultLockedError("Хранилище заблокировано")
+        return hmac.new(fp_key, plain.encode(), hashlib.sha256).hexdigest()
+
+    def make_verifier(self) -> str:
+        return self.encrypt(VERIFIER_PLAIN)
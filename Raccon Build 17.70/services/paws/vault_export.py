@@ -0,0 +1,150 @@
+# services/paws/vault_export.py
+"""
+Бинарный контейнер для резервной копии хранилища паролей (.rvault).
+
+Формат (все числа big-endian):
+
+    header  = MAGIC (8 байт) | version u16 | flags u16 | kdf_len u32 | kdf JSON
+    frame   = len u32 (> 0)  | Fernet-токен JSON-списка до BLOCK_RECORDS записей
+    trailer = 0 u32          | count u64 | HMAC-SHA256 (32 байта)
+
+Ключ выводится из пароля экспорта по параметрам kdf (соль своя у каждого файла);
+из него получаются два подключа — для Fernet и для HMAC. Каждый кадр
+аутентифицирован Fernet, а HMAC в конце покрывает заголовок, все кадры по порядку
+и число записей, поэтому обрезанный, переставленный или склеенный файл не пройдёт.
+
+Запись и чтение потоковые: в памяти только один блок записей.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import struct
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from .crypto_utils import calibrate_kdf, check_kdf, derive_key
+
+MAGIC = b"RCNVAULT"
+FORMAT_VERSION = 1
+BLOCK_RECORDS = 256
+# защита от мусорной длины кадра: блок из BLOCK_RECORDS записей заведомо меньше
+MAX_FRAME = 64 * 1024 * 1024
+
+_HEADER = struct.Struct(">8sHHI")
+_LEN = struct.Struct(">I")
+_COUNT = struct.Struct(">Q")
+
+# поля записи в контейнере
+FIELDS = ("service", "username", "password", "notes", "created_at", "updated_at")
+
+
+class ExportFormatError(ValueError):
+    """Файл не является экспортом хранилища, повреждён или пароль неверный."""
+
+
+def _subkeys(password: str, kdf: dict):
+    raw = base64.urlsafe_b64decode(derive_key(password, kdf))
+    enc = hmac.new(raw, b"raccon-export-enc", hashlib.sha256).digest()
+    mac = hmac.new(raw, b"raccon-export-mac", hashlib.sha256).digest()
+    return Fernet(base64.urlsafe_b64encode(enc)), mac
+
+
+def write_export(out: BinaryIO, password: str, records: Iterable[dict],
+                 kdf: Optional[dict] = None, on_progress=None) -> int:
+    """Записать записи (словари с полями FIELDS) в out. Возвращает их число."""
+    kdf = kdf or calibrate_kdf()
+    fernet, mac_key = _subkeys(password, kdf)
+    mac = hmac.new(mac_key, digestmod=hashlib.sha256)
+
+    kdf_json = json.dumps(kdf, separators=(",", ":")).encode()
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(kdf_json)) + kdf_json
+    out.write(header)
+    mac.update(header)
+
+    count = 0
+    block = []
+
+    def flush():
+        token = fernet.encrypt(json.dumps(block, ensure_ascii=False, separators=(",", ":")).encode())
+        frame = _LEN.pack(len(token)) + token
+        out.write(frame)
+        mac.update(frame)
+        block.clear()
+
+    for rec in records:
+        block.append([rec.get(f) for f in FIELDS])
+        count += 1
+        if len(block) >= BLOCK_RECORDS:
+            flush()
+            if on_progress:
+                on_progress(count)
+    if block:
+        flush()
+
+    tail = _LEN.pack(0) + _COUNT.pack(count)
+    mac.update(tail)
+    out.write(tail + mac.digest())
+    if on_progress:
+        on_progress(count)
+    return count
+
+
+def _read_exact(inp: BinaryIO, n: int) -> bytes:
+    data = inp.read(n)
+    if len(data) != n:
+        raise ExportFormatError("Файл обрезан")
+    return data
+
+
+def read_export(inp: BinaryIO, password: str) -> Iterator[dict]:
+    """Записи из контейнера по одной.
+
+    Подлинность всего файла подтверждается только в конце (HMAC трейлера), поэтому
+    потребитель должен применять записи так, чтобы их можно было откатить, если
+    генератор бросит ExportFormatError на последнем шаге.
+    """
+    head = _read_exact(inp, _HEADER.size)
+    magic, version, _flags, kdf_len = _HEADER.unpack(head)
+    if magic != MAGIC:
+        raise ExportFormatError("Это не файл экспорта хранилища")
+    if version != FORMAT_VERSION:
+        raise ExportFormatError(f"Неподдерживаемая версия формата: {version}")
+    if kdf_len > 4096:
+        raise ExportFormatError("Повреждён заголовок")
+    kdf_json = _read_exact(inp, kdf_len)
+    try:
+        # параметры из файла ограничены: иначе вывод ключа можно сделать сколь угодно дорогим
+        kdf = check_kdf(json.loads(kdf_json))
+    except ValueError:
+        raise ExportFormatError("Повреждён заголовок") from None
+
+    fernet, mac_key = _subkeys(password, kdf)
+    mac = hmac.new(mac_key, head + kdf_json, hashlib.sha256)
+
+    count = 0
+    first = True
+    while True:
+        raw_len = _read_exact(inp, _LEN.size)
+        (length,) = _LEN.unpack(raw_len)
+        if length == 0:
+            break
+        if length > MAX_FRAME:
+            raise ExportFormatError("Повреждён кадр")
+        token = _read_exact(inp, length)
+        mac.update(raw_len + token)
+        try:
+            block = json.loads(fernet.decrypt(token))
+        except InvalidToken:
+            raise ExportFormatError("Неверный пароль" if first else "Повреждён кадр") from None
+        first = False
+        for values in block:
+            count += 1
+            yield dict(zip(FIELDS, values))
+
+    raw_count = _read_exact(inp, _COUNT.size)
+    mac.update(raw_len + raw_count)
+    expected = _read_exact(inp, mac.digest_size)
+    if not hmac.compare_digest(mac.digest(), expected) or _COUNT.unpack(raw_count)[0] != count:
+        raise ExportFormatError("Файл повреждён, изменён или пароль неверный")
@@ -0,0 +1,133 @@
+# services/query_stats.py
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+_WS_RE = re.compile(r"\s+")
+_STR_RE = re.compile(r"'(?:[^']|'')*'")
+_NUM_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """Приводит SQL к ключу статистики: схлопывает пробелы, литералы -> ?, IN (?, ?, ...) -> IN (...)."""
+    s = _STR_RE.sub("?", sql)
+    s = _NUM_RE.sub("?", s)
+    s = _WS_RE.sub(" ", s).strip()
+    s = _IN_RE.sub("IN (...)", s)
+    return s
+
+
+class _Entry:
+    __slots__ = ("count", "total", "min", "max", "rows", "samples")
+
+    def __init__(self, sample_size: int):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=sample_size)
+
+    def p95(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class QueryStats:
+    """Статистика выполнения запросов по нормализованному тексту SQL.
+
+    enabled=False выключает сбор: Database тогда даже не засекает время.
+    Все выполнения дольше slow_ms дополнительно попадают в журнал slow_log.
+    """
+
+    def __init__(self, enabled: bool = True, slow_ms: float = 100.0,
+                 sample_size: int = 512, slow_log_size: int = 200):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self._sample_size = sample_size
+        self._entries: Dict[str, _Entry] = {}
+        self._norm_cache: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.slow_log = deque(maxlen=slow_log_size)
+
+    def _key(self, sql: str) -> str:
+        key = self._norm_cache.get(sql)
+        if key is None:
+            key = normalize_sql(sql)
+            if len(self._norm_cache) < 4096:
+                self._norm_cache[sql] = key
+        return key
+
+    def record(self, sql: str, elapsed: float, rows: int = 0):
+        key = self._key(sql)
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                e = self._entries[key] = _Entry(self._sample_size)
+            e.count += 1
+            e.total += elapsed
+            e.rows += rows
+            if elapsed < e.min:
+                e.min = elapsed
+            if elapsed > e.max:
+                e.max = elapsed
+            e.samples.append(elapsed)
+        ms = elapsed * 1000.0
+        if ms >= self.slow_ms:
+            self.slow_log.append((time.strftime("%Y-%m-%d %H:%M:%S"), round(ms, 3), key))
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+        self.slow_log.clear()
+
+    def snapshot(self, order_by: str = "total_ms") -> List[dict]:
+        """Список словарей (в миллисекундах), отсортированный по убыванию order_by."""
+        with self._lock:
+            items = list(self._entries.items())
+            out = [
+                {
+                    "sql": key,
+                    "count": e.count,
+                    "total_ms": e.total * 1000.0,
+                    "avg_ms": e.total * 1000.0 / e.count,
+                    "min_ms": e.min * 1000.0,
+                    "max_ms": e.max * 1000.0,
+                    "p95_ms": e.p95() * 1000.0,
+                    "rows": e.rows,
+                }
+                for key, e in items
+            ]
+        out.sort(key=lambda d: d.get(order_by, 0), reverse=True)
+        return out
+
+    def slow_queries(self, threshold_ms: Optional[float] = None) -> List[dict]:
+        """Запросы, у которых p95 или максимум не ниже порога."""
+        thr = self.slow_ms if threshold_ms is None else threshold_ms
+        return [d for d in self.snapshot("p95_ms") if d["p95_ms"] >= thr or d["max_ms"] >= thr]
+
+    def format_table(self, rows: List[dict]) -> List[str]:
+        lines = [f"{'count':>7} {'total':>10} {'avg':>8} {'min':>8} {'max':>8} {'p95':>8} {'rows':>8}  sql"]
+        for d in rows:
+            lines.append(
+                f"{d['count']:>7} {d['total_ms']:>10.2f} {d['avg_ms']:>8.3f} {d['min_ms']:>8.3f} "
+                f"{d['max_ms']:>8.3f} {d['p95_ms']:>8.3f} {d['rows']:>8}  {d['sql']}"
+            )
+        return lines
+
+    def dump_slow(self, path: str, threshold_ms: Optional[float] = None) -> int:
+        """Сохраняет медленные запросы и журнал медленных выполнений в текстовый файл."""
+        rows = self.slow_queries(threshold_ms)
+        with open(path, "w", encoding="utf-8") as f:
+            thr = self.slow_ms if threshold_ms is None else threshold_ms
+            f.write(f"Slow queries >= {thr} ms (время в мс)\n")
+            f.write("\n".join(self.format_table(rows)) + "\n\n")
+            f.write(f"Slow log (>= {self.slow_ms} ms):\n")
+            for ts, ms, sql in list(self.slow_log):
+                f.write(f"{ts} {ms:>10.3f}  {sql}\n")
+        return len(rows)
@@ -0,0 +1,208 @@
+# services/revisions.py
+"""
+История правок заметок (таблица note_revisions).
+
+Каждая ревизия — состояние заметки (title, content, tags, format_meta) после
+сохранения. Текст хранится либо полным снимком, либо дельтой к предыдущей
+ревизии: список построчных замен [i1, i2, "новые строки"], сжатый zlib. Снимок
+пишется каждые SNAPSHOT_EVERY ревизий (и когда дельта выходит не меньше снимка),
+поэтому для восстановления любой версии применяется не больше SNAPSHOT_EVERY дельт.
+title / tags / format_meta в дельте — NULL, если не менялись.
+
+У каждой ревизии есть state_crc — контрольная сумма состояния. Если заметку
+изменили в обход NotesService.update_note, сумма последней ревизии не совпадёт
+с текущей строкой notes, и перед новой ревизией будет записан снимок прежней версии.
+
+Хранение ограничено: у заметки остаются последние KEEP ревизий; лишние удаляются
+при записи, когда их набирается на COMPACT_SLACK больше (см. RevisionStore.compact).
+"""
+import difflib
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from services.db import Database
+
+# (title, content, tags, format_meta BLOB)
+NoteState = Tuple[str, str, str, bytes]
+
+SNAPSHOT_EVERY = 20
+KEEP = 50
+COMPACT_SLACK = 10
+# выше этого произведения числа изменённых строк SequenceMatcher заменяется одной заменой куска
+DIFF_LIMIT = 4_000_000
+
+
+def state_crc(state: NoteState) -> int:
+    title, content, tags, fm = state
+    crc = zlib.crc32(title.encode("utf-8"))
+    crc = zlib.crc32(b"\x00" + tags.encode("utf-8"), crc)
+    crc = zlib.crc32(b"\x00" + bytes(fm), crc)
+    return zlib.crc32(b"\x00" + content.encode("utf-8"), crc)
+
+
+def pack_snapshot(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"))
+
+
+def make_delta(old: str, new: str) -> bytes:
+    """Построчная дельта old -> new: общие начало и конец отбрасываются, середина — difflib."""
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    n = min(len(a), len(b))
+    p = 0
+    while p < n and a[p] == b[p]:
+        p += 1
+    s = 0
+    while s < n - p and a[-1 - s] == b[-1 - s]:
+        s += 1
+    a_mid, b_mid = a[p:len(a) - s], b[p:len(b) - s]
+    if len(a_mid) * len(b_mid) <= DIFF_LIMIT:
+        ops = [[p + i1, p + i2, "".join(b_mid[j1:j2])]
+               for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a_mid, b_mid).get_opcodes()
+               if tag != "equal"]
+    else:
+        ops = [[p, len(a) - s, "".join(b_mid)]]
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def apply_delta(old: str, delta: bytes) -> str:
+    a = old.splitlines(keepends=True)
+    out, pos = [], 0
+    for i1, i2, text in json.loads(zlib.decompress(delta)):
+        out.extend(a[pos:i1])
+        out.append(text)
+        pos = i2
+    out.extend(a[pos:])
+    return "".join(out)
+
+
+class RevisionStore:
+    """Запись, восстановление и прореживание ревизий заметок в note_revisions."""
+
+    def __init__(self, db: Database, keep: int = KEEP, snapshot_every: int = SNAPSHOT_EVERY):
+        self.db = db
+        self.keep = keep
+        self.snapshot_every = snapshot_every
+
+    # ---------------- запись ----------------
+    def record(self, note_id: int, old: NoteState, new: NoteState):
+        """Записать новую версию заметки. Вызывается в транзакции сохранения, пока в notes ещё old."""
+        if old == new:
+            return
+        last = self.db.fetchone(
+            "SELECT depth, state_crc FROM note_revisions WHERE note_id = ? ORDER BY id DESC LIMIT 1",
+            (note_id,)
+        )
+        old_crc = state_crc(old)
+        if last is None or last["state_crc"] != old_crc:
+            # истории ещё нет (или её цепочка разошлась с notes) — прежнюю версию сохраняем снимком
+            self._insert(note_id, 0, old, pack_snapshot(old[1]), old_crc)
+            depth = 0
+        else:
+            depth = last["depth"]
+
+        if depth + 1 >= self.snapshot_every:
+            self._insert(note_id, 0, new, pack_snapshot(new[1]), state_crc(new))
+        else:
+            delta = make_delta(old[1], new[1])
+            if len(delta) * 4 > len(new[1]):
+                # крупная правка: снимок может оказаться не больше дельты
+                snapshot = pack_snapshot(new[1])
+                if len(snapshot) <= len(delta):
+                    self._insert(note_id, 0, new, snapshot, state_crc(new))
+                    self._maybe_compact(note_id)
+                    return
+            changed = tuple(n if n != o else None for o, n in zip(old, new))
+            self.db.execute(
+                "INSERT INTO note_revisions(note_id, depth, title, tags, format_meta, content, size, state_crc) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (note_id, depth + 1, changed[0], changed[2], changed[3], delta, len(new[1]), state_crc(new))
+            )
+        self._maybe_compact(note_id)
+
+    def _insert(self, note_id: int, depth: int, state: NoteState, content: bytes, crc: int):
+        title, text, tags, fm = state
+        self.db.execute(
+            "INSERT INTO note_revisions(note_id, depth, title, tags, format_meta, content, size, state_crc) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (note_id, depth, title, tags, fm, content, len(text), crc)
+        )
+
+    def _maybe_compact(self, note_id: int):
+        count = self.db.fetchone("SELECT COUNT(*) FROM note_revisions WHERE note_id = ?", (note_id,))[0]
+        if count > self.keep + COMPACT_SLACK:
+            self.compact(note_id)
+
+    # ---------------- чтение ----------------
+    def history(self, note_id: int) -> List[Tuple]:
+        """(id, created_at, size, snapshot) от новых к старым; size — длина текста версии."""
+        rows = self.db.fetchall(
+            "SELECT id, created_at, size, depth = 0 FROM note_revisions WHERE note_id = ? ORDER BY id DESC",
+            (note_id,)
+        )
+        return [(r[0], r[1], r[2], bool(r[3])) for r in rows]
+
+    def get(self, note_id: int, rev_id: int) -> NoteState:
+        """Восстановить версию: ближайший снимок не позже rev_id и дельты после него.
+        Результат сверяется с state_crc ревизии; повреждённая цепочка — ValueError."""
+        rows = self.db.fetchall(
+            "SELECT id, depth, title, tags, format_meta, content, state_crc FROM note_revisions "
+            "WHERE note_id = ? AND id <= ? AND id >= ("
+            "  SELECT MAX(id) FROM note_revisions WHERE note_id = ? AND id <= ? AND depth = 0"
+            ") ORDER BY id",
+            (note_id, rev_id, note_id, rev_id)
+        )
+        if not rows or rows[-1]["id"] != rev_id:
+            raise ValueError("Ревизия не найдена")
+        first = rows[0]
+        title, tags, fm = first["title"], first["tags"], first["format_meta"]
+        try:
+            content = zlib.decompress(first["content"]).decode("utf-8")
+            for r in rows[1:]:
+                content = apply_delta(content, r["content"])
+                if r["title"] is not None:
+                    title = r["title"]
+                if r["tags"] is not None:
+                    tags = r["tags"]
+                if r["format_meta"] is not None:
+                    fm = r["format_meta"]
+        except (zlib.error, ValueError, TypeError) as e:
+            raise ValueError(f"Ревизия {rev_id} повреждена: {e}") from e
+        state = (title, content, tags, bytes(fm))
+        if state_crc(state) != rows[-1]["state_crc"]:
+            raise ValueError(f"Ревизия {rev_id} повреждена: контрольная сумма не совпадает")
+        return state
+
+    # ---------------- прореживание ----------------
+    def compact(self, note_id: int, keep: Optional[int] = None, older_than_days: Optional[int] = None) -> int:
+        """Оставить последние keep ревизий (и не старше older_than_days, но хотя бы одну).
+        Первая оставшаяся ревизия переписывается снимком. Возвращает число удалённых."""
+        keep = max(1, keep or self.keep)
+        ids = [r[0] for r in self.db.fetchall(
+            "SELECT id FROM note_revisions WHERE note_id = ? ORDER BY id", (note_id,)
+        )]
+        if not ids:
+            return 0
+        cut = ids[-keep] if len(ids) > keep else ids[0]
+        if older_than_days is not None:
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+            row = self.db.fetchone(
+                "SELECT MIN(id) FROM note_revisions WHERE note_id = ? AND created_at >= ?", (note_id, cutoff)
+            )
+            cut = max(cut, row[0] if row[0] is not None else ids[-1])
+        if cut == ids[0]:
+            return 0
+        with self.db.transaction():
+            depth = self.db.fetchone("SELECT depth FROM note_revisions WHERE id = ?", (cut,))[0]
+            if depth:
+                title, text, tags, fm = self.get(note_id, cut)
+                self.db.execute(
+                    "UPDATE note_revisions SET depth = 0, title = ?, tags = ?, format_meta = ?, content = ? "
+                    "WHERE id = ?",
+                    (title, tags, fm, pack_snapshot(text), cut)
+                )
+            return self.db.executemany(
+                "DELETE FROM note_revisions WHERE note_id = ? AND id < ?", [(note_id, cut)]
+            )
@@ -0,0 +1,20 @@
+# services/tags.py
+import re
+from typing import List
+
+_SPLIT_RE = re.compile(r"[,;#\s]+")
+
+
+def parse_tags(tags: str) -> List[str]:
+    """Строка тегов из notes.tags -> список нормализованных тегов без повторов.
+
+    Разделители: запятая, точка с запятой, '#' и пробелы; регистр не учитывается.
+    """
+    out = []
+    seen = set()
+    for t in _SPLIT_RE.split(tags or ""):
+        t = t.strip().lower()
+        if t and t not in seen:
+            seen.add(t)
+            out.append(t)
+    return out
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# тесты запускаются из корня проекта: python -m pytest tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,50 @@
+# tests/test_audit.py
+import threading
+
+import pytest
+
+from services.paws.passwords_service import PasswordsService
+
+
+@pytest.fixture
+def svc(tmp_path, monkeypatch):
+    monkeypatch.setattr(PasswordsService, "KDF_TARGET_SECONDS", 0.001)
+    service = PasswordsService("pw", db_path=str(tmp_path / "paws.db"))
+    service.add_entries((f"site{i}", "me", "qwerty" if i % 3 else f"Zx9!kq{i}Lm#Vb2r") for i in range(25))
+    service.auditor.chunk_size = 4
+    yield service
+    service.close()
+
+
+def _batched(svc, cancel=None):
+    results, after_id, calls = [], 0, 0
+    while True:
+        batch, last_id = svc.audit_batch(after_id, cancel)
+        results += batch
+        calls += 1
+        if last_id is None:
+            return results, calls
+        after_id = last_id
+
+
+def test_batches_match_full_audit(svc):
+    full = {r["id"]: r for r in svc.audit()}
+    results, calls = _batched(svc)
+    assert calls == 8  # 25 записей по 4 + пустой кусок в конце
+    assert {r["id"]: r for r in results} == full
+
+
+def test_batches_prune_deleted_entries(svc):
+    _batched(svc)
+    deleted = [r["id"] for r in svc.list_entries()[5:9]]
+    svc.delete_entries(deleted)
+    results, _ = _batched(svc)
+    assert len(results) == 21
+    assert not set(deleted) & set(svc.auditor._cache)
+
+
+def test_cancelled_batch_returns_nothing(svc):
+    cancel = threading.Event()
+    cancel.set()
+    results, last_id = svc.audit_batch(0, cancel)
+    assert results == [] and last_id is not None
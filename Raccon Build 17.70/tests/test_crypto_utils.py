@@ -0,0 +1,17 @@
+# tests/test_crypto_utils.py
+from services.paws.crypto_utils import SCRYPT_MAX_LOG2N, calibrate_kdf, derive_key
+
+
+def test_calibrated_scrypt_memory_is_bounded():
+    # цель в минуты времени не должна превращаться в гигабайты памяти
+    params = calibrate_kdf(1000.0)
+    if params["kdf"] == "scrypt":
+        assert params["n"] <= 1 << SCRYPT_MAX_LOG2N
+        assert 128 * params["r"] * params["n"] <= 128 * 1024 * 1024
+        assert params["p"] > 1
+
+
+def test_scrypt_with_raised_p_derives_stable_key():
+    params = {"kdf": "scrypt", "salt": "00" * 16, "n": 1 << 14, "r": 8, "p": 4}
+    assert derive_key("secret", params) == derive_key("secret", dict(params))
+    assert derive_key("secret", params) != derive_key("secret", {**params, "p": 1})
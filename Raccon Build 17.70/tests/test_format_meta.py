@@ -0,0 +1,196 @@
+# tests/test_format_meta.py
+import random
+
+import pytest
+
+from services.format_meta import FORMAT_VERSION, KNOWN_STYLES, MAGIC, FormatMeta, FormatMetaError, RangeSet
+
+SIZE = 80
+
+
+class Reference:
+    """Наивная модель: флаг стиля у каждого символа текста."""
+
+    def __init__(self, size):
+        self.flags = [False] * size
+
+    def add(self, start, end):
+        for i in range(max(0, start), min(end, len(self.flags))):
+            self.flags[i] = True
+
+    def remove(self, start, end):
+        for i in range(max(0, start), min(end, len(self.flags))):
+            self.flags[i] = False
+
+    def apply_edit(self, offset, removed, inserted):
+        f = self.flags
+        del f[offset:offset + removed]
+        # как теги tk.Text: стиль получает вставка, у которой стиль с обеих сторон
+        inside = 0 < offset < len(f) and f[offset - 1] and f[offset]
+        f[offset:offset] = [inside] * inserted
+
+    def ranges(self):
+        out, start = [], None
+        for i, on in enumerate(self.flags + [False]):
+            if on and start is None:
+                start = i
+            elif not on and start is not None:
+                out.append((start, i))
+                start = None
+        return out
+
+
+def _span(rng, size):
+    start = rng.randrange(size)
+    return start, min(size, start + rng.randint(0, 12))
+
+
+def test_add_remove_match_reference():
+    rng = random.Random(1)
+    for _ in range(200):
+        rs, ref = RangeSet(), Reference(SIZE)
+        for _ in range(30):
+            start, end = _span(rng, SIZE)
+            op = rng.choice(("add", "add", "remove"))
+            getattr(rs, op)(start, end)
+            getattr(ref, op)(start, end)
+            assert list(rs) == ref.ranges()
+        for pos in range(SIZE):
+            assert rs.contains(pos) == ref.flags[pos]
+        start, end = _span(rng, SIZE)
+        assert list(rs.clip(start, end)) == [
+            (max(s, start), min(e, end)) for s, e in ref.ranges() if s < end and e > start
+        ]
+        if end > start:
+            assert rs.covers(start, end) == all(ref.flags[start:end])
+
+
+def test_apply_edit_matches_reference():
+    rng = random.Random(2)
+    for _ in range(300):
+        rs, ref = RangeSet(), Reference(SIZE)
+        for _ in range(8):
+            rs.add(*_span(rng, SIZE))
+        for s, e in rs:
+            ref.add(s, e)
+        for _ in range(20):
+            size = len(ref.flags)
+            offset = rng.randint(0, size)
+            removed = rng.randint(0, min(6, size - offset)) if rng.random() < 0.6 else 0
+            inserted = rng.randint(0, 6) if rng.random() < 0.6 else 0
+            rs.apply_edit(offset, removed, inserted)
+            ref.apply_edit(offset, removed, inserted)
+            assert list(rs) == ref.ranges(), (offset, removed, inserted)
+
+
+def test_insert_at_range_edges_is_not_styled():
+    rs = RangeSet([(5, 10)])
+    rs.apply_edit(5, 0, 3)    # перед началом — диапазон сдвигается
+    assert list(rs) == [(8, 13)]
+    rs.apply_edit(13, 0, 2)   # после конца — не растёт
+    assert list(rs) == [(8, 13)]
+    rs.apply_edit(10, 0, 4)   # внутри — растёт
+    assert list(rs) == [(8, 17)]
+
+
+def test_delete_joins_neighbouring_ranges():
+    rs = RangeSet([(0, 5), (8, 10), (20, 22)])
+    rs.apply_edit(5, 3)
+    assert list(rs) == [(0, 7), (17, 19)]
+    rs.apply_edit(16, 4)      # диапазон удалён целиком
+    assert list(rs) == [(0, 7)]
+
+
+def test_constructor_merges_overlapping_and_adjacent():
+    assert list(RangeSet([(5, 8), (0, 3), (3, 5), (10, 12), (11, 15), (20, 20)])) == [(0, 8), (10, 15)]
+
+
+# ---------------- BLOB и прежний JSON ----------------
+# format_meta, как его писали версии до BLOB: пересечения, повторы и мусор
+LEGACY_JSON = (
+    '{"bold": [[0, 5], [3, 8], [3, 8]], "italic": [[10, 12]], "underline": [],'
+    ' "цвет:red": [[-4, 2], [300, 1000]], "bad": "x", "strike": [[1], ["a", 2], [7, 9]]}'
+)
+
+
+def _random_meta(rng):
+    meta = FormatMeta()
+    for style in rng.sample(KNOWN_STYLES + ("цвет:red", "mark"), rng.randint(0, 6)):
+        for _ in range(rng.randint(1, 10)):
+            # и короткие разности (байтовый блок), и длинные (varint)
+            start = rng.randrange(5000 if rng.random() < 0.3 else 100)
+            meta.add(style, start, start + rng.randint(1, 300))
+    return meta
+
+
+def test_blob_round_trip_random():
+    rng = random.Random(3)
+    for _ in range(300):
+        meta = _random_meta(rng)
+        blob = meta.to_bytes()
+        assert blob.startswith(MAGIC) and blob[len(MAGIC)] == FORMAT_VERSION
+        loaded = FormatMeta.from_bytes(blob)
+        assert loaded.to_dict() == meta.to_dict()
+        assert loaded.to_bytes() == blob
+        assert FormatMeta.load(memoryview(blob)) == meta
+
+
+def test_edit_after_load_matches_edit_in_memory():
+    rng = random.Random(4)
+    for _ in range(100):
+        meta = _random_meta(rng)
+        loaded = FormatMeta.load(meta.to_bytes())
+        for _ in range(5):
+            offset, removed, inserted = rng.randrange(400), rng.randint(0, 20), rng.randint(0, 20)
+            meta.apply_edit(offset, removed, inserted)
+            loaded.apply_edit(offset, removed, "x" * inserted)
+        assert loaded.to_dict() == meta.to_dict()
+        assert loaded.to_bytes() == meta.copy().to_bytes()
+
+
+def test_lazy_style_decoding():
+    meta = FormatMeta({"bold": RangeSet([(0, 3)]), "italic": RangeSet([(200, 900)])})
+    loaded = FormatMeta.from_bytes(meta.to_bytes())
+    assert sorted(loaded.styles()) == ["bold", "italic"]
+    assert list(loaded.ranges("italic")) == [(200, 900)]
+    assert list(loaded.ranges("strike")) == []
+    loaded.toggle("bold", 0, 3)
+    assert loaded.to_dict() == {"italic": [[200, 900]]}
+
+
+def test_legacy_json_is_normalized():
+    meta = FormatMeta.load(LEGACY_JSON)
+    assert meta.to_dict() == {
+        "bold": [[0, 8]],
+        "italic": [[10, 12]],
+        "цвет:red": [[0, 2], [300, 1000]],
+        "strike": [[7, 9]],
+    }
+    assert FormatMeta.from_bytes(meta.to_bytes()) == meta
+    assert FormatMeta.load(meta.to_json()) == meta
+
+
+@pytest.mark.parametrize("value", [None, "", "{}", "не json", "[1, 2]", b"", b"{}"])
+def test_empty_or_unreadable_json(value):
+    assert not FormatMeta.load(value)
+
+
+def test_corrupt_blob_reads_as_empty():
+    blob = FormatMeta({"bold": RangeSet([(0, 3), (200, 900)])}).to_bytes()
+    for broken in (blob[:-1], blob[:len(MAGIC) + 3], MAGIC + bytes([FORMAT_VERSION, 99])):
+        with pytest.raises(FormatMetaError):
+            FormatMeta.from_bytes(broken)
+        assert not FormatMeta.load(broken).to_dict()
+    with pytest.raises(FormatMetaError):
+        FormatMeta.from_bytes(MAGIC + bytes([FORMAT_VERSION + 1]))
+
+
+def test_corrupt_style_block_drops_only_that_style():
+    meta = FormatMeta({"bold": RangeSet([(0, 3)]), "italic": RangeSet([(5, 9)])})
+    blob = bytearray(meta.to_bytes())
+    # нулевая разность между границами bold — пустой диапазон, такого BLOB не бывает
+    assert blob[len(MAGIC) + 1:len(MAGIC) + 4] == bytes([0, 1, 2])
+    blob[len(MAGIC) + 5] = 0
+    loaded = FormatMeta.load(bytes(blob))
+    assert loaded.to_dict() == {"italic": [[5, 9]]}
+    assert loaded.to_bytes() == FormatMeta({"italic": RangeSet([(5, 9)])}).to_bytes()
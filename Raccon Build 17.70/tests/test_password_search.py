@@ -0,0 +1,68 @@
+# tests/test_password_search.py
+"""Поиск паролей находит одно и то же через индекс в памяти и через SQL."""
+import sqlite3
+
+import pytest
+
+from services.db import Database
+from services.paws.passwords_service import PasswordsService
+
+ENTRIES = [
+    ("Почта", "Иван"), ("ПОЧТА.ру", "ivan"), ("почтальон", None), ("Bank", "ЁЖИК"),
+    ("50% скидка", "a_b"), ("500 скидок", "axb"), ("Straße", "ÄRGER"), ("git", "dev"),
+]
+QUERIES = ["почта", "ПОЧТ", "Иван", "ёжик", "ЁЖ", "50%", "%", "a_b", "_", "ärger", "STRASSE", "straße", "git"]
+
+
+@pytest.fixture
+def svc(tmp_path, monkeypatch):
+    monkeypatch.setattr(PasswordsService, "KDF_TARGET_SECONDS", 0.001)
+    service = PasswordsService("pw", db_path=str(tmp_path / "paws.db"))
+    service.add_entries((s, u or "", "x") for s, u in ENTRIES)
+    yield service
+    service.close()
+
+
+def _services(rows):
+    return sorted(r["service"] for r in rows)
+
+
+def _via(svc, query, ratio):
+    # ratio 0 — всегда список id из индекса, огромный — всегда проверка подстроки в SQL
+    svc.SEARCH_SELECTIVE_RATIO = ratio
+    svc._search_memo = (None, -1, "[]")
+    return _services(svc.list_entries(query=query)), _services(svc.list_entries_page(query=query))
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_index_and_scan_paths_agree(svc, query):
+    expected = sorted(s for s, u in ENTRIES if query.lower() in s.lower() or query.lower() in (u or "").lower())
+    assert _via(svc, query, 0) == (expected, expected)
+    assert _via(svc, query, 10 ** 9) == (expected, expected)
+    # хранилище заблокировано — индекса нет
+    svc.lock()
+    assert _services(svc.list_entries(query=query)) == expected
+
+
+def test_search_text_follows_updates(svc):
+    entry_id = svc.list_entries(query="git")[0]["id"]
+    svc.update_entry(entry_id, "ГитХаб", "dev", None)
+    svc.lock()
+    assert _services(svc.list_entries(query="гитхаб")) == ["ГитХаб"]
+    assert svc.list_entries(query="git") == []
+
+
+def test_migration_fills_search_text(tmp_path):
+    path = str(tmp_path / "paws.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY AUTOINCREMENT, service TEXT NOT NULL, "
+                 "username TEXT, password_enc TEXT NOT NULL, notes TEXT)")
+    conn.execute("INSERT INTO passwords(service, username, password_enc) VALUES ('Почта', NULL, 'x')")
+    conn.commit()
+    conn.close()
+    db = Database(path, migrations=None)
+    try:
+        svc = PasswordsService(None, db=db)
+        assert _services(svc.list_entries(query="ПОЧТА")) == ["Почта"]
+    finally:
+        db.close()
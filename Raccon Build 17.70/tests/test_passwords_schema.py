@@ -0,0 +1,116 @@
+# tests/test_passwords_schema.py
+"""Хранилище паролей в присоединённой схеме, когда в main есть старая таблица passwords."""
+import sqlite3
+
+import pytest
+
+from services.db import Database
+from services.paws.crypto_utils import LEGACY_MASTER_PASSWORD, encrypt_password
+from services.paws.passwords_service import PasswordsService
+from services.paws.vault import InvalidMasterPasswordError
+
+LEGACY_PASSWORDS = """
+    CREATE TABLE passwords (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        service TEXT NOT NULL,
+        username TEXT,
+        password_enc TEXT NOT NULL,
+        notes TEXT
+    , created_at TEXT DEFAULT (datetime('now')), updated_at TEXT DEFAULT (datetime('now')))
+"""
+
+
+@pytest.fixture(autouse=True)
+def fast_kdf(monkeypatch):
+    monkeypatch.setattr(PasswordsService, "KDF_TARGET_SECONDS", 0.001)
+
+
+def _legacy_file(path, master_password, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_PASSWORDS)
+    conn.executemany(
+        "INSERT INTO passwords(service, username, password_enc) VALUES (?, ?, ?)",
+        [(s, u, encrypt_password(master_password, p)) for s, u, p in rows]
+    )
+    conn.commit()
+    conn.close()
+
+
+def _main_columns(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[1] for r in conn.execute("PRAGMA table_info(passwords)")]
+    finally:
+        conn.close()
+
+
+def test_attached_vault_ignores_legacy_main_table(tmp_path):
+    main_path, vault_path = str(tmp_path / "raccon.db"), str(tmp_path / "paws.db")
+    _legacy_file(main_path, "other", [("main-only", "x", "p1")])
+    _legacy_file(vault_path, "secret", [("mail", "me", "hunter22"), ("bank", "me", "hunter22")])
+
+    db = Database(main_path, attach={"vault": vault_path})
+    try:
+        svc = PasswordsService("secret", db=db, schema="vault")
+        new_id = svc.add_entry("git", "dev", "s3cret!")
+
+        assert [r["service"] for r in svc.list_entries()] == ["mail", "bank", "git"]
+        assert svc.get_entry_by_id(new_id)["password"] == "s3cret!"
+        assert [[r["service"] for r in g] for g in svc.find_reused()] == [["mail", "bank"]]
+        assert [r["service"] for r in svc.list_entries_page(query="ban")] == ["bank"]
+
+        # повторное открытие идёт по сохранённым параметрам KDF из vault.vault_meta
+        svc.lock()
+        svc.unlock("secret")
+        assert svc.get_entry_by_id(1)["password"] == "hunter22"
+        svc.close()
+    finally:
+        db.close()
+
+    # таблица в main осталась как была: без новых колонок и строк
+    assert "password_fp" not in _main_columns(main_path)
+    conn = sqlite3.connect(main_path)
+    assert conn.execute("SELECT service FROM passwords").fetchall() == [("main-only",)]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'vault_meta'").fetchone() is None
+    conn.close()
+
+
+def test_unknown_schema_is_rejected(tmp_path):
+    db = Database(str(tmp_path / "raccon.db"))
+    try:
+        with pytest.raises(ValueError):
+            PasswordsService(None, db=db, schema="vault")
+    finally:
+        db.close()
+
+
+def test_legacy_default_password_opens_old_vault_and_is_replaced(tmp_path):
+    path = str(tmp_path / "paws.db")
+    _legacy_file(path, LEGACY_MASTER_PASSWORD, [("mail", "me", "hunter22")])
+
+    svc = PasswordsService(None, db_path=path)
+    try:
+        assert svc.vault_state() == "legacy"
+        svc.unlock(LEGACY_MASTER_PASSWORD)
+        assert svc.get_entry_by_id(1)["password"] == "hunter22"
+        assert svc.vault_state() == "ready"
+
+        # то, что делает интерфейс сразу после открытия паролем по умолчанию
+        svc.rotate_master_password(LEGACY_MASTER_PASSWORD, "mine")
+        svc.lock()
+        with pytest.raises(InvalidMasterPasswordError):
+            svc.unlock(LEGACY_MASTER_PASSWORD)
+        svc.unlock("mine")
+        assert svc.get_entry_by_id(1)["password"] == "hunter22"
+    finally:
+        svc.close()
+
+
+def test_vault_state_of_empty_vault_is_new(tmp_path):
+    svc = PasswordsService(None, db_path=str(tmp_path / "paws.db"))
+    try:
+        assert svc.vault_state() == "new"
+        svc.unlock("first")
+        assert svc.vault_state() == "ready"
+    finally:
+        svc.close()
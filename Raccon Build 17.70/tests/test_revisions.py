@@ -0,0 +1,174 @@
+# tests/test_revisions.py
+import random
+
+import pytest
+
+from services.db import Database
+from services.format_meta import FormatMeta
+from services.notes_service import NotesService
+from services.revisions import (
+    COMPACT_SLACK, KEEP, SNAPSHOT_EVERY, apply_delta, make_delta, pack_snapshot
+)
+
+WORDS = ["alpha", "beta", "гамма", "delta", "", "  отступ", "x" * 40]
+
+
+@pytest.fixture
+def notes(tmp_path):
+    db = Database(str(tmp_path / "notes.db"))
+    yield NotesService(db)
+    db.close()
+
+
+def _text(rng, lines=60):
+    return "".join(rng.choice(WORDS) + "\n" for _ in range(lines)) + rng.choice(WORDS)
+
+
+def _edit(rng, text):
+    """Случайная построчная правка: замена, вставка или удаление нескольких строк."""
+    lines = text.split("\n")
+    i = rng.randrange(len(lines))
+    op = rng.choice(("replace", "insert", "delete"))
+    if op == "replace":
+        lines[i] = rng.choice(WORDS) + str(rng.randrange(1000))
+    elif op == "insert":
+        lines[i:i] = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+    elif len(lines) > 1:
+        del lines[i:i + rng.randint(1, 2)]
+    return "\n".join(lines)
+
+
+def _states(notes, rng, count):
+    """Заметка и count сохранений. Возвращает (note_id, [состояние до правок, после 1-й, ...])."""
+    content = _text(rng)
+    note_id = notes.create_note("title", content, "a")
+    empty = FormatMeta().to_bytes()
+    states = [("title", content, "a", empty)]
+    for n in range(count):
+        content = _edit(rng, content)
+        title = f"title {n // 7}"  # заголовок меняется не в каждой ревизии
+        notes.update_note(note_id, title, content, "a", "{}")
+        states.append((title, content, "a", empty))
+    return note_id, states
+
+
+def _rev_ids(notes, note_id):
+    return [r[0] for r in reversed(notes.list_revisions(note_id))]
+
+
+def _depths(notes, note_id):
+    return [r[0] for r in notes.db.fetchall(
+        "SELECT depth FROM note_revisions WHERE note_id = ? ORDER BY id", (note_id,)
+    )]
+
+
+def test_delta_round_trip_random():
+    rng = random.Random(1)
+    for _ in range(200):
+        old = _text(rng, rng.randint(0, 30))
+        new = old
+        for _ in range(rng.randint(0, 5)):
+            new = _edit(rng, new)
+        assert apply_delta(old, make_delta(old, new)) == new
+    # без завершающего перевода строки и с \r\n
+    assert apply_delta("a\r\nb", make_delta("a\r\nb", "a\r\nb\r\nc")) == "a\r\nb\r\nc"
+    assert apply_delta("", make_delta("", "x")) == "x"
+    assert apply_delta("x\n", make_delta("x\n", "")) == ""
+
+
+def test_every_revision_round_trips(notes):
+    note_id, states = _states(notes, random.Random(2), 45)
+    ids = _rev_ids(notes, note_id)
+    # первая ревизия — снимок исходной версии, дальше по одной на сохранение
+    assert len(ids) == len(states)
+    for rev_id, state in zip(ids, states):
+        assert notes.get_revision(note_id, rev_id) == state
+
+
+def test_snapshot_every_n_revisions(notes):
+    note_id, _ = _states(notes, random.Random(3), 2 * SNAPSHOT_EVERY + 5)
+    depths = _depths(notes, note_id)
+    # длинный текст, мелкие правки — дельты всегда меньше снимка
+    assert depths == [i % SNAPSHOT_EVERY for i in range(len(depths))]
+    assert [snap for _, _, _, snap in reversed(notes.list_revisions(note_id))] == [d == 0 for d in depths]
+
+
+def test_out_of_band_edit_writes_snapshot(notes):
+    rng = random.Random(4)
+    note_id, states = _states(notes, rng, 3)
+    notes.db.execute("UPDATE notes SET content = ? WHERE id = ?", ("изменено снаружи", note_id))
+    notes.update_note(note_id, states[-1][0], "после", "a", "{}")
+
+    ids = _rev_ids(notes, note_id)
+    # две ревизии за одно сохранение: снимок чужой правки и сама правка
+    assert len(ids) == len(states) + 2
+    assert _depths(notes, note_id)[-2] == 0
+    assert notes.get_revision(note_id, ids[-2])[1] == "изменено снаружи"
+    assert notes.get_revision(note_id, ids[-1])[1] == "после"
+    assert notes.get_revision(note_id, ids[-3]) == states[-1]
+
+
+def test_automatic_compaction_keeps_last_revisions(notes):
+    note_id, states = _states(notes, random.Random(5), KEEP + COMPACT_SLACK)
+    # KEEP + COMPACT_SLACK + 1 ревизий — на последней записи история прорежена до KEEP
+    ids = _rev_ids(notes, note_id)
+    assert len(ids) == KEEP
+    assert _depths(notes, note_id)[0] == 0
+    for rev_id, state in zip(ids, states[-KEEP:]):
+        assert notes.get_revision(note_id, rev_id) == state
+
+
+def test_compact_rewrites_first_kept_revision_as_snapshot(notes):
+    note_id, states = _states(notes, random.Random(6), 30)
+    ids = _rev_ids(notes, note_id)
+    assert _depths(notes, note_id)[-7] != 0
+
+    assert notes.compact_revisions(note_id, keep=7) == len(ids) - 7
+    assert _rev_ids(notes, note_id) == ids[-7:]
+    assert _depths(notes, note_id)[0] == 0
+    for rev_id, state in zip(ids[-7:], states[-7:]):
+        assert notes.get_revision(note_id, rev_id) == state
+    with pytest.raises(ValueError):
+        notes.get_revision(note_id, ids[0])
+    # следующая правка продолжает цепочку от уцелевших ревизий
+    notes.update_note(note_id, "t", "новое", "a", "{}")
+    assert notes.get_revision(note_id, _rev_ids(notes, note_id)[-1])[1] == "новое"
+
+
+def test_corrupted_delta_is_detected(notes):
+    note_id, states = _states(notes, random.Random(7), 5)
+    ids = _rev_ids(notes, note_id)
+    # дельта читается без ошибок, но даёт другой текст — ловит только state_crc
+    forged = make_delta(states[2][1], states[2][1] + "лишняя строка\n")
+    notes.db.execute("UPDATE note_revisions SET content = ? WHERE id = ?", (forged, ids[3]))
+    assert notes.get_revision(note_id, ids[2]) == states[2]
+    for rev_id in ids[3:]:
+        with pytest.raises(ValueError):
+            notes.get_revision(note_id, rev_id)
+
+    notes.db.execute("UPDATE note_revisions SET content = ? WHERE id = ?", (b"not zlib", ids[3]))
+    with pytest.raises(ValueError):
+        notes.get_revision(note_id, ids[3])
+
+
+def test_corrupted_snapshot_is_detected(notes):
+    note_id, _ = _states(notes, random.Random(8), 2)
+    first = _rev_ids(notes, note_id)[0]
+    notes.db.execute("UPDATE note_revisions SET content = ? WHERE id = ?", (pack_snapshot("другое"), first))
+    with pytest.raises(ValueError):
+        notes.get_revision(note_id, first)
+
+
+def test_restore_revision(notes):
+    note_id, states = _states(notes, random.Random(9), 10)
+    ids = _rev_ids(notes, note_id)
+
+    notes.restore_revision(note_id, ids[3])
+    title, content, tags = notes.get_note_by_id(note_id)[1:4]
+    assert (title, content, tags) == states[3][:3]
+    # восстановление — новая ревизия, прежние на месте
+    after = _rev_ids(notes, note_id)
+    assert after[:-1] == ids
+    assert notes.get_revision(note_id, after[-1]) == states[3]
+    assert notes.get_revision(note_id, ids[-1]) == states[-1]
+    assert notes.diff_revisions(note_id, after[-1]) == ""
@@ -0,0 +1,64 @@
+# tests/test_rotation.py
+import pytest
+
+from services.paws.passwords_service import PasswordsService
+from services.paws.vault import RotationPendingError, VaultLockedError
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def svc(tmp_path, monkeypatch):
+    monkeypatch.setattr(PasswordsService, "KDF_TARGET_SECONDS", 0.001)
+    service = PasswordsService("old", db_path=str(tmp_path / "paws.db"))
+    service.add_entries((f"site{i}", "me", f"pw{i}") for i in range(10))
+    yield service
+    service.close()
+
+
+def _interrupt_after_first_chunk(svc):
+    calls = []
+
+    def progress(done, total):
+        calls.append(done)
+        if len(calls) == 2:  # первый вызов — до первого куска, второй — после него
+            raise Interrupted
+
+    with pytest.raises(Interrupted):
+        svc.rotate_master_password("old", "new", chunk_size=4, on_progress=progress)
+
+
+def test_interrupted_rotation_locks_service_and_refuses_writes(svc):
+    svc.search_ids("site")  # индекс построен
+    _interrupt_after_first_chunk(svc)
+
+    assert not svc.is_unlocked
+    assert svc.search_ids("site") is None
+    with pytest.raises(VaultLockedError):
+        svc.get_entry_by_id(2)
+    for write in (lambda: svc.update_entry(2, "site2", "me", "changed"),
+                  lambda: svc.update_entry(2, "site2", "me", None),
+                  lambda: svc.add_entry("x", "y", "z"),
+                  lambda: svc.add_entries([("x", "y", "z")])):
+        with pytest.raises(RotationPendingError):
+            write()
+    with pytest.raises(RotationPendingError):
+        svc.unlock("old")
+
+    # повторная смена заканчивает начатое, ни одна запись не потеряна
+    assert svc.rotate_master_password("old", "new", chunk_size=4) == 10
+    assert [svc.get_entry_by_id(i)["password"] for i in range(1, 11)] == [f"pw{i}" for i in range(10)]
+    svc.lock()
+    svc.unlock("new")
+    assert svc.get_entry_by_id(2)["password"] == "pw1"
+
+
+def test_finished_rotation_rebuilds_search_index(svc):
+    _interrupt_after_first_chunk(svc)
+    svc.lock()  # как при запуске приложения с незавершённой сменой: индекса нет
+    svc.rotate_master_password("old", "new", chunk_size=4)
+    assert svc.search_ids("site1") == {2}
+    svc.update_entry(2, "site1", "me", "fresh")
+    assert svc.find_reused() == []
@@ -0,0 +1,82 @@
+# tests/test_text_index.py
+import random
+
+import pytest
+
+from ui.text_index import LineIndex
+
+PIECES = ["a", "bc", "\n", "\n\n", "строка\n", "x\ny", ""]
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # начала строк досчитываются мелкими блоками — проверяется и ленивый путь
+    monkeypatch.setattr(LineIndex, "_BLOCK", 3)
+
+
+def _line_col(text, offset):
+    before = text[:offset]
+    return before.count("\n") + 1, offset - (before.rfind("\n") + 1)
+
+
+def _offset(text, line, col):
+    lines = text.split("\n")
+    if line < 1:
+        return 0
+    if line > len(lines):
+        return len(text)
+    return sum(len(s) + 1 for s in lines[:line - 1]) + min(col, len(lines[line - 1]))
+
+
+def _check(index, text, rng):
+    assert len(index) == len(text)
+    assert index.line_count == text.count("\n") + 1
+    # запросы в случайном порядке: начала строк считаются не только подряд
+    for offset in rng.sample(range(len(text) + 1), min(len(text) + 1, 15)):
+        line, col = _line_col(text, offset)
+        assert index.to_line_col(offset) == (line, col)
+        assert index.to_index(offset) == f"{line}.{col}"
+    for _ in range(10):
+        line, col = rng.randint(0, index.line_count + 1), rng.randint(0, 10)
+        assert index.to_offset(line, col) == _offset(text, line, col)
+
+
+def test_random_edits_match_plain_string():
+    rng = random.Random(1)
+    for _ in range(100):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 20)))
+        index = LineIndex(text)
+        _check(index, text, rng)
+        for _ in range(40):
+            if text and rng.random() < 0.45:
+                start = rng.randrange(len(text))
+                end = rng.randint(start, min(len(text), start + 8))
+                index.delete(start, end)
+                text = text[:start] + text[end:]
+            else:
+                offset = rng.randint(0, len(text))
+                chars = "".join(rng.choice(PIECES) for _ in range(rng.randint(1, 3)))
+                index.insert(offset, chars)
+                text = text[:offset] + chars + text[offset:]
+            _check(index, text, rng)
+
+
+def test_out_of_range_positions_are_clamped():
+    index = LineIndex("ab\ncd")
+    assert index.to_line_col(-5) == (1, 0)
+    assert index.to_line_col(100) == (2, 2)
+    assert index.to_offset(1, 100) == 2
+    assert index.to_offset(9, 0) == 5
+    index.delete(3, 100)
+    assert len(index) == 3 and index.to_line_col(3) == (2, 0)
+    index.delete(2, 1)
+    assert len(index) == 3
+
+
+def test_reset_replaces_content():
+    index = LineIndex("one\ntwo")
+    index.to_line_col(6)
+    index.reset("x\n\ny\n")
+    assert index.line_count == 4
+    assert [index.to_index(o) for o in range(6)] == ["1.0", "1.1", "2.0", "3.0", "3.1", "4.0"]
+    assert index.to_offset(4, 0) == 5
@@ -0,0 +1,61 @@
+# tests/test_vault_export.py
+import io
+import json
+
+import pytest
+
+from services.paws.crypto_utils import calibrate_kdf
+from services.paws.vault_export import (
+    _HEADER, _LEN, FORMAT_VERSION, MAGIC, ExportFormatError, read_export, write_export,
+)
+
+SALT = "00" * 16
+RECORDS = [
+    {"service": "mail", "username": "me", "password": "p1", "notes": "", "created_at": None, "updated_at": None},
+    {"service": "bank", "username": "я", "password": "пароль", "notes": "x", "created_at": None, "updated_at": None},
+]
+
+
+def _crafted(kdf) -> io.BytesIO:
+    # заголовок с произвольным kdf; кадры не нужны — ошибка должна быть до вывода ключа
+    kdf_json = json.dumps(kdf).encode()
+    return io.BytesIO(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(kdf_json)) + kdf_json + _LEN.pack(0))
+
+
+def test_roundtrip():
+    buf = io.BytesIO()
+    assert write_export(buf, "pw", RECORDS, calibrate_kdf(0.001)) == 2
+    buf.seek(0)
+    assert list(read_export(buf, "pw")) == RECORDS
+
+
+@pytest.mark.parametrize("kdf", [
+    {"kdf": "scrypt", "salt": SALT, "n": 1 << 30, "r": 8, "p": 1},
+    {"kdf": "scrypt", "salt": SALT, "n": 1 << 14, "r": 1 << 20, "p": 1},
+    {"kdf": "scrypt", "salt": SALT, "n": 1 << 14, "r": 8, "p": 1 << 20},
+    {"kdf": "scrypt", "salt": SALT, "n": 3 << 14, "r": 8, "p": 1},
+    {"kdf": "scrypt", "salt": SALT, "n": 1 << 14, "r": 8, "p": True},
+    {"kdf": "pbkdf2_sha256", "salt": SALT, "iterations": 10 ** 12},
+    {"kdf": "pbkdf2_sha256", "salt": SALT, "iterations": 1},
+    {"kdf": "pbkdf2_sha256", "salt": SALT, "iterations": "600000"},
+], ids=["scrypt-n", "scrypt-r", "scrypt-p", "scrypt-n-not-pow2", "scrypt-p-bool",
+        "pbkdf2-huge", "pbkdf2-tiny", "pbkdf2-str"])
+def test_costly_kdf_rejected(kdf):
+    with pytest.raises(ExportFormatError):
+        next(read_export(_crafted(kdf), "pw"))
+
+
+@pytest.mark.parametrize("kdf", [
+    ["scrypt"], "scrypt", 42, None,
+    {},
+    {"kdf": "sha256", "salt": SALT},
+    {"kdf": "argon2", "salt": SALT},
+    {"kdf": "scrypt", "salt": SALT},
+    {"kdf": "scrypt", "n": 1 << 14, "r": 8, "p": 1},
+    {"kdf": "scrypt", "salt": "zz", "n": 1 << 14, "r": 8, "p": 1},
+    {"kdf": "pbkdf2_sha256", "salt": 5, "iterations": 600000},
+], ids=["list", "str", "int", "null", "empty", "legacy", "unknown", "scrypt-missing",
+        "no-salt", "bad-salt", "salt-type"])
+def test_malformed_kdf_rejected(kdf):
+    with pytest.raises(ExportFormatError):
+        next(read_export(_crafted(kdf), "pw"))
@@ -0,0 +1,169 @@
+# ui/bg_executor.py
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError
+from typing import Callable, Dict, Hashable, Optional
+
+
+class BackgroundExecutor:
+    """Выполняет обращения к сервисам в рабочем потоке, чтобы Tk mainloop не ждал I/O.
+
+    submit() возвращает Future; результат (или исключение) передаётся в on_done/on_error
+    уже в Tk-потоке: рабочий поток кладёт его в очередь, а Tk-поток разбирает очередь
+    через widget.after (как DebugUI._poll) — Tk нельзя трогать из других потоков.
+
+    key — «слот» запроса: новый submit с тем же key отменяет предыдущий. Если старый
+    ещё не начался, он снимается с очереди; если уже выполняется — его результат
+    просто не доставляется (например, устаревший поиск при наборе текста).
+
+    on_busy(True/False) вызывается, когда появляются первые / заканчиваются последние
+    задачи — для индикатора занятости.
+
+    call_soon() — из рабочего потока передать вызов в Tk-поток (например, прогресс
+    длинной операции).
+
+    По умолчанию один рабочий поток: все запросы к одному сервису идут последовательно,
+    как и раньше, только не в Tk-потоке.
+    """
+
+    def __init__(self, widget, workers: int = 1, poll_ms: int = 25,
+                 on_busy: Optional[Callable[[bool], None]] = None,
+                 on_error: Optional[Callable[[BaseException], None]] = None):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self.on_error = on_error
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="raccon-bg")
+        self._results: "queue.Queue" = queue.Queue()
+        self._calls: "queue.Queue" = queue.Queue()
+        self._keys: Dict[Hashable, Future] = {}
+        self._stale = set()  # отменённые, но уже выполнявшиеся задачи: результат не доставляется
+        self._pending = 0
+        self._polling = False
+        self._closed = False
+
+    # ---------------- API ----------------
+    def submit(self, fn: Callable, *args, on_done: Optional[Callable] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               key: Optional[Hashable] = None, **kwargs) -> Future:
+        """Вызывается из Tk-потока."""
+        if self._closed:
+            raise RuntimeError("BackgroundExecutor закрыт")
+        if key is not None:
+            self.cancel(key)
+
+        fut = self._pool.submit(fn, *args, **kwargs)
+        if key is not None:
+            self._keys[key] = fut
+
+        self._set_pending(self._pending + 1)
+        fut.add_done_callback(lambda f: self._results.put((f, key, on_done, on_error)))
+        self._ensure_polling()
+        return fut
+
+    def cancel(self, key: Hashable) -> None:
+        old = self._keys.pop(key, None)
+        if old is not None and not old.done():
+            if not old.cancel():
+                self._stale.add(old)
+
+    def call_soon(self, fn: Callable, *args) -> None:
+        """Потокобезопасно: fn(*args) будет вызвана в Tk-потоке при следующем опросе."""
+        self._calls.put((fn, args))
+
+    def busy(self) -> bool:
+        return self._pending > 0
+
+    def shutdown(self) -> None:
+        self._closed = True
+        for key in list(self._keys):
+            self.cancel(key)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------------- доставка в Tk-поток ----------------
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        try:
+            while True:
+                fn, args = self._calls.get_nowait()
+                try:
+                    fn(*args)
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(e)
+        except queue.Empty:
+            pass
+        try:
+            while True:
+                fut, key, on_done, on_error = self._results.get_nowait()
+                self._set_pending(self._pending - 1)
+                if key is not None and self._keys.get(key) is fut:
+                    del self._keys[key]
+                self._deliver(fut, on_done, on_error)
+        except queue.Empty:
+            pass
+        if self._pending > 0 and not self._closed:
+            try:
+                self.widget.after(self.poll_ms, self._poll)
+                return
+            except Exception:
+                pass
+        self._polling = False
+
+    def _deliver(self, fut: Future, on_done, on_error):
+        if fut in self._stale:
+            self._stale.discard(fut)
+            return
+        if fut.cancelled():
+            return
+        try:
+            result = fut.result()
+        except CancelledError:
+            return
+        except BaseException as e:
+            handler = on_error or self.on_error
+            if handler is not None:
+                handler(e)
+            return
+        if on_done is not None:
+            try:
+                on_done(result)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+
+    def _set_pending(self, n: int):
+        was_busy = self._pending > 0
+        self._pending = max(0, n)
+        now_busy = self._pending > 0
+        if was_busy != now_busy and self.on_busy is not None:
+            try:
+                self.on_busy(now_busy)
+            except Exception:
+                pass
+
+
+def run_service_call(executor: Optional[BackgroundExecutor], fn: Callable, *args,
+                     on_done: Optional[Callable] = None,
+                     on_error: Optional[Callable[[BaseException], None]] = None,
+                     key: Optional[Hashable] = None) -> None:
+    """Вызов сервиса из UI: через executor, если он есть, иначе сразу в Tk-потоке.
+
+    В обоих случаях on_done/on_error вызываются в Tk-потоке, так что код экрана
+    не зависит от того, подключён ли фоновый исполнитель.
+    """
+    if executor is not None:
+        executor.submit(fn, *args, on_done=on_done, on_error=on_error, key=key)
+        return
+    try:
+        result = fn(*args)
+    except Exception as e:
+        if on_error is not None:
+            on_error(e)
+            return
+        raise
+    if on_done is not None:
+        on_done(result)
@@ -7,6 +7,8 @@ DevCLI - небольшая встроенная консоль для разр
   tables                     - показать таблицы в sqlite
   notes                      - вывести все заметки
   sql <запрос>               - выполнить SQL запрос и показать результаты
+  stats [slow [мс]|dump [мс] [имя_файла]|reset|on|off]
+                             - статистика запросов к БД
   dump                       - вывести содержимое .py файлов в окно
   dump save                  - сохранить каждый .py в dcli_dumps/<name>.txt
   dump all [имя_файла]       - собрать все .py в один файл dcli_dumps/all_code_<ts>.txt
@@ -36,6 +38,29 @@ class _SafeDB:
         cur.execute(query)
         return cur.fetchall()
 
+    def iterate(self, query: str, arraysize: int = 200):
+        # Потоковое чтение: Database.iterate, либо fetchmany по курсору sqlite3.Connection
+        if self._db is None:
+            raise RuntimeError("DB not provided")
+        if hasattr(self._db, "iterate"):
+            yield from self._db.iterate(query, (), arraysize)
+            return
+        cur = self._db.cursor()
+        try:
+            cur.execute(query)
+            while True:
+                chunk = cur.fetchmany(arraysize)
+                if not chunk:
+                    break
+                yield from chunk
+        finally:
+            cur.close()
+
+    @property
+    def stats(self):
+        # QueryStats есть только у Database; у голого sqlite3.Connection статистики нет
+        return getattr(self._db, "stats", None)
+
 
 class DevCLI:
     def __init__(self, master, db=None, notes_service=None):
@@ -109,6 +134,8 @@ class DevCLI:
                 self._cmd_notes()
             elif head == "sql":
                 self._cmd_sql(" ".join(parts[1:]))
+            elif head == "stats":
+                self._cmd_stats(parts[1:])
             elif head == "dump":
                 # Подкоманды: dump, dump save, dump all
                 if len(parts) == 1:
@@ -138,6 +165,10 @@ class DevCLI:
             "  tables                     - показать таблицы sqlite",
             "  notes                      - вывести все заметки",
             "  sql <запрос>               - выполнить SQL запрос",
+            "  stats                      - статистика запросов (топ по суммарному времени)",
+            "  stats slow [мс]            - запросы с p95/max не ниже порога",
+            "  stats dump [мс] [файл]     - сохранить медленные запросы в dcli_dumps/",
+            "  stats reset | on | off     - сбросить / включить / выключить сбор",
             "  dump                       - вывести .py в окно",
             "  dump save                  - сохранить каждый .py в dcli_dumps/",
             "  dump all [имя_файла]       - собрать все .py в один файл",
@@ -163,12 +194,14 @@ class DevCLI:
             self._print("[notes] notes_service не предоставлен")
             return
         try:
-            notes = self.notes_service.get_all_notes()
-            if not notes:
-                self._print("(нет заметок)")
-                return
+            iter_notes = getattr(self.notes_service, "iter_all_notes", None)
+            notes = iter_notes() if iter_notes else self.notes_service.get_all_notes()
+            empty = True
             for n in notes:
-                self._print(str(n))
+                self._print(str(tuple(n)))
+                empty = False
+            if empty:
+                self._print("(нет заметок)")
         except Exception as e:
             self._print(f"[notes] Ошибка: {e}")
 
@@ -180,17 +213,60 @@ class DevCLI:
             self._print("[sql] DB не предоставлена")
             return
         try:
-            rows = self.db.fetchall(query)
-            if not rows:
-                self._print("(пусто)")
-                return
-            for r in rows:
+            empty = True
+            for r in self.db.iterate(query):
                 self._print(str(tuple(r)))
+                empty = False
+            if empty:
+                self._print("(пусто)")
         except sqlite3.Error as e:
             self._print(f"[SQL Error] {e}")
         except Exception as e:
             self._print(f"[sql] Ошибка: {e}")
 
+    def _cmd_stats(self, args):
+        stats = self.db.stats if self.db is not None else None
+        if stats is None:
+            self._print("[stats] статистика недоступна для этой БД")
+            return
+        sub = args[0].lower() if args else ""
+        if sub == "":
+            rows = stats.snapshot()[:20]
+            if not rows:
+                self._print("(нет данных)" if stats.enabled else "(сбор статистики выключен)")
+                return
+            self._print("Время в мс:")
+            for line in stats.format_table(rows):
+                self._print(line)
+        elif sub == "slow":
+            thr = float(args[1]) if len(args) > 1 else None
+            rows = stats.slow_queries(thr)
+            if not rows:
+                self._print("(медленных запросов нет)")
+                return
+            for line in stats.format_table(rows):
+                self._print(line)
+        elif sub == "dump":
+            thr = float(args[1]) if len(args) > 1 else None
+            root_dir = os.path.dirname(os.path.dirname(__file__))
+            dumps_dir = os.path.join(root_dir, "dcli_dumps")
+            os.makedirs(dumps_dir, exist_ok=True)
+            if len(args) > 2:
+                name = args[2]
+            else:
+                name = f"slow_queries_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            path = os.path.join(dumps_dir, name)
+            n = stats.dump_slow(path, thr)
+            self._print(f"[stats dump] {n} запрос(ов) сохранено в: {path}")
+        elif sub == "reset":
+            stats.reset()
+            self._print("[stats] сброшено")
+        elif sub in ("on", "off"):
+            stats.enabled = sub == "on"
+            self._print(f"[stats] сбор {'включён' if stats.enabled else 'выключен'}")
+        else:
+            self._print("Использование: stats [slow [мс]|dump [мс] [имя_файла]|reset|on|off]")
+
     def _cmd_debug(self):
         # Открываем отдельное окно DebugUI; используем относительный импорт внутри пакета ui
         try:
@@ -1,29 +1,44 @@
 # ui/main_ui.py
 import tkinter as tk
 from tkinter import ttk
+from typing import Optional
 
 from services.db import Database
 from services.notes_service import NotesService
+from ui.bg_executor import BackgroundExecutor
 from ui.notes_ui import NotesUI
 from ui.passwords_ui import PasswordsUI
 
 
 class RacconApp:
-    def __init__(self, db_path: str = "raccon.db"):
+    def __init__(self, db_path: str = "raccon.db", vault_path: Optional[str] = None):
         self.root = tk.Tk()
         self.root.title("Raccoon Pro")
         self.root.geometry("900x600")
 
         # --- сервисы ---
-        self.db = Database(db_path)
+        # одно соединение на оба сервиса; хранилище паролей — в том же файле
+        # или в отдельном vault_path, присоединённом как схема "vault"
+        self.vault_schema = "vault" if vault_path else "main"
+        self.db = Database(db_path, attach={"vault": vault_path} if vault_path else None)
         self.notes_service = NotesService(self.db)
 
+        # --- фоновые исполнители: по одному рабочему потоку на сервис ---
+        # (соединение на запись одно, поэтому запросы каждого сервиса строго по очереди)
+        self._busy_sources = set()
+        self.notes_executor = BackgroundExecutor(
+            self.root, on_busy=lambda busy: self._set_busy("notes", busy)
+        )
+        self.passwords_executor = BackgroundExecutor(
+            self.root, on_busy=lambda busy: self._set_busy("passwords", busy)
+        )
+
         # --- Notebook (вкладки) ---
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill="both", expand=True)
 
         # --- Заметки ---
-        self.notes_tab = NotesUI(self.notebook, self.notes_service)
+        self.notes_tab = NotesUI(self.notebook, self.notes_service, executor=self.notes_executor)
         self.notebook.add(self.notes_tab.frame, text="Заметки")
 
         # --- Задачи (пока пустая) ---
@@ -32,17 +47,52 @@ class RacconApp:
 
         # --- Пароли ---
         # Подключаем PasswordsUI вместо пустого Frame
-        # master_password можно будет вынести в отдельный ввод/настройки
-        self.passwords_tab = PasswordsUI(self.notebook, master_password="secret123", db_path=db_path)
+        # мастер-пароль PasswordsUI спросит сам и откроет хранилище в рабочем потоке
+        self.passwords_tab = PasswordsUI(
+            self.notebook, executor=self.passwords_executor, db=self.db, schema=self.vault_schema
+        )
         self.notebook.add(self.passwords_tab.get_frame(), text="Пароли")
 
-        # --- DCLI кнопка ---
-        dcli_btn = ttk.Button(self.root, text="DCLI", command=self.open_dcli)
-        dcli_btn.pack(side="bottom", pady=4)
+        # --- DCLI кнопка и индикатор занятости ---
+        bottom = ttk.Frame(self.root)
+        bottom.pack(side="bottom", fill="x", before=self.notebook)
+        dcli_btn = ttk.Button(bottom, text="DCLI", command=self.open_dcli)
+        dcli_btn.pack(side="top", pady=4)
+        self.busy_bar = ttk.Progressbar(bottom, mode="indeterminate", length=120)
+        self.busy_label = ttk.Label(bottom, text="Загрузка…")
+
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def _set_busy(self, source: str, busy: bool):
+        was_busy = bool(self._busy_sources)
+        if busy:
+            self._busy_sources.add(source)
+        else:
+            self._busy_sources.discard(source)
+        if bool(self._busy_sources) == was_busy:
+            return
+        try:
+            if self._busy_sources:
+                self.busy_bar.place(relx=1.0, rely=0.5, anchor="e", x=-8)
+                self.busy_label.place(relx=1.0, rely=0.5, anchor="e", x=-136)
+                self.busy_bar.start(15)
+            else:
+                self.busy_bar.stop()
+                self.busy_bar.place_forget()
+                self.busy_label.place_forget()
+        except tk.TclError:
+            pass
 
     def open_dcli(self):
         from ui.dev_cli import DevCLI
         DevCLI(self.root, db=self.db, notes_service=self.notes_service)
 
+    def close(self):
+        self.notes_executor.shutdown()
+        self.passwords_executor.shutdown()
+        self.passwords_tab.service.close()
+        self.db.close()
+        self.root.destroy()
+
     def run(self):
         self.root.mainloop()
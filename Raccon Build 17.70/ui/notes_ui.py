@@ -1,8 +1,12 @@
 # ui/notes_ui.py
-import json
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 
+from services.format_meta import FormatMeta, RangeSet
+from ui.bg_executor import run_service_call
+from ui.text_index import TextChangeTracker
+from ui.virtual_tree import VirtualTree
+
 
 class FormattingPanel(tk.Toplevel):
     """Полноценное окно форматирования с Pin/Unpin.
@@ -10,12 +14,25 @@ class FormattingPanel(tk.Toplevel):
     """
     WIDTH = 300
     DEFAULT_HEIGHT = 420
+    # теги ставятся только на видимые строки и столько строк выше и ниже
+    VIEWPORT_MARGIN = 300
 
-    def __init__(self, editor_win: tk.Toplevel, text_widget: tk.Text, format_meta: dict | None):
+    def __init__(self, editor_win: tk.Toplevel, text_widget: tk.Text, format_meta: FormatMeta | dict | None):
         super().__init__(editor_win)
         self.editor_win = editor_win
         self.text = text_widget
-        self.format_meta = format_meta or {}
+        if not isinstance(format_meta, FormatMeta):
+            format_meta = FormatMeta.from_dict(format_meta or {})
+        self.format_meta = format_meta
+        # смещения <-> индексы Tk за O(log n); индекс обновляется при каждой правке текста,
+        # диапазоны форматирования сдвигаются вместе с ним (как теги самого Text)
+        self.tracker = TextChangeTracker(text_widget)
+        self.tracker.listeners.append(self._on_text_edit)
+        # пока редактор догружает текст кусками, format_meta уже относится ко всему тексту
+        self.loading = False
+        # часть текста (смещения), на которую теги уже поставлены
+        self._styled = RangeSet()
+        self._viewport_job = None
         self.pinned = False
         self._following = False
         self._editor_configure_handler = None
@@ -52,6 +69,7 @@ class FormattingPanel(tk.Toplevel):
         ttk.Button(frm, text="Зачёркнутый", command=lambda: self.apply_style("strike")).pack(fill="x", pady=4)
 
         ttk.Separator(frm, orient="horizontal").pack(fill="x", pady=(8, 8))
+        ttk.Button(frm, text="Снять с выделения", command=self.unstyle_selection).pack(fill="x", pady=4)
         ttk.Button(frm, text="Очистить формат", command=self.clear_meta).pack(fill="x", pady=4)
         ttk.Button(frm, text="Закрыть панель", command=self.hide).pack(fill="x", pady=(8, 0))
 
@@ -168,6 +186,15 @@ class FormattingPanel(tk.Toplevel):
         except Exception:
             pass
 
+    def on_view_changed(self, *_args):
+        """Видимая часть текста изменилась (прокрутка, размер, загрузка) — доставить теги."""
+        if self._viewport_job is None:
+            self._viewport_job = self.after_idle(self._style_viewport)
+
+    def finish_loading(self):
+        self.loading = False
+        self.on_view_changed()
+
     def show(self):
         if self.pinned:
             self._position_right_of_editor()
@@ -180,24 +207,10 @@ class FormattingPanel(tk.Toplevel):
 
     # ---------------- форматирование метаданных ----------------
     def _index_to_offset(self, idx: str) -> int:
-        line, col = map(int, str(idx).split("."))
-        offset = 0
-        for l in range(1, line):
-            line_text = self.text.get(f"{l}.0", f"{l}.end")
-            offset += len(line_text) + 1
-        offset += col
-        return offset
+        return self.tracker.index_to_offset(idx)
 
     def _offset_to_index(self, offset: int) -> str:
-        line = 1
-        while True:
-            line_text = self.text.get(f"{line}.0", f"{line}.end")
-            line_len = len(line_text) + 1
-            if offset < line_len:
-                col = offset
-                return f"{line}.{col}"
-            offset -= line_len
-            line += 1
+        return self.tracker.offset_to_index(offset)
 
     def _get_selection_bounds_offsets(self):
         try:
@@ -207,21 +220,29 @@ class FormattingPanel(tk.Toplevel):
             return None
         return self._index_to_offset(s), self._index_to_offset(e)
 
-    def _record_range(self, style: str, start_off: int, end_off: int):
+    def apply_style(self, style_key: str):
+        """Применить стиль к выделению; если выделение уже целиком в этом стиле — снять его."""
+        bounds = self._get_selection_bounds_offsets()
+        if not bounds:
+            messagebox.showinfo("Форматирование", "Выделите текст, который нужно отформатировать")
+            return
+        start_off, end_off = bounds
         if start_off >= end_off:
             return
-        lst = self.format_meta.get(style, [])
-        lst.append([start_off, end_off])
-        self.format_meta[style] = lst
-        self._apply_meta_tag(style, start_off, end_off)
+        if self.format_meta.toggle(style_key, start_off, end_off):
+            self._apply_meta_tag(style_key, start_off, end_off)
+        else:
+            self._remove_meta_tag(style_key, start_off, end_off)
 
-    def apply_style(self, style_key: str):
+    def unstyle_selection(self):
         bounds = self._get_selection_bounds_offsets()
         if not bounds:
-            messagebox.showinfo("Форматирование", "Выделите текст, который нужно отформатировать")
+            messagebox.showinfo("Форматирование", "Выделите текст, с которого нужно снять формат")
             return
         start_off, end_off = bounds
-        self._record_range(style_key, start_off, end_off)
+        for style in self.format_meta.styles():
+            self._remove_meta_tag(style, start_off, end_off)
+        self.format_meta.remove_all(start_off, end_off)
 
     def clear_meta(self):
         if not messagebox.askyesno("Очистка", "Удалить все метаданные форматирования?"):
@@ -239,14 +260,54 @@ class FormattingPanel(tk.Toplevel):
         except Exception:
             pass
 
+    def _remove_meta_tag(self, style: str, start_off: int, end_off: int):
+        try:
+            self.text.tag_remove(self._style_to_tag(style), self._offset_to_index(start_off),
+                                 self._offset_to_index(end_off))
+        except Exception:
+            pass
+
+    def _on_text_edit(self, offset: int, removed: int, inserted: str):
+        if self.loading:
+            return
+        self.format_meta.apply_edit(offset, removed, inserted)
+        self._styled.apply_edit(offset, removed, len(inserted))
+
     def _apply_all_meta_tags(self):
+        """Снять все теги и заново поставить их на видимую часть текста."""
         self._remove_all_meta_tags()
+        self._styled = RangeSet()
+        self._style_viewport()
+
+    def _style_viewport(self):
+        # теги — только для видимых строк с запасом VIEWPORT_MARGIN; уже размеченное пропускается
+        self._viewport_job = None
+        try:
+            first = int(self.text.index("@0,0").split(".")[0])
+            last = int(self.text.index(f"@0,{max(self.text.winfo_height(), 1)}").split(".")[0])
+        except tk.TclError:
+            return
+        index = self.tracker.index
+        start = index.to_offset(first - self.VIEWPORT_MARGIN, 0)
+        end = index.to_offset(last + self.VIEWPORT_MARGIN + 1, 0)
+        todo = RangeSet([(start, end)])
+        for s, e in self._styled.clip(start, end):
+            todo.remove(s, e)
+        if not todo:
+            return
+        to_index = self._offset_to_index
         for style, ranges in self.format_meta.items():
-            for r in ranges:
+            # все диапазоны стиля в окне — одним tag_add: tag_add tag i1 i2 i3 i4 ...
+            indices = []
+            for win_start, win_end in todo:
+                for s, e in ranges.clip(win_start, win_end):
+                    indices += (to_index(s), to_index(e))
+            if indices:
                 try:
-                    self._apply_meta_tag(style, int(r[0]), int(r[1]))
+                    self.text.tag_add(self._style_to_tag(style), *indices)
                 except Exception:
                     pass
+        self._styled.add(start, end)
 
     def _remove_all_meta_tags(self):
         for tag in ("fmt_bold", "fmt_italic", "fmt_underline", "fmt_strike"):
@@ -263,15 +324,23 @@ class FormattingPanel(tk.Toplevel):
             "strike": "fmt_strike"
         }.get(style, "fmt_bold")
 
-    def get_format_meta_json(self) -> str:
-        return json.dumps(self.format_meta, ensure_ascii=False)
+    def get_format_meta_blob(self) -> bytes:
+        # снимок для фонового сохранения: bytes не меняются, пока пользователь правит текст
+        return self.format_meta.to_bytes()
 
 
 # ---------------- NotesUI ----------------
 class NotesUI:
-    def __init__(self, master, notes_service):
+    # сколько строк запрашивать у сервиса за одну страницу виртуального списка
+    PAGE_SIZE = 200
+    # текст заметки вставляется в редактор кусками по столько символов, между ними — цикл событий
+    LOAD_CHUNK = 256 * 1024
+
+    def __init__(self, master, notes_service, executor=None):
         self.master = master
         self.notes_service = notes_service
+        # BackgroundExecutor: обращения к сервису идут в рабочем потоке; None — синхронно
+        self.executor = executor
         self.frame = ttk.Frame(master)
 
         control = ttk.Frame(self.frame)
@@ -294,31 +363,29 @@ class NotesUI:
         ttk.Button(control, text="Искать", command=self.search_notes).pack(side="left", padx=6)
         ttk.Button(control, text="Сброс", command=self.load_notes).pack(side="left", padx=6)
 
-        table_frame = ttk.Frame(self.frame)
-        table_frame.pack(fill="both", expand=True, padx=8, pady=6)
-
-        self.tree = ttk.Treeview(
-            table_frame,
-            columns=("id", "title", "tags", "created_at"),
-            show="headings",
-            height=16
+        # виртуальный список: в Treeview только видимые строки, остальное подгружается страницами
+        self.list = VirtualTree(
+            self.frame,
+            columns=("id", "title", "tags", "created_at", "snippet"),
+            page_size=self.PAGE_SIZE,
+            height=16,
+            executor=executor,
+            on_error=lambda e: messagebox.showerror("Ошибка", f"Не удалось загрузить заметки: {e}")
         )
-        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vsb.set)
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        table_frame.rowconfigure(0, weight=1)
-        table_frame.columnconfigure(0, weight=1)
+        self.list.frame.pack(fill="both", expand=True, padx=8, pady=6)
+        self.tree = self.list.tree
 
         self.tree.heading("id", text="ID")
         self.tree.heading("title", text="Заголовок")
         self.tree.heading("tags", text="Теги")
         self.tree.heading("created_at", text="Создано")
+        self.tree.heading("snippet", text="Фрагмент")
 
         self.tree.column("id", width=60, anchor="center")
         self.tree.column("title", width=360, anchor="w")
         self.tree.column("tags", width=180, anchor="w")
         self.tree.column("created_at", width=160, anchor="center")
+        self.tree.column("snippet", width=320, anchor="w")
 
         self.tree.bind("<Double-1>", self._on_double_click)
 
@@ -335,46 +402,64 @@ class NotesUI:
         return self.frame
 
     # ---------------- CRUD и поиск ----------------
+    def _call(self, fn, *args, on_done=None, error_title="Ошибка", key=None):
+        run_service_call(
+            self.executor, fn, *args, on_done=on_done, key=key,
+            on_error=lambda e: messagebox.showerror(error_title, str(e))
+        )
+
     def load_notes(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
         try:
-            rows = self.notes_service.get_all_notes()
-            if rows:
-                for note in rows:
-                    self.tree.insert("", "end", values=note)
+            self.list.reset(self._page_all)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось загрузить заметки: {e}")
 
+    def _page_all(self, last_row, _offset, limit):
+        return self.notes_service.get_notes_page(last_row[0] if last_row else None, limit)
+
     def add_note(self):
         title = self.title_entry.get().strip()
         tags = self.tags_entry.get().strip()
         if not title:
             messagebox.showwarning("Ошибка", "Заголовок не может быть пустым")
             return
-        try:
-            self.notes_service.create_note(title, "", tags)
+
+        def done(_note_id):
             self.title_entry.delete(0, "end")
             self.tags_entry.delete(0, "end")
             self.title_entry.focus_set()
             self.load_notes()
-        except Exception as e:
-            messagebox.showerror("Ошибка", str(e))
+
+        self._call(self.notes_service.create_note, title, "", tags, on_done=done)
 
     def search_notes(self):
         q = self.search_entry.get().strip()
         if not q:
             self.load_notes()
             return
-        try:
-            results = self.notes_service.search_notes(q)
-            for row in self.tree.get_children():
-                self.tree.delete(row)
-            if not results:
+        if q.startswith("#"):
+            # "#работа #дом" — заметки, у которых есть все перечисленные теги
+            tags = q.split()
+
+            def page(last_row, _offset, limit):
+                return self.notes_service.iter_notes_by_tags(
+                    tags, "all", limit, last_id=last_row[0] if last_row else None, limit=limit
+                )
+        else:
+            # полнотекстовый поиск: лучшие совпадения сверху, в колонке «Фрагмент» — выделенный кусок текста
+            def page(_last_row, offset, limit):
+                return [
+                    (*tuple(r)[:4], (r["snippet"] or "").replace("\n", " "))
+                    for r in self.notes_service.iter_search_ranked(q, limit, offset)
+                ]
+
+        def first_page(n):
+            if n == 0:
                 messagebox.showinfo("Поиск", "Ничего не найдено")
-                return
-            for note in results:
-                self.tree.insert("", "end", values=note)
+
+        # предыдущий поиск, если он ещё не закончился, отменяется внутри reset()
+        try:
+            self.list.reset(page, on_first_page=first_page)
         except Exception as e:
             messagebox.showerror("Ошибка", str(e))
 
@@ -385,20 +470,16 @@ class NotesUI:
             return
         note_id = self.tree.item(sel[0])["values"][0]
         if messagebox.askyesno("Подтвердите", "Удалить выбранную заметку?"):
-            try:
-                self.notes_service.delete_note(note_id)
-                self.load_notes()
-            except Exception as e:
-                messagebox.showerror("Ошибка", str(e))
+            self._call(self.notes_service.delete_note, note_id, on_done=lambda _r: self.load_notes())
 
     def view_note(self):
         sel = self.tree.selection()
         if not sel:
-            self.tree.showwarning("Ошибка", "Выберите заметку для просмотра")
+            messagebox.showwarning("Ошибка", "Выберите заметку для просмотра")
             return
         note_id = self.tree.item(sel[0])["values"][0]
-        try:
-            note = self.notes_service.get_note_by_id(note_id)
+
+        def show(note):
             if not note:
                 messagebox.showerror("Ошибка", "Заметка не найдена")
                 return
@@ -410,8 +491,8 @@ class NotesUI:
                 "Заметка",
                 f"Заголовок: {title}\nТеги: {tags}\nСоздано: {created_at}\n\n{content}"
             )
-        except Exception as e:
-            messagebox.showerror("Ошибка", str(e))
+
+        self._call(self.notes_service.get_note_by_id, note_id, on_done=show, key="open_note")
 
     def edit_note(self):
         sel = self.tree.selection()
@@ -419,7 +500,12 @@ class NotesUI:
             messagebox.showwarning("Ошибка", "Выберите заметку для редактирования")
             return
         note_id = self.tree.item(sel[0])["values"][0]
-        note = self.notes_service.get_note_by_id(note_id)
+        self._call(
+            self.notes_service.get_note_by_id, note_id,
+            on_done=lambda note: self._open_editor(note_id, note), key="open_note"
+        )
+
+    def _open_editor(self, note_id, note):
         if not note:
             messagebox.showerror("Ошибка", "Заметка не найдена")
             return
@@ -430,11 +516,8 @@ class NotesUI:
             _, title, content, tags, created_at = note
             format_meta = "{}"
 
-        try:
-            original_meta = json.loads(format_meta or "{}")
-        except Exception:
-            original_meta = {}
-        working_meta = json.loads(json.dumps(original_meta))
+        # отдельная копия для правок: в базе формат меняется только при сохранении
+        working_meta = FormatMeta.load(format_meta)
 
         win = tk.Toplevel(self.master)
         win.title("Редактировать заметку")
@@ -466,15 +549,21 @@ class NotesUI:
 
         text_area = tk.Text(content_frame, wrap="word")
         text_area.pack(side="left", fill="both", expand=True)
-        text_area.insert("1.0", content or "")
 
         text_vsb = ttk.Scrollbar(content_frame, orient="vertical", command=text_area.yview)
         text_vsb.pack(side="right", fill="y")
-        text_area.configure(yscrollcommand=text_vsb.set)
 
-        # панель форматирования — полноценное окно, скрыто по умолчанию
+        # панель форматирования — полноценное окно, скрыто по умолчанию.
+        # Теги она ставит только на видимую часть текста и добавляет при прокрутке
         panel = FormattingPanel(win, text_area, working_meta)
 
+        def on_yscroll(first, last):
+            text_vsb.set(first, last)
+            panel.on_view_changed()
+
+        text_area.configure(yscrollcommand=on_yscroll)
+        text_area.bind("<Configure>", panel.on_view_changed, add="+")
+
         footer = ttk.Frame(win)
         footer.pack(fill="x", padx=12, pady=(6, 10))
 
@@ -492,42 +581,38 @@ class NotesUI:
 
         ttk.Button(left_box, text="Редакт.", command=toggle_panel).pack(side="left")
 
+        def export_to(path, export):
+            cur_title = title_entry.get().strip()
+            cur_tags = tags_entry.get().strip()
+            cur_content = text_area.get("1.0", "end-1c")
+            meta_blob = panel.get_format_meta_blob()
+
+            # сохранение и запись файла — в рабочем потоке, окно редактора не замирает
+            def job():
+                self.notes_service.update_note(note_id, cur_title, cur_content, cur_tags, meta_blob)
+                export(note_id, path)
+
+            self._call(job, on_done=lambda _r: messagebox.showinfo("Экспорт", f"Сохранено: {path}"),
+                       error_title="Экспорт")
+
         def export_md():
             path = filedialog.asksaveasfilename(title="Сохранить как Markdown", defaultextension=".md",
                                                 filetypes=[("Markdown", "*.md"), ("Все файлы", "*.*")])
             if not path:
                 return
-            try:
-                cur_title = title_entry.get().strip()
-                cur_tags = tags_entry.get().strip()
-                cur_content = text_area.get("1.0", "end-1c")
-                self.notes_service.update_note(
-                    note_id, cur_title, cur_content, cur_tags, panel.get_format_meta_json()
-                )
-                self.notes_service.export_note_md(note_id, path)
-                messagebox.showinfo("Экспорт", f"Сохранено: {path}")
-            except Exception as e:
-                messagebox.showerror("Экспорт", f"Ошибка: {e}")
+            export_to(path, self.notes_service.export_note_md)
 
         def export_html():
             path = filedialog.asksaveasfilename(title="Сохранить как HTML", defaultextension=".html",
                                                 filetypes=[("HTML", "*.html"), ("Все файлы", "*.*")])
             if not path:
                 return
-            try:
-                cur_title = title_entry.get().strip()
-                cur_tags = tags_entry.get().strip()
-                cur_content = text_area.get("1.0", "end-1c")
-                self.notes_service.update_note(
-                    note_id, cur_title, cur_content, cur_tags, panel.get_format_meta_json()
-                )
-                self.notes_service.export_note_html(note_id, path)
-                messagebox.showinfo("Экспорт", f"Сохранено: {path}")
-            except Exception as e:
-                messagebox.showerror("Экспорт", f"Ошибка: {e}")
+            export_to(path, self.notes_service.export_note_html)
 
-        ttk.Button(left_box, text="Экспорт MD", command=export_md).pack(side="left", padx=(8, 8))
-        ttk.Button(left_box, text="Экспорт HTML", command=export_html).pack(side="left")
+        export_md_btn = ttk.Button(left_box, text="Экспорт MD", command=export_md)
+        export_md_btn.pack(side="left", padx=(8, 8))
+        export_html_btn = ttk.Button(left_box, text="Экспорт HTML", command=export_html)
+        export_html_btn.pack(side="left")
 
         right_box = ttk.Frame(footer)
         right_box.pack(side="right")
@@ -539,18 +624,23 @@ class NotesUI:
             if not new_title:
                 messagebox.showwarning("Ошибка", "Заголовок не может быть пустым")
                 return
-            try:
-                self.notes_service.update_note(
-                    note_id, new_title, new_content, new_tags, panel.get_format_meta_json()
-                )
+
+            def saved(_r):
                 try:
                     panel.destroy()
                 except Exception:
                     pass
                 self.load_notes()
-                win.destroy()
-            except Exception as e:
-                messagebox.showerror("Ошибка", str(e))
+                try:
+                    win.destroy()
+                except tk.TclError:
+                    pass
+
+            self._call(
+                self.notes_service.update_note,
+                note_id, new_title, new_content, new_tags, panel.get_format_meta_blob(),
+                on_done=saved
+            )
 
         def cancel_and_close():
             try:
@@ -559,11 +649,50 @@ class NotesUI:
                 pass
             win.destroy()
 
-        ttk.Button(right_box, text="Сохранить", command=save_and_close).pack(side="right", padx=6)
+        save_btn = ttk.Button(right_box, text="Сохранить", command=save_and_close)
+        save_btn.pack(side="right", padx=6)
         ttk.Button(right_box, text="Отмена", command=cancel_and_close).pack(side="right")
 
-        panel._apply_all_meta_tags()
         title_entry.focus_set()
+        self._load_content(win, text_area, panel, content or "", (save_btn, export_md_btn, export_html_btn))
+
+    def _load_content(self, win, text_area, panel, content: str, buttons):
+        """Вставить текст в редактор кусками по LOAD_CHUNK, не блокируя окно.
+
+        Первый кусок виден сразу; пока остальные догружаются, текст только для чтения,
+        а сохранение и экспорт недоступны (иначе ушёл бы неполный текст).
+        """
+        chunk = self.LOAD_CHUNK
+        # вставка исходного текста — не правка: format_meta сдвигать не нужно
+        panel.loading = True
+        if len(content) <= chunk:
+            text_area.insert("1.0", content)
+            panel.finish_loading()
+            return
+
+        for btn in buttons:
+            btn.state(["disabled"])
+        title = win.title()
+
+        def step(pos):
+            try:
+                text_area.configure(state="normal")
+                text_area.insert("end-1c", content[pos:pos + chunk])
+                pos += chunk
+                if pos < len(content):
+                    text_area.configure(state="disabled")
+                    win.title(f"{title} — загрузка {pos * 100 // len(content)}%")
+                    win.after(1, step, pos)
+                    return
+                text_area.mark_set("insert", "1.0")
+                win.title(title)
+                for btn in buttons:
+                    btn.state(["!disabled"])
+            except tk.TclError:
+                return  # окно закрыли во время загрузки
+            panel.finish_loading()
+
+        step(0)
 
     def _on_double_click(self, event):
         sel = self.tree.identify_row(event.y)
@@ -1,34 +1,59 @@
 # ui/passwords_ui.py
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog, filedialog
 from typing import Optional
 
+from services.paws.crypto_utils import LEGACY_MASTER_PASSWORD
 from services.paws.passwords_service import PasswordsService
-from services.paws.generator import generate_password
+from services.paws.generator import PasswordGenerator
+from services.paws.vault import InvalidMasterPasswordError, RotationPendingError
+from ui.bg_executor import run_service_call
+from ui.virtual_tree import VirtualTree
 
 
 class PasswordsUI:
-    def __init__(self, master, master_password: str, db_path: str, default_gen_len: int = 16):
+    # сколько записей запрашивать у сервиса за одну страницу виртуального списка
+    PAGE_SIZE = 200
+    # позиция колонки сортировки в строке list_entries_page (id, service, username, notes, updated_at, created_at)
+    _SORT_POS = {"id": 0, "service": 1, "username": 2, "notes": 3, "updated_at": 4, "created_at": 5}
+
+    def __init__(self, master, master_password: Optional[str] = None, db_path: Optional[str] = None,
+                 default_gen_len: int = 16, executor=None, db=None, schema: str = "main"):
         self.master = master
-        self.master_password = master_password
+        # BackgroundExecutor: запросы и расшифровка идут в рабочем потоке; None — синхронно
+        self.executor = executor
         self.db_path = db_path
-        self.service = PasswordsService(master_password, db_path=db_path)
+        # db — общий Database приложения (см. RacconApp); без него сервис откроет свой по db_path
+        self.service = PasswordsService(None, db_path=db_path, db=db, schema=schema)
         self.default_gen_len = default_gen_len
+        self.generator = PasswordGenerator(default_gen_len, digits=True, upper=True, symbols=True)
 
         self.frame = ttk.Frame(master)
         self.sort_col = "id"
         self.sort_asc = True
         self._current_query: Optional[str] = None
+        self._search_after = None
 
         self._build_ui()
-        self.load_entries()
+        # открытие хранилища (вывод ключа, перешифровка старого, индекс поиска) идёт в рабочем
+        # потоке; список заполняется только после него. Без пароля — спрашиваем, когда окно появится
+        self.frame.after_idle(self._unlock, master_password)
 
     def get_frame(self):
         return self.frame
 
     # UI construction
     def _build_ui(self):
-        top = ttk.Frame(self.frame)
+        # пока хранилище закрыто: состояние и кнопка повторной попытки
+        self.lock_bar = ttk.Frame(self.frame)
+        self.lock_bar.pack(fill="x", padx=8, pady=(8, 0))
+        self.lock_label = ttk.Label(self.lock_bar, text="Хранилище закрыто")
+        self.lock_label.pack(side="left")
+        self.unlock_btn = ttk.Button(self.lock_bar, text="Открыть…", command=self._unlock)
+        self.unlock_btn.pack(side="left", padx=6)
+
+        top = self._toolbar = ttk.Frame(self.frame)
         top.pack(fill="x", padx=8, pady=8)
 
         ttk.Label(top, text="Сервис:").pack(side="left")
@@ -46,21 +71,19 @@ class PasswordsUI:
         ttk.Label(top, text="Поиск:").pack(side="left", padx=(20, 0))
         self.search_entry = ttk.Entry(top, width=24)
         self.search_entry.pack(side="left", padx=6)
+        # фильтр по мере набора: индекс в памяти отвечает мгновенно, ждём только паузу в наборе
+        self.search_entry.bind("<KeyRelease>", self._on_search_typed, add="+")
         ttk.Button(top, text="Искать", command=self.search_entries).pack(side="left", padx=4)
         ttk.Button(top, text="Сброс", command=self.reset_search).pack(side="left")
 
-        # Table
-        table_frame = ttk.Frame(self.frame)
-        table_frame.pack(fill="both", expand=True, padx=8, pady=6)
-
+        # Table: виртуальный список, в Treeview только видимые строки
         cols = ("id", "service", "username", "notes", "updated_at")
-        self.tree = ttk.Treeview(table_frame, columns=cols, show="headings", height=16)
-        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vsb.set)
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        table_frame.rowconfigure(0, weight=1)
-        table_frame.columnconfigure(0, weight=1)
+        self.list = VirtualTree(
+            self.frame, columns=cols, page_size=self.PAGE_SIZE, height=16, executor=self.executor,
+            on_error=lambda e: messagebox.showerror("Ошибка", f"Не удалось загрузить пароли: {e}")
+        )
+        self.list.frame.pack(fill="both", expand=True, padx=8, pady=6)
+        self.tree = self.list.tree
 
         # Headings with sort callbacks
         self.tree.heading("id", text="ID", command=lambda: self.sort_by("id"))
@@ -83,11 +106,32 @@ class PasswordsUI:
         ttk.Button(bottom, text="Показать пароль", command=self.show_password).pack(side="left")
         ttk.Button(bottom, text="Копировать пароль", command=self.copy_password).pack(side="left", padx=6)
         ttk.Button(bottom, text="Удалить", command=self.delete_entry).pack(side="left", padx=6)
+        ttk.Button(bottom, text="Повторы паролей", command=self.show_reused).pack(side="left", padx=6)
+        ttk.Button(bottom, text="Аудит", command=self.show_audit).pack(side="left", padx=6)
+        ttk.Button(bottom, text="Экспорт", command=self.export_vault).pack(side="left", padx=(18, 6))
+        ttk.Button(bottom, text="Импорт", command=self.import_vault).pack(side="left")
+        ttk.Button(bottom, text="Сменить мастер-пароль", command=self.change_master_password).pack(side="right")
 
     # Helpers
     def _top_level(self):
         return self.frame.winfo_toplevel()
 
+    def _call(self, fn, *args, on_done=None, error_title="Ошибка", key=None):
+        run_service_call(
+            self.executor, fn, *args, on_done=on_done, key=key,
+            on_error=lambda e: messagebox.showerror(error_title, str(e))
+        )
+
+    def _with_entry(self, entry_id: int, on_entry):
+        """Прочитать и расшифровать запись в рабочем потоке, затем on_entry(entry) в Tk-потоке."""
+        def done(entry):
+            if not entry:
+                messagebox.showerror("Ошибка", "Запись не найдена")
+                return
+            on_entry(entry)
+
+        self._call(self.service.get_entry_by_id, entry_id, on_done=done, key="open_entry")
+
     def _get_selected_id(self) -> Optional[int]:
         sel = self.tree.selection()
         if not sel:
@@ -97,18 +141,109 @@ class PasswordsUI:
         except Exception:
             return None
 
+    def _unlock(self, master_password: Optional[str] = None):
+        """Открыть хранилище в рабочем потоке. Без пароля — по состоянию хранилища:
+        новое — задать пароль (дважды), прерванная смена — закончить её, иначе сначала
+        пароль, который подставляли прежние версии, а если не подошёл — спросить.
+        Отмена оставляет хранилище закрытым."""
+        if self.service.is_unlocked:
+            return
+        if master_password is not None:
+            self._open(master_password)
+            return
+
+        def failed(e):
+            self._set_locked("Хранилище закрыто")
+            messagebox.showerror("Мастер-пароль", f"Не удалось открыть хранилище: {e}")
+
+        self._set_locked("Открытие хранилища…", busy=True)
+        run_service_call(self.executor, self.service.vault_state, on_done=self._unlock_state,
+                         on_error=failed, key="unlock")
+
+    def _unlock_state(self, state: str):
+        if state == "rotation":
+            self._open_failed(RotationPendingError())
+        elif state == "new":
+            pw = self._ask_new_password("Задайте мастер-пароль для хранилища паролей:")
+            if pw is None:
+                self._set_locked("Хранилище закрыто")
+                return
+            self._open(pw)
+        else:
+            self._open(LEGACY_MASTER_PASSWORD, legacy_default=True)
+
+    def _ask_and_open(self):
+        pw = simpledialog.askstring("Мастер-пароль", "Введите мастер-пароль:", show="*",
+                                    parent=self._top_level())
+        if pw is None:
+            self._set_locked("Хранилище закрыто")
+            return
+        self._open(pw)
+
+    def _open(self, pw: str, legacy_default: bool = False):
+        """unlock(pw) в рабочем потоке. legacy_default — пробуем пароль прежних версий:
+        если подошёл, пользователь сразу задаёт свой; если нет — спрашиваем пароль."""
+        def done(_r):
+            self._on_unlocked()
+            if legacy_default:
+                messagebox.showwarning(
+                    "Мастер-пароль",
+                    "Хранилище защищено паролем, который прежние версии задавали сами. Задайте свой мастер-пароль."
+                )
+                self.change_master_password(old=LEGACY_MASTER_PASSWORD)
+
+        def failed(e):
+            if legacy_default and isinstance(e, InvalidMasterPasswordError):
+                self._ask_and_open()
+            else:
+                self._open_failed(e)
+
+        self._set_locked("Открытие хранилища…", busy=True)
+        run_service_call(self.executor, self.service.unlock, pw, on_done=done, on_error=failed, key="unlock")
+
+    def _open_failed(self, e: BaseException):
+        self._set_locked("Хранилище закрыто")
+        if isinstance(e, InvalidMasterPasswordError):
+            messagebox.showerror("Мастер-пароль", "Неверный мастер-пароль")
+            self.frame.after_idle(self._ask_and_open)
+        elif isinstance(e, RotationPendingError):
+            messagebox.showwarning(
+                "Мастер-пароль",
+                "Прошлая смена мастер-пароля не завершилась. Введите старый и новый пароль, чтобы её закончить."
+            )
+            self.change_master_password()
+        else:
+            messagebox.showerror("Мастер-пароль", f"Не удалось открыть хранилище: {e}")
+
+    def _set_locked(self, text: str, busy: bool = False):
+        self.lock_label.configure(text=text)
+        self.unlock_btn.configure(state="disabled" if busy else "normal")
+        if not self.lock_bar.winfo_manager():
+            self.lock_bar.pack(fill="x", padx=8, pady=(8, 0), before=self._toolbar)
+
+    def _on_unlocked(self):
+        self.lock_bar.pack_forget()
+        self.load_entries()
+
     # Load / refresh
     def load_entries(self):
-        for r in self.tree.get_children():
-            self.tree.delete(r)
+        if not self.service.is_unlocked:
+            # до открытия хранилища список пуст; заполнится в _on_unlocked
+            return
+        query, sort_col, sort_asc = self._current_query, self.sort_col, self.sort_asc
+        pos = self._SORT_POS.get(sort_col, 0)
+
+        def page(last_row, _offset, limit):
+            # keyset: продолжение после последней прочитанной строки в текущей сортировке
+            return self.service.list_entries_page(
+                query=query, sort_by=sort_col, ascending=sort_asc,
+                last_sort_value=last_row[pos] if last_row else None,
+                last_id=last_row[0] if last_row else None,
+                limit=limit
+            )
+
         try:
-            rows = self.service.list_entries(query=self._current_query, sort_by=self.sort_col, ascending=self.sort_asc)
-            for row in rows:
-                # rows may or may not include updated_at depending on DB; normalize to 5 values
-                vals = list(row)
-                if len(vals) == 4:
-                    vals.append("")  # ensure updated_at column exists for Treeview
-                self.tree.insert("", "end", values=vals)
+            self.list.reset(page)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось загрузить пароли: {e}")
 
@@ -120,6 +255,19 @@ class PasswordsUI:
             self.sort_asc = True
         self.load_entries()
 
+    SEARCH_DELAY_MS = 120
+
+    def _on_search_typed(self, _event=None):
+        if self._search_after is not None:
+            self.frame.after_cancel(self._search_after)
+        self._search_after = self.frame.after(self.SEARCH_DELAY_MS, self._search_if_changed)
+
+    def _search_if_changed(self):
+        self._search_after = None
+        q = self.search_entry.get().strip() or None
+        if q != self._current_query:
+            self.search_entries()
+
     def search_entries(self):
         q = self.search_entry.get().strip()
         self._current_query = q if q else None
@@ -139,16 +287,18 @@ class PasswordsUI:
             return
 
         # если пароль не введён — генерируем автоматически
-        pwd = generate_password(length=self.default_gen_len, digits=True, upper=True, symbols=True)
+        pwd = self.generator.generate()
 
-        try:
-            new_id = self.service.add_entry(service_name, username, pwd)
+        def done(new_id):
             self.service_entry.delete(0, "end")
             self.username_entry.delete(0, "end")
             self.load_entries()
             messagebox.showinfo("Добавлено", f"Запись #{new_id} создана. Пароль сгенерирован автоматически.")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось добавить запись: {e}")
+
+        run_service_call(
+            self.executor, self.service.add_entry, service_name, username, pwd, on_done=done,
+            on_error=lambda e: messagebox.showerror("Ошибка", f"Не удалось добавить запись: {e}")
+        )
 
     def delete_entry(self):
         entry_id = self._get_selected_id()
@@ -157,11 +307,10 @@ class PasswordsUI:
             return
         if not messagebox.askyesno("Подтвердите", f"Удалить запись #{entry_id}?"):
             return
-        try:
-            self.service.delete_entry(entry_id)
-            self.load_entries()
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось удалить запись: {e}")
+        run_service_call(
+            self.executor, self.service.delete_entry, entry_id, on_done=lambda _r: self.load_entries(),
+            on_error=lambda e: messagebox.showerror("Ошибка", f"Не удалось удалить запись: {e}")
+        )
 
     # Password ops
     def show_password(self):
@@ -169,23 +318,18 @@ class PasswordsUI:
         if not entry_id:
             messagebox.showwarning("Ошибка", "Выберите запись")
             return
-        entry = self.service.get_entry_by_id(entry_id)
-        if not entry:
-            messagebox.showerror("Ошибка", "Запись не найдена")
-            return
-        messagebox.showinfo("Пароль", f"Сервис: {entry['service']}\nЛогин: {entry['username']}\nПароль: {entry['password']}")
+        self._with_entry(entry_id, lambda entry: messagebox.showinfo(
+            "Пароль", f"Сервис: {entry['service']}\nЛогин: {entry['username']}\nПароль: {entry['password']}"
+        ))
 
     def copy_password(self):
         entry_id = self._get_selected_id()
         if not entry_id:
             messagebox.showwarning("Ошибка", "Выберите запись")
             return
-        entry = self.service.get_entry_by_id(entry_id)
-        if not entry:
-            messagebox.showerror("Ошибка", "Запись не найдена")
-            return
+        self._with_entry(entry_id, lambda entry: self._copy_to_clipboard(entry["password"]))
 
-        pwd = entry["password"]
+    def _copy_to_clipboard(self, pwd: str):
         root = self._top_level()
         try:
             root.clipboard_clear()
@@ -202,9 +346,216 @@ class PasswordsUI:
         except Exception:
             pass
 
+    # Reused passwords
+    def show_reused(self):
+        self._call(self.service.find_reused, on_done=self._show_reused_window, key="reused")
+
+    def _show_reused_window(self, groups):
+        if not groups:
+            messagebox.showinfo("Повторы паролей", "Повторяющихся паролей нет")
+            return
+
+        win = tk.Toplevel(self.frame)
+        win.title("Повторы паролей")
+        win.geometry("620x380")
+        win.transient(self.frame)
+
+        cols = ("service", "username", "updated_at")
+        tree = ttk.Treeview(win, columns=cols, show="tree headings")
+        tree.heading("#0", text="Группа / ID")
+        tree.heading("service", text="Сервис")
+        tree.heading("username", text="Логин")
+        tree.heading("updated_at", text="Обновлено")
+        tree.column("#0", width=140)
+        tree.column("service", width=180)
+        tree.column("username", width=160)
+        tree.column("updated_at", width=130, anchor="center")
+        vsb = ttk.Scrollbar(win, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side="left", fill="both", expand=True, padx=(8, 0), pady=8)
+        vsb.pack(side="right", fill="y", pady=8)
+
+        for n, group in enumerate(groups, 1):
+            parent = tree.insert("", "end", text=f"#{n}: {len(group)} записей", open=True)
+            for r in group:
+                tree.insert(parent, "end", text=str(r["id"]),
+                            values=(r["service"], r["username"] or "", r["updated_at"] or ""))
+
+    # Strength audit
+    _SCORE_TEXT = ("очень слабый", "слабый", "средний", "хороший", "сильный")
+
+    def show_audit(self):
+        win = tk.Toplevel(self.frame)
+        win.title("Аудит паролей")
+        win.geometry("760x420")
+        win.transient(self.frame)
+
+        status = ttk.Label(win, text="Проверка…")
+        status.pack(fill="x", padx=8, pady=(8, 0))
+
+        box = ttk.Frame(win)
+        box.pack(fill="both", expand=True, padx=8, pady=8)
+        cols = ("id", "service", "username", "score", "bits", "issues")
+        tree = ttk.Treeview(box, columns=cols, show="headings")
+        for col, text, width, anchor in (("id", "ID", 50, "center"), ("service", "Сервис", 150, "w"),
+                                         ("username", "Логин", 130, "w"), ("score", "Оценка", 100, "w"),
+                                         ("bits", "Бит", 50, "center"), ("issues", "Замечания", 260, "w")):
+            tree.heading(col, text=text)
+            tree.column(col, width=width, anchor=anchor)
+        vsb = ttk.Scrollbar(box, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+
+        cancel = threading.Event()
+        counts = [0, 0]  # всего, слабых (оценка < 2)
+
+        def add(result):
+            try:
+                # слабые — наверх, остальные — в конец, по мере поступления
+                weak = result["score"] < 2
+                tree.insert("", 0 if weak else "end", values=(
+                    result["id"], result["service"], result["username"], self._SCORE_TEXT[result["score"]],
+                    result["entropy_bits"], "; ".join(result["issues"])
+                ))
+                counts[0] += 1
+                counts[1] += weak
+                status.configure(text=f"Проверено: {counts[0]}, слабых: {counts[1]}")
+            except tk.TclError:
+                cancel.set()
+
+        # аудит идёт кусками: следующий ставится в очередь исполнителя только после того,
+        # как пришёл предыдущий, поэтому листание, поиск и показ пароля не ждут весь аудит
+        key = ("audit", str(win))
+
+        def step(after_id):
+            if not cancel.is_set():
+                self._call(self.service.audit_batch, after_id, cancel, on_done=batch_done,
+                           error_title="Аудит", key=key)
+
+        def batch_done(batch):
+            results, last_id = batch
+            for result in results:
+                add(result)
+            if cancel.is_set():
+                return
+            if last_id is None:
+                status.configure(text=f"Готово. Проверено: {counts[0]}, слабых: {counts[1]}")
+                return
+            # через after: без исполнителя куски не вкладываются друг в друга и Tk успевает перерисоваться
+            self.frame.after(0, step, last_id)
+
+        def closed(e):
+            if e.widget is win:
+                cancel.set()
+                if self.executor is not None:
+                    self.executor.cancel(key)
+
+        win.bind("<Destroy>", closed, add="+")
+        step(0)
+
+    # Export / import
+    _VAULT_FILETYPES = [("Резервная копия паролей", "*.rvault"), ("Все файлы", "*.*")]
+
+    def export_vault(self):
+        path = filedialog.asksaveasfilename(title="Экспорт паролей", defaultextension=".rvault",
+                                            filetypes=self._VAULT_FILETYPES)
+        if not path:
+            return
+        parent = self._top_level()
+        pwd = simpledialog.askstring("Экспорт", "Пароль для файла экспорта:", show="*", parent=parent)
+        if not pwd:
+            return
+        if simpledialog.askstring("Экспорт", "Повторите пароль:", show="*", parent=parent) != pwd:
+            messagebox.showwarning("Экспорт", "Пароли не совпадают")
+            return
+        self._call(self.service.export_vault, path, pwd, error_title="Экспорт",
+                   on_done=lambda n: messagebox.showinfo("Экспорт", f"Выгружено записей: {n}\n{path}"))
+
+    def import_vault(self):
+        path = filedialog.askopenfilename(title="Импорт паролей", filetypes=self._VAULT_FILETYPES)
+        if not path:
+            return
+        pwd = simpledialog.askstring("Импорт", "Пароль файла экспорта:", show="*", parent=self._top_level())
+        if pwd is None:
+            return
+
+        def done(n):
+            self.load_entries()
+            messagebox.showinfo("Импорт", f"Добавлено записей: {n}")
+
+        self._call(self.service.import_vault, path, pwd, on_done=done, error_title="Импорт")
+
+    # Master password rotation
+    def _ask_new_password(self, prompt: str = "Новый мастер-пароль:") -> Optional[str]:
+        """Новый мастер-пароль с повтором: опечатка в нём закрыла бы хранилище навсегда."""
+        parent = self._top_level()
+        while True:
+            new = simpledialog.askstring("Мастер-пароль", prompt, show="*", parent=parent)
+            if not new:
+                return None
+            if simpledialog.askstring("Мастер-пароль", "Повторите новый пароль:", show="*", parent=parent) == new:
+                return new
+            messagebox.showwarning("Мастер-пароль", "Пароли не совпадают, введите ещё раз")
+
+    def change_master_password(self, old: Optional[str] = None):
+        """old известен, когда хранилище открылось паролем прежних версий — тогда его не спрашиваем."""
+        parent = self._top_level()
+        if old is None:
+            old = simpledialog.askstring("Мастер-пароль", "Текущий мастер-пароль:", show="*", parent=parent)
+            if old is None:
+                return
+        new = self._ask_new_password()
+        if new is None:
+            return
+
+        win = tk.Toplevel(self.frame)
+        win.title("Смена мастер-пароля")
+        win.transient(self.frame)
+        win.protocol("WM_DELETE_WINDOW", lambda: None)  # прерывать нельзя до конца куска
+        status = ttk.Label(win, text="Подготовка…")
+        status.pack(fill="x", padx=12, pady=(12, 4))
+        bar = ttk.Progressbar(win, mode="determinate", length=320)
+        bar.pack(fill="x", padx=12, pady=(0, 12))
+
+        def show_progress(done, total):
+            try:
+                bar.configure(maximum=max(total, 1), value=done)
+                status.configure(text=f"Перешифровано {done} из {total}")
+            except tk.TclError:
+                pass
+
+        def progress(done, total):
+            # вызывается в рабочем потоке — Tk трогаем только через executor
+            if self.executor is not None:
+                self.executor.call_soon(show_progress, done, total)
+            else:
+                show_progress(done, total)
+                win.update_idletasks()
+
+        def finished(count):
+            win.destroy()
+            # смена могла закончить прерванную — тогда хранилище (с индексом поиска) только сейчас открылось
+            self._on_unlocked()
+            messagebox.showinfo("Мастер-пароль", f"Мастер-пароль изменён, перешифровано записей: {count}")
+
+        def failed(e):
+            win.destroy()
+            if not self.service.is_unlocked:
+                # смена прервана: часть записей уже под новым ключом, сервис закрыл хранилище;
+                # открыть его снова можно только повторной сменой (RotationPendingError при unlock)
+                self._set_locked("Хранилище закрыто: смена мастер-пароля не завершена")
+                self.list.reset(lambda *_args: [])
+            messagebox.showerror("Мастер-пароль", f"Не удалось сменить мастер-пароль: {e}")
+
+        run_service_call(
+            self.executor, self.service.rotate_master_password, old, new, None, None, progress,
+            on_done=finished, on_error=failed
+        )
+
     # Generate helper (places generated password into clipboard for quick paste)
     def _generate_into_clipboard(self):
-        pwd = generate_password(length=self.default_gen_len, digits=True, upper=True, symbols=True)
+        pwd = self.generator.generate()
         root = self._top_level()
         try:
             root.clipboard_clear()
@@ -219,11 +570,9 @@ class PasswordsUI:
         sel_id = self._get_selected_id()
         if not sel_id:
             return
-        entry = self.service.get_entry_by_id(sel_id)
-        if not entry:
-            messagebox.showerror("Ошибка", "Запись не найдена")
-            return
+        self._with_entry(sel_id, self._show_entry_card)
 
+    def _show_entry_card(self, entry: dict):
         win = tk.Toplevel(self.frame)
         win.title(f"Запись #{entry['id']}")
         win.geometry("520x380")
@@ -0,0 +1,197 @@
+# ui/text_index.py
+"""
+Перевод позиций tk.Text ("строка.столбец") в смещения от начала текста и обратно.
+
+LineIndex хранит длины строк и префиксные суммы начал строк: индекс -> смещение
+за O(1), смещение -> индекс за O(log n) (bisect). Правки меняют только длины
+затронутых строк, а начала строк пересчитываются лениво с первой изменённой.
+
+TextChangeTracker встраивается в команду Tcl виджета (как idlelib.redirector)
+и видит каждый insert / delete / replace — и набор с клавиатуры, и вызовы из кода, —
+поэтому индекс всегда соответствует тексту без повторного чтения виджета.
+"""
+import bisect
+from itertools import accumulate
+from typing import Callable, List, Tuple
+
+import tkinter as tk
+
+
+class LineIndex:
+    """Начала строк текста (без завершающего перевода строки tk.Text)."""
+
+    # сколько начал строк досчитывать за раз при поиске по смещению
+    _BLOCK = 1024
+
+    def __init__(self, text: str = ""):
+        self.reset(text)
+
+    def reset(self, text: str):
+        self._lengths: List[int] = [len(line) for line in text.split("\n")]
+        self._starts: List[int] = [0]
+        self._total = len(text)
+
+    def __len__(self) -> int:
+        return self._total
+
+    @property
+    def line_count(self) -> int:
+        return len(self._lengths)
+
+    def _ensure(self, line: int):
+        # начала строк 0..line (с нуля) должны быть актуальны
+        starts = self._starts
+        have = len(starts)
+        if have > line:
+            return
+        lengths = self._lengths
+        base = starts[-1] + lengths[have - 1] + 1
+        starts.extend(accumulate((n + 1 for n in lengths[have:line]), initial=base))
+
+    def _invalidate(self, line: int):
+        # начало строки line не меняется; начала следующих пересчитаются при запросе
+        del self._starts[line + 1:]
+
+    # ---------------- перевод ----------------
+    def to_offset(self, line: int, col: int) -> int:
+        """Строка (с 1) и столбец (с 0) -> смещение. Позиции за концом текста прижимаются к нему."""
+        i = line - 1
+        if i < 0:
+            return 0
+        if i >= len(self._lengths):
+            return self._total
+        self._ensure(i)
+        return self._starts[i] + min(col, self._lengths[i])
+
+    def to_line_col(self, offset: int) -> Tuple[int, int]:
+        """Смещение -> (строка с 1, столбец с 0)."""
+        offset = max(0, min(offset, self._total))
+        starts, lengths = self._starts, self._lengths
+        # досчитываем начала строк блоками, пока известные строки не покроют offset
+        while len(starts) < len(lengths) and starts[-1] + lengths[len(starts) - 1] < offset:
+            self._ensure(min(len(lengths) - 1, len(starts) - 1 + self._BLOCK))
+        i = bisect.bisect_right(starts, offset) - 1
+        return i + 1, offset - self._starts[i]
+
+    def to_index(self, offset: int) -> str:
+        line, col = self.to_line_col(offset)
+        return f"{line}.{col}"
+
+    # ---------------- правки ----------------
+    def insert(self, offset: int, chars: str):
+        if not chars:
+            return
+        line, col = self.to_line_col(offset)
+        i = line - 1
+        parts = chars.split("\n")
+        if len(parts) == 1:
+            self._lengths[i] += len(chars)
+        else:
+            rest = self._lengths[i] - col
+            self._lengths[i:i + 1] = [col + len(parts[0]), *map(len, parts[1:-1]), len(parts[-1]) + rest]
+        self._total += len(chars)
+        self._invalidate(i)
+
+    def delete(self, start: int, end: int):
+        start = max(0, min(start, self._total))
+        end = max(start, min(end, self._total))
+        if start == end:
+            return
+        l1, c1 = self.to_line_col(start)
+        l2, c2 = self.to_line_col(end)
+        self._lengths[l1 - 1:l2] = [c1 + self._lengths[l2 - 1] - c2]
+        self._total -= end - start
+        self._invalidate(l1 - 1)
+
+
+class TextChangeTracker:
+    """Держит LineIndex в соответствии с содержимым tk.Text.
+
+    Команда виджета переименовывается, на её место ставится обработчик, который
+    вызывает оригинал и переносит правку в индекс. Слушатели из listeners получают
+    (смещение, число удалённых символов, вставленный текст) уже после правки.
+    Операции, которые не раскладываются на insert/delete (edit undo/redo),
+    приводят к полной перестройке индекса по тексту виджета.
+    """
+
+    def __init__(self, text: tk.Text):
+        self.text = text
+        self.index = LineIndex(text.get("1.0", "end-1c"))
+        self.listeners: List[Callable[[int, int, str], None]] = []
+        self._widget = str(text)
+        self._orig = self._widget + "_orig"
+        self._tk = text.tk
+        self._tk.call("rename", self._widget, self._orig)
+        self._tk.createcommand(self._widget, self._dispatch)
+        text.bind("<Destroy>", lambda e: self.close(), add="+")
+
+    def close(self):
+        if self._orig is None:
+            return
+        try:
+            self._tk.deletecommand(self._widget)
+            self._tk.call("rename", self._orig, self._widget)
+        except tk.TclError:
+            pass
+        self._orig = None
+
+    # ---------------- позиции ----------------
+    def _offset(self, idx) -> int:
+        line, col = str(self._tk.call(self._orig, "index", idx)).split(".")
+        return self.index.to_offset(int(line), int(col))
+
+    def index_to_offset(self, idx) -> int:
+        return self._offset(idx)
+
+    def offset_to_index(self, offset: int) -> str:
+        return self.index.to_index(offset)
+
+    # ---------------- перехват правок ----------------
+    def _dispatch(self, cmd, *args):
+        call = self._tk.call
+        if cmd in ("insert", "delete", "replace") and self._disabled():
+            # state=disabled: Tk молча игнорирует правку — индекс и слушатели не трогаем
+            return call(self._orig, cmd, *args)
+        if cmd == "insert" and len(args) >= 2:
+            offset = self._offset(args[0])
+            result = call(self._orig, cmd, *args)
+            # insert index chars ?tagList chars tagList ...?
+            self._changed(offset, 0, "".join(args[1::2]))
+            return result
+        if cmd == "delete" and args:
+            ranges = self._delete_ranges(args)
+            result = call(self._orig, cmd, *args)
+            for start, end in sorted(ranges, reverse=True):
+                self._changed(start, end - start, "")
+            return result
+        if cmd == "replace" and len(args) >= 3:
+            start, end = self._offset(args[0]), self._offset(args[1])
+            result = call(self._orig, cmd, *args)
+            self._changed(start, max(0, end - start), "".join(args[2::2]))
+            return result
+        result = call(self._orig, cmd, *args)
+        if cmd == "edit" and args and args[0] in ("undo", "redo"):
+            self.index.reset(str(call(self._orig, "get", "1.0", "end-1c")))
+        return result
+
+    def _disabled(self) -> bool:
+        return str(self._tk.call(self._orig, "cget", "-state")) == "disabled"
+
+    def _delete_ranges(self, args) -> List[Tuple[int, int]]:
+        # delete index1 ?index2 index1 index2 ...?; без пары удаляется один символ
+        ranges = []
+        for i in range(0, len(args), 2):
+            start = self._offset(args[i])
+            end = self._offset(args[i + 1]) if i + 1 < len(args) else start + 1
+            end = min(end, len(self.index))
+            if end > start:
+                ranges.append((start, end))
+        return ranges
+
+    def _changed(self, offset: int, removed: int, inserted: str):
+        if removed:
+            self.index.delete(offset, offset + removed)
+        if inserted:
+            self.index.insert(offset, inserted)
+        for fn in self.listeners:
+            fn(offset, removed, inserted)
@@ -0,0 +1,279 @@
+# ui/virtual_tree.py
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, List, Optional, Sequence
+
+
+class VirtualTree:
+    """Виртуальный список на основе ttk.Treeview.
+
+    В самом Treeview живут только строки видимого окна (по одному элементу на видимую
+    строку); при прокрутке элементы не создаются заново, а получают новые значения.
+    Данные запрашиваются страницами через fetch_page(last_row, offset, limit) и
+    накапливаются в буфере — следующая страница подгружается, когда окно подходит
+    к концу уже прочитанного. Сервис может отдавать страницы keyset-способом
+    (по last_row) или через offset.
+
+    Снаружи дерево доступно как .tree: заголовки, ширины колонок, selection(),
+    item(...)["values"] и identify_row работают как с обычным Treeview.
+
+    С executor (BackgroundExecutor) страницы читаются в рабочем потоке: окно
+    показывает уже прочитанное, а недостающие строки дорисовываются по приходу
+    страницы. Без executor чтение синхронное.
+    """
+
+    def __init__(self, parent, columns: Sequence[str], fetch_page: Optional[Callable] = None,
+                 page_size: int = 200, height: int = 16, key_index: int = 0,
+                 executor=None, on_error: Optional[Callable[[BaseException], None]] = None):
+        self.frame = ttk.Frame(parent)
+        self.page_size = page_size
+        self.key_index = key_index
+        self._fetch_page = fetch_page
+        self.executor = executor
+        self.on_error = on_error
+
+        self.tree = ttk.Treeview(self.frame, columns=tuple(columns), show="headings", height=height)
+        self.vsb = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.vsb.grid(row=0, column=1, sticky="ns")
+        self.frame.rowconfigure(0, weight=1)
+        self.frame.columnconfigure(0, weight=1)
+
+        self._rows: List[tuple] = []      # прочитанные строки (как пришли из сервиса)
+        self._exhausted = True            # сервис отдал всё
+        self._top = 0                     # индекс первой видимой строки
+        self._want_top = 0                # куда просили прокрутить (может быть дальше прочитанного)
+        self._loading = False             # страница уже запрошена в фоне
+        self._generation = 0              # номер reset(); страницы от старых запросов отбрасываются
+        self._on_first_page = None
+        self._visible = height            # сколько строк помещается в окно
+        self._slots: List[str] = []       # iid элементов Treeview, по одному на видимую строку
+        self._slot_index = {}             # iid -> индекс строки в _rows
+        self._selected_key = None
+        self._filling = False
+
+        self.tree.bind("<Configure>", self._on_configure, add="+")
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        self.tree.bind("<MouseWheel>", self._on_wheel, add="+")
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-3), add="+")
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(3), add="+")
+        self.tree.bind("<Up>", lambda e: self._on_key(-1))
+        self.tree.bind("<Down>", lambda e: self._on_key(1))
+        self.tree.bind("<Prior>", lambda e: self._on_key(-self._visible))
+        self.tree.bind("<Next>", lambda e: self._on_key(self._visible))
+        self.tree.bind("<Home>", lambda e: self._scroll_to(0) or "break")
+        self.tree.bind("<End>", lambda e: self._scroll_to_end() or "break")
+
+    # ---------------- публичный API ----------------
+    def reset(self, fetch_page: Optional[Callable] = None,
+              on_first_page: Optional[Callable[[int], None]] = None):
+        """Сбросить буфер и начать чтение заново (новый запрос, поиск или сортировка).
+        on_first_page(n) вызывается, когда прочитана первая страница (n — число строк в ней)."""
+        if fetch_page is not None:
+            self._fetch_page = fetch_page
+        self._generation += 1
+        self._rows = []
+        self._exhausted = self._fetch_page is None
+        self._loading = False
+        self._top = 0
+        self._want_top = 0
+        self._selected_key = None
+        self._on_first_page = on_first_page
+        self._refresh()
+
+    def refresh(self):
+        """Перечитать данные с начала, сохранив положение прокрутки."""
+        top = self._top
+        self.reset()
+        self._scroll_to(top)
+
+    def is_empty(self) -> bool:
+        return not self._rows
+
+    def loaded_count(self) -> int:
+        return len(self._rows)
+
+    def selected_row(self) -> Optional[tuple]:
+        sel = self.tree.selection()
+        if not sel:
+            return None
+        idx = self._slot_index.get(sel[0])
+        return self._rows[idx] if idx is not None else None
+
+    # ---------------- загрузка ----------------
+    def _ensure_loaded(self, upto: int):
+        if self.executor is not None:
+            if len(self._rows) < upto and not self._exhausted and not self._loading:
+                self._request_page()
+            return
+        while len(self._rows) < upto and not self._exhausted:
+            last = self._rows[-1] if self._rows else None
+            self._add_page(self._read_page(self._fetch_page, last, len(self._rows), self.page_size))
+
+    @staticmethod
+    def _read_page(fetch, last, offset, limit) -> List[tuple]:
+        # выполняется в рабочем потоке: генераторы сервиса дочитываются здесь же
+        return [tuple(r) for r in fetch(last, offset, limit)]
+
+    def _add_page(self, page: List[tuple]):
+        first = not self._rows
+        self._rows.extend(page)
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if first and self._on_first_page is not None:
+            callback, self._on_first_page = self._on_first_page, None
+            callback(len(page))
+
+    def _request_page(self):
+        self._loading = True
+        gen = self._generation
+        last = self._rows[-1] if self._rows else None
+
+        def done(page):
+            if gen != self._generation:
+                return
+            self._loading = False
+            self._add_page(page)
+            self._refresh()
+
+        def failed(e):
+            if gen != self._generation:
+                return
+            self._loading = False
+            self._exhausted = True
+            if self.on_error is not None:
+                self.on_error(e)
+
+        self.executor.submit(
+            self._read_page, self._fetch_page, last, len(self._rows), self.page_size,
+            on_done=done, on_error=failed, key=("virtual_tree", id(self))
+        )
+
+    def _estimated_total(self) -> int:
+        # точное число строк неизвестно (COUNT(*) по большой таблице — это полный проход);
+        # пока есть непрочитанные страницы, считаем, что впереди ещё одна
+        return len(self._rows) + (0 if self._exhausted else self.page_size)
+
+    # ---------------- отрисовка окна ----------------
+    @staticmethod
+    def _display(row: tuple) -> tuple:
+        return tuple("" if v is None else v for v in row)
+
+    def _refresh(self):
+        if self._filling:
+            return
+        self._filling = True
+        try:
+            # подгружаем с запасом в полстраницы, чтобы прокрутка не упиралась в чтение
+            self._ensure_loaded(self._want_top + self._visible + self.page_size // 2)
+            max_top = max(0, len(self._rows) - self._visible)
+            self._top = max(0, min(self._want_top, max_top))
+            if self._exhausted:
+                self._want_top = self._top
+
+            n = max(0, min(self._visible, len(self._rows) - self._top))
+            while len(self._slots) < n:
+                self._slots.append(self.tree.insert("", "end", values=()))
+            while len(self._slots) > n:
+                self.tree.delete(self._slots.pop())
+
+            self._slot_index.clear()
+            selected_slot = None
+            for i, iid in enumerate(self._slots):
+                idx = self._top + i
+                row = self._rows[idx]
+                self.tree.item(iid, values=self._display(row))
+                self._slot_index[iid] = idx
+                if self._selected_key is not None and row[self.key_index] == self._selected_key:
+                    selected_slot = iid
+
+            if selected_slot is not None:
+                if self.tree.selection() != (selected_slot,):
+                    self.tree.selection_set(selected_slot)
+            elif self.tree.selection():
+                self.tree.selection_remove(*self.tree.selection())
+
+            total = max(self._estimated_total(), 1)
+            self.vsb.set(self._top / total, min(1.0, (self._top + self._visible) / total))
+        finally:
+            self._filling = False
+
+    # ---------------- прокрутка ----------------
+    def _scroll_to(self, top):
+        self._want_top = max(0, top if top == float("inf") else int(top))
+        self._refresh()
+
+    def _scroll_to_end(self):
+        # страницы дочитываются до конца (в фоне — по одной за раз), окно едет следом
+        self._scroll_to(float("inf"))
+
+    def _scroll_by(self, delta: int):
+        self._scroll_to(self._top + delta)
+
+    def _on_scrollbar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * self._estimated_total())
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                step *= max(1, self._visible - 1)
+            self._scroll_by(step)
+
+    def _on_wheel(self, event):
+        # Windows: delta кратна 120, macOS: небольшие значения
+        delta = event.delta
+        steps = -int(delta / 120) if abs(delta) >= 120 else (-1 if delta > 0 else 1)
+        self._scroll_by(steps * 3)
+        return "break"
+
+    def _on_key(self, delta: int):
+        # курсор двигается внутри окна; у края окна прокручиваем список
+        row = self.selected_row()
+        if row is None:
+            cur = self._top
+        else:
+            cur = self._slot_index[self.tree.selection()[0]]
+        target = max(0, cur + delta)
+        self._ensure_loaded(target + 1)
+        target = min(target, len(self._rows) - 1)
+        if target < 0:
+            return "break"
+        self._want_top = self._top
+        if target < self._top:
+            self._want_top = target
+        elif target >= self._top + self._visible:
+            self._want_top = target - self._visible + 1
+        self._selected_key = self._rows[target][self.key_index]
+        self._refresh()
+        return "break"
+
+    # ---------------- события ----------------
+    def _on_select(self, _event=None):
+        if self._filling:
+            return
+        row = self.selected_row()
+        self._selected_key = row[self.key_index] if row is not None else None
+
+    def _on_configure(self, _event=None):
+        visible = self._measure_visible()
+        if visible and visible != self._visible:
+            self._visible = visible
+            self._refresh()
+
+    def _measure_visible(self) -> int:
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return 0
+        if self._slots:
+            bbox = self.tree.bbox(self._slots[0])
+            if bbox:
+                _x, y, _w, h = bbox
+                return max(1, (height - y) // max(h, 1))
+        try:
+            rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except (tk.TclError, ValueError):
+            rowheight = 20
+        # ~ одна строка уходит под заголовки колонок
+        return max(1, height // rowheight - 1)